@@ -0,0 +1,176 @@
+"""
+Benchmark 共用工具
+
+提供 Lambda 模組載入、DynamoDB 替身（moto 或本地 endpoint）、
+延遲統計與表格輸出等共用函數。
+"""
+
+import contextlib
+import math
+import os
+import statistics
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+QUERY_SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+if str(QUERY_SERVICE_DIR) not in sys.path:
+    sys.path.insert(0, str(QUERY_SERVICE_DIR))
+
+# moto 需要的假憑證與區域設定
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-southeast-1")
+os.environ.setdefault("AWS_REGION", "ap-southeast-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")  # pragma: allowlist secret
+# 避免 Lambda 的 INFO 日誌干擾量測結果
+os.environ.setdefault("POWERTOOLS_LOG_LEVEL", "WARNING")
+# 不輸出 stream processor 的 EMF metrics
+os.environ.setdefault("POWERTOOLS_METRICS_DISABLED", "true")
+
+
+@contextlib.contextmanager
+def dynamodb_stand_in(endpoint_url: Optional[str] = None) -> Iterator[None]:
+    """使用本地 DynamoDB endpoint，未指定時使用 moto 模擬"""
+    if endpoint_url:
+        os.environ["DYNAMODB_ENDPOINT"] = endpoint_url
+        yield
+        return
+
+    from moto import mock_dynamodb
+
+    with mock_dynamodb():
+        yield
+
+
+def get_dynamodb_resource(endpoint_url: Optional[str] = None) -> Any:
+    """建立 benchmark 使用的 DynamoDB resource"""
+    import boto3
+
+    return boto3.resource(
+        "dynamodb", region_name=os.environ["AWS_REGION"], endpoint_url=endpoint_url or None
+    )
+
+
+READ_TABLE_NAME = "notification-records"
+
+
+def create_read_table(dynamodb: Any, table_name: str = READ_TABLE_NAME) -> Any:
+    """建立只有主鍵的讀取表，供寫入類 benchmark 使用"""
+    table = dynamodb.create_table(
+        TableName=table_name,
+        KeySchema=[
+            {"AttributeName": "user_id", "KeyType": "HASH"},
+            {"AttributeName": "created_at", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "user_id", "AttributeType": "S"},
+            {"AttributeName": "created_at", "AttributeType": "N"},
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    table.wait_until_exists()
+    return table
+
+
+def generate_stream_record(i: int) -> Dict[str, Any]:
+    """產生一筆 INSERT stream 記錄"""
+    return {
+        "eventName": "INSERT",
+        "dynamodb": {
+            "NewImage": {
+                "transaction_id": {"S": f"txn-{i:08d}"},
+                "created_at": {"N": str(1704038400000 + i)},
+                "user_id": {"S": f"user-{i % 5000:05d}"},
+                "notification_title": {"S": "Payment Confirmation"},
+                "status": {"S": "SENT"},
+                "platform": {"S": "IOS"},
+                "ap_id": {"S": "payment-service"},
+            },
+            "SequenceNumber": str(100000 + i),
+        },
+    }
+
+
+def add_simulated_rtt(dynamodb: Any, rtt_ms: float) -> None:
+    """在每次 DynamoDB API 呼叫前加上固定延遲，模擬網路往返"""
+    if rtt_ms <= 0:
+        return
+
+    def sleep_before_call(**kwargs: Any) -> None:
+        time.sleep(rtt_ms / 1000)
+
+    dynamodb.meta.client.meta.events.register("before-call.dynamodb", sleep_before_call)
+
+
+def estimate_item_size(item: Dict[str, Any]) -> int:
+    """估算 DynamoDB item 大小（bytes），用於換算 RCU/WCU"""
+    size = 0
+    for name, value in item.items():
+        size += len(name.encode("utf-8"))
+        if isinstance(value, str):
+            size += len(value.encode("utf-8"))
+        elif isinstance(value, (int, Decimal)):
+            size += len(str(value).lstrip("-")) // 2 + 1
+        elif isinstance(value, bool):
+            size += 1
+        else:
+            size += len(str(value).encode("utf-8"))
+    return size
+
+
+def estimate_read_units(total_bytes: int, strongly_consistent: bool = False) -> float:
+    """依讀取的資料量換算 RCU（每 4KB 一個單位，最終一致性減半）"""
+    units = math.ceil(total_bytes / 4096) if total_bytes else 1
+    return float(units) if strongly_consistent else units / 2
+
+
+def time_calls(func: Callable[[], Any], repeat: int) -> List[float]:
+    """重複呼叫並回傳每次耗時（毫秒）"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """計算百分位數（最近排名法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    """回傳 p50 / p99 / mean"""
+    return {
+        "p50": percentile(values, 50),
+        "p99": percentile(values, 99),
+        "mean": statistics.fmean(values) if values else 0.0,
+    }
+
+
+def print_table(headers: Sequence[str], rows: Sequence[Sequence[Any]]) -> None:
+    """以固定寬度輸出結果表格"""
+    cells = [[str(h) for h in headers]] + [
+        [
+            f"{c:,.2f}" if isinstance(c, float) else f"{c:,}" if isinstance(c, int) else str(c)
+            for c in row
+        ]
+        for row in rows
+    ]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for index, row in enumerate(cells):
+        print("  ".join(cell.rjust(widths[i]) for i, cell in enumerate(row)))
+        if index == 0:
+            print("  ".join("-" * w for w in widths))
+
+
+def parse_sizes(value: str) -> List[int]:
+    """解析逗號分隔的數量參數，例如 10000,100000"""
+    return [int(v) for v in value.split(",") if v.strip()]
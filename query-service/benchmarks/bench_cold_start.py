@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Lambda 冷啟動量測：模組 import 時間（-X importtime）與 init 耗時
+
+每次以全新的 Python 程序（模擬冷啟動）在各 Lambda 目錄下 import app，量測：
+
+- import ms：`-X importtime` 回報的 app 模組累計 import 時間
+- init ms：import app 的實際耗時（含模組層級的初始化）
+- first use ms：首次使用 DynamoDB 時建立 client / Table 的耗時（延遲初始化的部分）
+- top imports：依頂層套件加總 self time 最多的套件
+
+以 AWS_LAMBDA_FUNCTION_NAME 模擬 Lambda 環境（Logger / Tracer 啟用），輸出多次執行的中位數。
+
+使用方式：
+    python benchmarks/bench_cold_start.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from _common import print_table
+
+LAMBDAS_DIR = Path(__file__).resolve().parent.parent / "lambdas"
+
+# 各 Lambda 首次使用 DynamoDB 時執行的程式碼（沒有 DynamoDB 的 Lambda 為 None）
+FIRST_USE = {
+    "query_result_lambda": "app.query_service.table",
+    "stream_processor_lambda": "app.get_dynamodb().Table(app.READ_TABLE_NAME)",
+    "query_lambda": None,
+}
+
+MEASURE_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app
+init_ms = (time.perf_counter() - start) * 1000
+first_use_ms = None
+if {first_use!r}:
+    start = time.perf_counter()
+    {first_use}
+    first_use_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({{"init_ms": init_ms, "first_use_ms": first_use_ms}}))
+"""
+
+
+def parse_importtime(stderr: str) -> Tuple[float, Dict[str, float]]:
+    """回傳 (app 的累計 import ms, 各頂層套件的 self time ms)"""
+    app_ms = 0.0
+    by_package: Dict[str, float] = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:") :].split("|")
+        self_us, cumulative_us, name = (part.strip() for part in parts)
+        if not self_us.isdigit():
+            continue
+        if name == "app":
+            app_ms = int(cumulative_us) / 1000
+        else:
+            by_package[name.split(".")[0]] += int(self_us) / 1000
+    return app_ms, by_package
+
+
+def measure_once(lambda_name: str) -> Dict[str, Any]:
+    """以全新程序 import 一次 Lambda 模組"""
+    first_use = FIRST_USE[lambda_name] or ""
+    env = {
+        **os.environ,
+        "AWS_LAMBDA_FUNCTION_NAME": f"bench-{lambda_name}",
+        "AWS_DEFAULT_REGION": "ap-southeast-1",
+        "AWS_ACCESS_KEY_ID": "test",
+        "AWS_SECRET_ACCESS_KEY": "test",
+        "POWERTOOLS_DEV": "false",
+    }
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", MEASURE_SCRIPT.format(first_use=first_use)],
+        cwd=LAMBDAS_DIR / lambda_name,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    app_ms, by_package = parse_importtime(completed.stderr)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {"import_ms": app_ms, "by_package": by_package, **result}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=5, help="每個 Lambda 的冷啟動次數")
+    parser.add_argument("--top", type=int, default=3, help="列出 self time 最多的套件數")
+    args = parser.parse_args()
+
+    rows: List[List[Any]] = []
+    for lambda_name in FIRST_USE:
+        runs = [measure_once(lambda_name) for _ in range(args.runs)]
+        first_use = [run["first_use_ms"] for run in runs if run["first_use_ms"] is not None]
+        packages: Dict[str, float] = defaultdict(float)
+        for run in runs:
+            for package, ms in run["by_package"].items():
+                packages[package] += ms / len(runs)
+        top = sorted(packages.items(), key=lambda entry: entry[1], reverse=True)[: args.top]
+        rows.append(
+            [
+                lambda_name,
+                statistics.median(run["import_ms"] for run in runs),
+                statistics.median(run["init_ms"] for run in runs),
+                statistics.median(first_use) if first_use else "-",
+                ", ".join(f"{package} {ms:.0f}" for package, ms in top),
+            ]
+        )
+
+    print()
+    print_table(["lambda", "import ms", "init ms", "first use ms", "top imports (self ms)"], rows)
+
+
+if __name__ == "__main__":
+    main()
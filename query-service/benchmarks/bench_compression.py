@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+回應壓縮比較：未壓縮 vs gzip（query_result_lambda → Internal API → EKS handler → 客戶端）
+
+以模擬的失敗推播記錄量測兩段回應：
+
+- lambda：以 API Gateway HTTP API 事件呼叫 query_result_lambda 的 GET /fail
+  （query_service 以固定結果替代），比較不帶 / 帶 Accept-Encoding: gzip 的 body 大小與處理時間
+- eks：以 TestClient 呼叫 EKS handler 的 GET /fail（Internal API adapter 回傳固定結果），
+  比較 identity / gzip 的 Content-Length 與包含客戶端解壓的端到端延遲
+
+輸出每種資料量下的 bytes-on-wire、壓縮比與 p50 / p99。
+
+使用方式：
+    python benchmarks/bench_compression.py --sizes 100,1000,5000 --repeat 20
+"""
+
+import argparse
+import base64
+import random
+from types import SimpleNamespace
+from typing import Any, Dict, List
+from unittest.mock import patch
+
+from _common import dynamodb_stand_in, parse_sizes, print_table, summarize, time_calls
+
+BASE_TS = 1704038400000
+
+LAMBDA_CONTEXT = SimpleNamespace(
+    function_name="bench-query-result-lambda",
+    memory_limit_in_mb=128,
+    invoked_function_arn="arn:aws:lambda:ap-southeast-1:000000000000:function:bench",
+    aws_request_id="bench",
+)
+
+
+def generate_item(i: int) -> Dict[str, Any]:
+    """產生一筆 DynamoDB 回傳的失敗推播記錄"""
+    created_at = BASE_TS + random.randrange(3600 * 1000)
+    return {
+        "transaction_id": f"txn-{i:08d}",
+        "token": f"device-token-{i:08d}",
+        "platform": random.choice(["IOS", "ANDROID", "WEBPUSH"]),
+        "notification_title": "Payment Confirmation",
+        "notification_body": "Your payment has been processed successfully",
+        "status": "FAILED",
+        "failed_ts": created_at + random.randrange(5000),
+        "ap_id": "payment-service",
+        "created_at": created_at,
+        "retry_cnt": random.randrange(3),
+    }
+
+
+def api_gateway_event(path: str, accept_encoding: str) -> Dict[str, Any]:
+    """產生 API Gateway HTTP API (v2) 的 GET 事件"""
+    return {
+        "version": "2.0",
+        "routeKey": f"GET {path}",
+        "rawPath": path,
+        "rawQueryString": "",
+        "headers": {"accept-encoding": accept_encoding},
+        "requestContext": {"http": {"method": "GET", "path": path}, "stage": "$default"},
+        "isBase64Encoded": False,
+    }
+
+
+def body_size(response: Dict[str, Any]) -> int:
+    """Lambda 回應送到客戶端的 body 大小（API Gateway 會先解開 base64）"""
+    if response.get("isBase64Encoded"):
+        return len(base64.b64decode(response["body"]))
+    return len(response["body"].encode("utf-8"))
+
+
+def bench_lambda(app: Any, items: List[Dict[str, Any]], repeat: int) -> List[List[Any]]:
+    """量測 query_result_lambda GET /fail 在不同 Accept-Encoding 下的大小與延遲"""
+    rows: List[List[Any]] = []
+    result = {"success": True, "items": items, "count": len(items), "next_token": None}
+    with patch.object(app.query_service, "query_failed_notifications", return_value=result):
+        for encoding in ("identity", "gzip"):
+            event = api_gateway_event("/fail", encoding)
+            size = body_size(app.lambda_handler(event, LAMBDA_CONTEXT))
+            stats = summarize(time_calls(lambda: app.lambda_handler(event, LAMBDA_CONTEXT), repeat))
+            rows.append(["lambda", len(items), encoding, size, stats["p50"], stats["p99"]])
+    return rows
+
+
+def bench_eks(eks_main: Any, items: List[Dict[str, Any]], repeat: int) -> List[List[Any]]:
+    """量測 EKS handler GET /fail 在不同 Accept-Encoding 下的大小與端到端延遲"""
+    from fastapi.testclient import TestClient
+
+    from lambdas.query_result_lambda import app as lambda_app
+
+    response = {
+        "success": True,
+        "items": lambda_app.format_notification_items(items),
+        "schema_version": eks_main.NOTIFICATION_SCHEMA_VERSION,
+    }
+
+    class StubAdapter:
+        async def invoke_failed_query(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+            return response
+
+    service = eks_main.QueryService(StubAdapter())  # type: ignore[arg-type]
+    eks_main.app.dependency_overrides[eks_main.get_query_service] = lambda: service
+    rows: List[List[Any]] = []
+    try:
+        client = TestClient(eks_main.app)
+        for encoding in ("identity", "gzip"):
+            headers = {"Accept-Encoding": encoding}
+            size = int(client.get("/fail", headers=headers).headers["Content-Length"])
+            # httpx 在讀取 body 時解壓，延遲包含伺服器壓縮與客戶端解壓
+            stats = summarize(time_calls(lambda: client.get("/fail", headers=headers), repeat))
+            rows.append(["eks", len(items), encoding, size, stats["p50"], stats["p99"]])
+    finally:
+        eks_main.app.dependency_overrides.clear()
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=parse_sizes, default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=20, help="每種資料量的請求次數")
+    args = parser.parse_args()
+
+    with dynamodb_stand_in():
+        from eks_handler import main as eks_main
+        from lambdas.query_result_lambda import app
+
+        rows: List[List[Any]] = []
+        for size in args.sizes:
+            items = [generate_item(i) for i in range(size)]
+            for layer_rows in (
+                bench_lambda(app, items, args.repeat),
+                bench_eks(eks_main, items, args.repeat),
+            ):
+                plain_size = layer_rows[0][3]
+                for row in layer_rows:
+                    row.insert(4, f"{row[3] / plain_size:.1%}")
+                rows.extend(layer_rows)
+
+    print()
+    print_table(["layer", "items", "encoding", "bytes", "ratio", "p50 ms", "p99 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+失敗記錄查詢成本比較：status 過濾全表 scan vs 稀疏 GSI
+
+在本地 DynamoDB 替身（預設 moto，可用 --endpoint-url 指向 DynamoDB Local / LocalStack）
+建立 notification-records 表，依 --failure-rate 寫入失敗記錄（只有失敗記錄帶有 failed_bucket），比較：
+
+- scan + FilterExpression status = FAILED（舊做法，讀取量與全表大小成正比）
+- QueryService 讀取稀疏 GSI failed_bucket-created_at-index（讀取量與失敗筆數成正比）
+
+輸出每種資料量下「查詢所有失敗記錄」的延遲（p50 / p99）與估算 RCU。
+
+使用方式：
+    python benchmarks/bench_failed_lookup.py --sizes 10000,100000 --failure-rate 0.02 --lookups 5
+"""
+
+import argparse
+import random
+import sys
+from typing import Any, Dict, List
+
+from _common import (
+    dynamodb_stand_in,
+    estimate_item_size,
+    estimate_read_units,
+    get_dynamodb_resource,
+    parse_sizes,
+    print_table,
+    summarize,
+    time_calls,
+)
+
+FAILED_INDEX_NAME = "failed_bucket-created_at-index"
+
+
+def create_table(dynamodb: Any, table_name: str) -> Any:
+    """建立帶有失敗記錄稀疏 GSI 的 notification-records 表"""
+    table = dynamodb.create_table(
+        TableName=table_name,
+        KeySchema=[
+            {"AttributeName": "user_id", "KeyType": "HASH"},
+            {"AttributeName": "created_at", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "user_id", "AttributeType": "S"},
+            {"AttributeName": "created_at", "AttributeType": "N"},
+            {"AttributeName": "failed_bucket", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": FAILED_INDEX_NAME,
+                "KeySchema": [
+                    {"AttributeName": "failed_bucket", "KeyType": "HASH"},
+                    {"AttributeName": "created_at", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+            }
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    table.wait_until_exists()
+    return table
+
+
+def generate_item(i: int, failed: bool) -> Dict[str, Any]:
+    """產生一筆模擬推播記錄，失敗記錄與 stream processor 一樣帶有 failed_bucket"""
+    item: Dict[str, Any] = {
+        "user_id": f"user-{i % 5000:05d}",
+        "created_at": 1704038400000 + i,
+        "transaction_id": f"txn-{i:08d}",
+        "token": f"device-token-{i:08d}",
+        "platform": random.choice(["IOS", "ANDROID", "WEBPUSH"]),
+        "notification_title": "Payment Confirmation",
+        "notification_body": "Your payment has been processed successfully",
+        "status": "FAILED" if failed else random.choice(["SENT", "DELIVERED"]),
+        "send_ts": 1704038400000 + i,
+        "ap_id": "payment-service",
+    }
+    if failed:
+        item["failed_ts"] = 1704038400000 + i
+        item["failed_bucket"] = "FAILED"
+    return item
+
+
+def load_items(table: Any, start: int, end: int, failure_rate: float) -> int:
+    """以 batch_writer 寫入 [start, end) 範圍的記錄，回傳其中的失敗筆數"""
+    failed_count = 0
+    with table.batch_writer() as batch:
+        for i in range(start, end):
+            failed = random.random() < failure_rate
+            failed_count += failed
+            batch.put_item(Item=generate_item(i, failed))
+            if (i + 1) % 50000 == 0:
+                print(f"  ...loaded {i + 1:,} items", file=sys.stderr)
+    return failed_count
+
+
+def full_scan_failed(table: Any) -> int:
+    """舊做法：scan + status 過濾讀完整張表，回傳 scanned_count"""
+    from boto3.dynamodb.conditions import Attr
+
+    kwargs: Dict[str, Any] = {"FilterExpression": Attr("status").eq("FAILED")}
+    scanned = 0
+    while True:
+        response = table.scan(**kwargs)
+        scanned += int(response.get("ScannedCount", 0))
+        if "LastEvaluatedKey" not in response:
+            return scanned
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=parse_sizes, default=[10000, 100000])
+    parser.add_argument("--failure-rate", type=float, default=0.02, help="失敗記錄比例")
+    parser.add_argument("--lookups", type=int, default=5, help="每種資料量的查詢次數")
+    parser.add_argument("--endpoint-url", default=None, help="DynamoDB Local / LocalStack")
+    parser.add_argument("--table-name", default="bench-failed-records")
+    args = parser.parse_args()
+
+    with dynamodb_stand_in(args.endpoint_url):
+        from lambdas.query_result_lambda import app
+
+        dynamodb = get_dynamodb_resource(args.endpoint_url)
+        table = create_table(dynamodb, args.table_name)
+        service = app.QueryService(args.table_name, failed_index_name=FAILED_INDEX_NAME)
+        avg_item_size = estimate_item_size(generate_item(0, failed=False))
+        avg_failed_size = estimate_item_size(generate_item(0, failed=True))
+
+        rows: List[List[Any]] = []
+        loaded = 0
+        failed_total = 0
+        for size in sorted(args.sizes):
+            print(f"Loading table up to {size:,} items...", file=sys.stderr)
+            failed_total += load_items(table, loaded, size, args.failure_rate)
+            loaded = size
+
+            scanned_counts: List[int] = []
+
+            def scan_once() -> None:
+                scanned_counts.append(full_scan_failed(table))
+
+            def index_once() -> None:
+                result = service.query_failed_notifications()
+                assert result["count"] == failed_total
+
+            scan_stats = summarize(time_calls(scan_once, args.lookups))
+            index_stats = summarize(time_calls(index_once, args.lookups))
+
+            scan_rcu = estimate_read_units(scanned_counts[0] * avg_item_size)
+            index_rcu = estimate_read_units(failed_total * avg_failed_size)
+            for method, stats, rcu in [
+                ("scan", scan_stats, scan_rcu),
+                ("sparse GSI", index_stats, index_rcu),
+            ]:
+                rows.append([size, failed_total, method, stats["p50"], stats["p99"], rcu])
+
+        print()
+        print_table(["items", "failed", "method", "p50 ms", "p99 ms", "est. RCU/query"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+推播記錄格式化效能比較：逐筆格式化 vs 批次（以欄為單位）格式化
+
+產生模擬的「所有失敗推播」查詢結果（created_at / send_ts / failed_ts 集中在同一段時間內），
+比較：
+
+- legacy：舊版 format_notification_items，每筆記錄建立兩個 closure、
+  呼叫四次 datetime.fromtimestamp(...).strftime 並重建兩次 dict
+- batch：目前的 format_notification_items，時間戳依秒去重後一次轉換
+
+輸出每種資料量下的 items/sec 與 p50 / p99，並驗證兩者輸出一致。
+
+使用方式：
+    python benchmarks/bench_format_items.py --sizes 100,1000,10000 --repeat 20
+"""
+
+import argparse
+import random
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from _common import dynamodb_stand_in, parse_sizes, print_table, summarize, time_calls
+
+BASE_TS = 1704038400000
+
+
+def generate_item(i: int, spread_seconds: int) -> Dict[str, Any]:
+    """產生一筆模擬的失敗推播記錄（DynamoDB 回傳的數值型別為 Decimal 或 int）"""
+    created_at = BASE_TS + random.randrange(spread_seconds * 1000)
+    return {
+        "transaction_id": f"txn-{i:08d}",
+        "token": f"device-token-{i:08d}",
+        "platform": random.choice(["IOS", "ANDROID", "WEBPUSH"]),
+        "notification_title": "Payment Confirmation",
+        "notification_body": "Your payment has been processed successfully",
+        "status": "FAILED",
+        "send_ts": created_at + random.randrange(2000),
+        "failed_ts": created_at + random.randrange(5000),
+        "ap_id": "payment-service",
+        "created_at": created_at,
+        "retry_cnt": random.randrange(3),
+    }
+
+
+def legacy_format_notification_items(items: list, app: Any) -> list:
+    """舊版逐筆格式化實作，作為比較基準"""
+    formatted_items = []
+
+    for item in items:
+        try:
+
+            def safe_timestamp_convert(value: Any) -> Optional[int]:
+                if value is None or value == "":
+                    return None
+                try:
+                    return int(value)
+                except (ValueError, TypeError):
+                    return None
+
+            def safe_int_convert(value: Any) -> Optional[int]:
+                if value is None or value == "":
+                    return None
+                try:
+                    return int(value)
+                except (ValueError, TypeError):
+                    return None
+
+            formatted_item = {
+                "transaction_id": item.get("transaction_id"),
+                "token": item.get("token"),
+                "platform": item.get("platform"),
+                "notification_title": item.get("notification_title"),
+                "notification_body": item.get("notification_body"),
+                "status": item.get("status"),
+                "send_ts": safe_timestamp_convert(item.get("send_ts")),
+                "delivered_ts": safe_timestamp_convert(item.get("delivered_ts")),
+                "failed_ts": safe_timestamp_convert(item.get("failed_ts")),
+                "ap_id": item.get("ap_id"),
+                "created_at": safe_timestamp_convert(item.get("created_at")) or 0,
+                "sns_id": item.get("sns_id"),
+                "retry_cnt": safe_int_convert(item.get("retry_cnt")) or 0,
+            }
+
+            for ts_field, time_field in app.UTC8_TIME_FIELDS:
+                timestamp = formatted_item[ts_field]
+                formatted_item[time_field] = (
+                    datetime.fromtimestamp(timestamp / 1000.0, tz=app.UTC_PLUS_8).strftime(
+                        "%Y-%m-%d %H:%M:%S UTC+8"
+                    )
+                    if timestamp
+                    else None
+                )
+
+            formatted_item = {k: v for k, v in formatted_item.items() if v is not None}
+            formatted_items.append(formatted_item)
+        except Exception:
+            continue
+
+    return formatted_items
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=parse_sizes, default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20, help="每種資料量的重複次數")
+    parser.add_argument(
+        "--spread-seconds", type=int, default=3600, help="時間戳分布的時間範圍（秒）"
+    )
+    args = parser.parse_args()
+
+    with dynamodb_stand_in():
+        from lambdas.query_result_lambda import app
+
+        rows: List[List[Any]] = []
+        for size in args.sizes:
+            items = [generate_item(i, args.spread_seconds) for i in range(size)]
+            legacy = legacy_format_notification_items(items, app)
+            batch = app.format_notification_items(items)
+            assert legacy == batch, "batch formatter output differs from legacy formatter"
+
+            for name, func in [
+                ("legacy", lambda: legacy_format_notification_items(items, app)),
+                ("batch", lambda: app.format_notification_items(items)),
+            ]:
+                stats = summarize(time_calls(func, args.repeat))
+                items_per_sec = size / (stats["p50"] / 1000) if stats["p50"] else 0.0
+                rows.append([size, name, stats["p50"], stats["p99"], items_per_sec])
+
+        print()
+        print_table(["items", "formatter", "p50 ms", "p99 ms", "items/sec"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+InternalAPIAdapter 負載測試：每次請求新建 httpx.AsyncClient vs 共用連線池
+
+在本機以 uvicorn 啟動一個模擬 Internal API Gateway 的 ASGI 服務（或以 --url 指向
+實際端點），以固定並行度送出請求，比較：
+
+- 舊做法：每次請求 `async with httpx.AsyncClient(...)`，每次都重新建立連線
+- 新做法：InternalAPIAdapter 共用的長連線 client（keep-alive 連線池）
+
+輸出 requests/sec 與延遲 p50 / p99。本機模擬服務沒有 TLS，實際環境中每次
+TLS 握手的成本會讓差距更明顯。
+
+使用方式：
+    python benchmarks/bench_internal_api_client.py --requests 2000 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from _common import print_table, summarize
+
+RESPONSE_BODY = json.dumps({"success": True, "items": [], "count": 0}).encode("utf-8")
+
+
+async def fake_internal_api(scope: Dict[str, Any], receive: Any, send: Any) -> None:
+    """模擬 Internal API Gateway，回傳固定的空結果"""
+    if scope["type"] != "http":
+        return
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": RESPONSE_BODY})
+
+
+def start_local_server() -> Tuple[str, Any]:
+    """在背景執行緒啟動 uvicorn，回傳 (base_url, server)"""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    config = uvicorn.Config(fake_internal_api, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server
+
+
+async def run_load(
+    call: Callable[[], Awaitable[Any]], total: int, concurrency: int
+) -> Tuple[float, List[float]]:
+    """以固定並行度送出 total 次請求，回傳 (總秒數, 每次延遲毫秒)"""
+    latencies: List[float] = []
+    remaining = iter(range(total))
+
+    async def worker() -> None:
+        for _ in remaining:
+            start = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+async def benchmark(base_url: str, total: int, concurrency: int) -> List[List[Any]]:
+    """依序量測兩種做法"""
+    os.environ["INTERNAL_API_URL"] = base_url
+    from eks_handler.main import InternalAPIAdapter
+
+    adapter = InternalAPIAdapter()
+    url = f"{adapter.internal_api_url}/tx"
+    payload = {"transaction_id": "bench-tx"}
+
+    async def per_request_client() -> None:
+        async with httpx.AsyncClient(timeout=adapter.timeout) as client:
+            response = await client.get(url, params=payload)
+            response.json()
+
+    async def shared_client() -> None:
+        await adapter.invoke_transaction_query(payload)
+
+    rows = []
+    for name, call in [("client per request", per_request_client), ("shared pool", shared_client)]:
+        await call()  # warm-up
+        seconds, latencies = await run_load(call, total, concurrency)
+        stats = summarize(latencies)
+        rows.append([name, total / seconds, stats["p50"], stats["p99"]])
+
+    await adapter.aclose()
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=2000, help="每種做法的請求總數")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--url", default=None, help="實際的 Internal API Gateway base URL")
+    args = parser.parse_args()
+
+    logging.getLogger("eks_handler.main").setLevel(logging.WARNING)
+
+    server: Optional[Any] = None
+    base_url = args.url
+    if not base_url:
+        base_url, server = start_local_server()
+
+    try:
+        rows = asyncio.run(benchmark(base_url, args.requests, args.concurrency))
+    finally:
+        if server is not None:
+            server.should_exit = True
+
+    print()
+    print_table(["method", "requests/sec", "p50 ms", "p99 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+DynamoDB 回應解碼比較：boto3 resource（TypeDeserializer）vs low-level client + deserialize_item
+
+以模擬的 low-level 格式推播記錄（{"S": ...} / {"N": ...}）量測 query_result_lambda 查詢結果
+從 DynamoDB 回應到回應 body 的 CPU 時間：
+
+- decode：每筆 item 轉為 Python 值（resource 路徑為 TypeDeserializer，數值轉為 Decimal）
+- decode + format + dumps：再經過 format_notification_items 與 dumps_json
+
+輸出每種資料量下的 p50 / p99、items/sec 與加速倍數，並驗證兩種路徑的回應 body 相同。
+
+使用方式：
+    python benchmarks/bench_item_decode.py --sizes 1000,10000 --repeat 20
+"""
+
+import argparse
+import random
+from typing import Any, Callable, Dict, List, Tuple
+
+from _common import dynamodb_stand_in, parse_sizes, print_table, summarize, time_calls
+
+BASE_TS = 1704038400000
+
+
+def generate_wire_item(i: int) -> Dict[str, Dict[str, str]]:
+    """產生一筆 low-level client 回傳的推播記錄"""
+    created_at = BASE_TS + random.randrange(3600 * 1000)
+    return {
+        "user_id": {"S": f"user-{i % 5000:05d}"},
+        "transaction_id": {"S": f"txn-{i:08d}"},
+        "token": {"S": f"device-token-{i:08d}"},
+        "platform": {"S": random.choice(["IOS", "ANDROID", "WEBPUSH"])},
+        "notification_title": {"S": "Payment Confirmation"},
+        "notification_body": {"S": "Your payment has been processed successfully"},
+        "status": {"S": "FAILED"},
+        "send_ts": {"N": str(created_at + random.randrange(2000))},
+        "failed_ts": {"N": str(created_at + random.randrange(5000))},
+        "ap_id": {"S": "payment-service"},
+        "created_at": {"N": str(created_at)},
+        "retry_cnt": {"N": str(random.randrange(3))},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=parse_sizes, default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20, help="每種資料量的重複次數")
+    args = parser.parse_args()
+
+    with dynamodb_stand_in():
+        from boto3.dynamodb.types import TypeDeserializer
+
+        from lambdas.query_result_lambda import app
+
+        deserializer = TypeDeserializer()
+
+        def resource_decode(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            return [{k: deserializer.deserialize(v) for k, v in item.items()} for item in items]
+
+        def client_decode(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            return [app.deserialize_item(item) for item in items]
+
+        def respond(decode: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]) -> Any:
+            def run(items: List[Dict[str, Any]]) -> str:
+                formatted = app.format_notification_items(decode(items))
+                body = {"success": True, "count": len(formatted), "items": formatted}
+                return app.dumps_json(body)
+
+            return run
+
+        stages: List[Tuple[str, List[Tuple[str, Callable[[List[Dict[str, Any]]], Any]]]]] = [
+            ("decode", [("resource", resource_decode), ("client", client_decode)]),
+            (
+                "decode + format + dumps",
+                [("resource", respond(resource_decode)), ("client", respond(client_decode))],
+            ),
+        ]
+
+        rows: List[List[Any]] = []
+        for size in args.sizes:
+            wire_items = [generate_wire_item(i) for i in range(size)]
+            for stage, candidates in stages:
+                outputs = [func(wire_items) for _, func in candidates]
+                assert all(output == outputs[0] for output in outputs), f"{stage} outputs differ"
+
+                stage_rows: List[List[Any]] = []
+                for method, func in candidates:
+                    stats = summarize(time_calls(lambda f=func: f(wire_items), args.repeat))
+                    items_per_sec = int(size / (stats["p50"] / 1000)) if stats["p50"] else 0
+                    stage_rows.append(
+                        [stage, size, method, stats["p50"], stats["p99"], items_per_sec, ""]
+                    )
+                if stage_rows[-1][3]:
+                    stage_rows[-1][-1] = f"{stage_rows[0][3] / stage_rows[-1][3]:.1f}x"
+                rows.extend(stage_rows)
+
+    print()
+    print_table(["stage", "items", "path", "p50 ms", "p99 ms", "items/sec", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    main()
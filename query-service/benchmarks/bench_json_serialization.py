@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+JSON 序列化效能比較：標準庫 json vs orjson
+
+產生模擬的推播記錄，比較兩段回應的序列化時間：
+
+- lambda：query_result_lambda 的回應 body，原始 DynamoDB 記錄（數值為 Decimal）與已格式化記錄，
+  json.dumps(default=decimal_to_int) vs dumps_json
+- eks：EKS handler 的 QueryResult（經 response model 轉為 JSON 相容的 dict 後），
+  JSONResponse vs ORJSONResponse 的 render
+
+輸出每種資料量下的 p50 / p99 與加速倍數，並驗證兩者輸出的 JSON 等價。
+
+使用方式：
+    python benchmarks/bench_json_serialization.py --sizes 100,1000,5000 --repeat 50
+"""
+
+import argparse
+import json
+import random
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Tuple
+
+from _common import dynamodb_stand_in, parse_sizes, print_table, summarize, time_calls
+
+BASE_TS = 1704038400000
+
+
+def generate_item(i: int) -> Dict[str, Any]:
+    """產生一筆 DynamoDB 回傳的推播記錄（數值為 Decimal）"""
+    created_at = BASE_TS + random.randrange(3600 * 1000)
+    return {
+        "transaction_id": f"txn-{i:08d}",
+        "token": f"device-token-{i:08d}",
+        "platform": random.choice(["IOS", "ANDROID", "WEBPUSH"]),
+        "notification_title": "付款確認",
+        "notification_body": "Your payment has been processed successfully",
+        "status": "FAILED",
+        "send_ts": Decimal(created_at + random.randrange(2000)),
+        "failed_ts": Decimal(created_at + random.randrange(5000)),
+        "ap_id": "payment-service",
+        "created_at": Decimal(created_at),
+        "retry_cnt": Decimal(random.randrange(3)),
+    }
+
+
+def compare(
+    name: str, size: int, candidates: List[Tuple[str, Callable[[], Any]]], repeat: int
+) -> List[List[Any]]:
+    """量測每個序列化方式並驗證輸出等價，最後一列附上相對第一列的加速倍數"""
+    outputs = [json.loads(func()) for _, func in candidates]
+    assert all(output == outputs[0] for output in outputs), f"{name} outputs differ"
+
+    rows: List[List[Any]] = []
+    for method, func in candidates:
+        stats = summarize(time_calls(func, repeat))
+        rows.append([name, size, method, stats["p50"], stats["p99"], ""])
+    if rows[-1][3]:
+        rows[-1][-1] = f"{rows[0][3] / rows[-1][3]:.1f}x"
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=parse_sizes, default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=50, help="每種資料量的重複次數")
+    args = parser.parse_args()
+
+    with dynamodb_stand_in():
+        from fastapi.responses import JSONResponse, ORJSONResponse
+
+        from eks_handler import main as eks_main
+        from lambdas.query_result_lambda import app
+
+        if app.orjson is None:
+            raise SystemExit("orjson is not installed")
+
+        rows: List[List[Any]] = []
+        for size in args.sizes:
+            raw_items = [generate_item(i) for i in range(size)]
+            formatted = app.format_notification_items(raw_items)
+
+            for name, items in [("lambda raw", raw_items), ("lambda formatted", formatted)]:
+                body = {"success": True, "count": size, "items": items}
+                candidates: List[Tuple[str, Callable[[], Any]]] = [
+                    ("json", lambda b=body: json.dumps(b, default=app.decimal_to_int)),
+                    ("orjson", lambda b=body: app.dumps_json(b)),
+                ]
+                rows.extend(compare(name, size, candidates, args.repeat))
+
+            result = eks_main.QueryResult(
+                success=True,
+                data=eks_main.NOTIFICATION_RECORDS_ADAPTER.validate_python(formatted),
+                total_count=size,
+            )
+            content = result.model_dump(mode="json")
+            candidates = [
+                ("JSONResponse", lambda: JSONResponse(content).body),
+                ("ORJSONResponse", lambda: ORJSONResponse(content).body),
+            ]
+            rows.extend(compare("eks QueryResult", size, candidates, args.repeat))
+
+    print()
+    print_table(["payload", "items", "serializer", "p50 ms", "p99 ms", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Stream 記錄記憶體與配置量比較：dict-based dataclass + QueryRecord 轉換 vs __slots__ 直接寫入
+
+以一批 stream 記錄（預設 10,000 筆，約為 Lambda 單次批次上限）解析後的欄位值，比較：
+
+- legacy：沒有 __slots__ 的 CommandRecord / QueryRecord，逐筆 transform_to_query_record 後
+  再 build_query_item
+- slots：目前的 CommandRecord（__slots__），直接交給 build_query_item
+
+輸出整批記錄在寫入期間常駐的記憶體、處理過程的 tracemalloc 峰值、處理結束時仍存活的
+記憶體區塊數與 p50 / p99，並驗證兩者產生的寫入 item 相同。
+
+使用方式：
+    python benchmarks/bench_record_memory.py --sizes 1000,10000 --repeat 10
+"""
+
+import argparse
+import dataclasses
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from _common import dynamodb_stand_in, parse_sizes, print_table, summarize, time_calls
+from bench_stream_decode import generate_image
+
+
+def legacy_class(cls: Any) -> Any:
+    """以相同欄位重建沒有 __slots__ 的 dataclass（舊版記錄型別）"""
+    return dataclasses.make_dataclass(
+        f"Legacy{cls.__name__}",
+        [
+            (
+                (f.name, f.type)
+                if f.default is dataclasses.MISSING
+                else (f.name, f.type, dataclasses.field(default=f.default))
+            )
+            for f in dataclasses.fields(cls)
+        ],
+    )
+
+
+def measure_memory(func: Callable[[], Any]) -> Tuple[int, int, int]:
+    """回傳 (結果常駐 bytes, 峰值 bytes, 結果佔用的區塊數)"""
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        snapshot_before = tracemalloc.take_snapshot()
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot_after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in snapshot_after.compare_to(snapshot_before, "filename"))
+    del result
+    return current - before, peak - before, blocks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=parse_sizes, default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=10, help="每種資料量的重複次數")
+    args = parser.parse_args()
+
+    with dynamodb_stand_in():
+        from lambdas.stream_processor_lambda import app
+
+        legacy_command = legacy_class(app.CommandRecord)
+        legacy_query = legacy_class(app.QueryRecord)
+        query_fields = [f.name for f in dataclasses.fields(app.QueryRecord)]
+
+        def legacy_records(batch: List[Dict[str, Any]]) -> List[Any]:
+            commands = [legacy_command(**values) for values in batch]
+            return [
+                legacy_query(**{name: getattr(command, name) for name in query_fields})
+                for command in commands
+            ]
+
+        def slotted_records(batch: List[Dict[str, Any]]) -> List[Any]:
+            return [app.CommandRecord(**values) for values in batch]
+
+        candidates: List[Tuple[str, Callable[[List[Dict[str, Any]]], List[Any]]]] = [
+            ("legacy", legacy_records),
+            ("slots", slotted_records),
+        ]
+
+        rows: List[List[Any]] = []
+        for size in args.sizes:
+            batch = [
+                {f.name: getattr(record, f.name) for f in dataclasses.fields(app.CommandRecord)}
+                for record in (app.parse_command_record(generate_image(i)) for i in range(size))
+            ]
+            items = [
+                [app.build_query_item(record) for record in build(batch)] for _, build in candidates
+            ]
+            assert all(output == items[0] for output in items), "write items differ"
+
+            for method, build in candidates:
+
+                def run(b: Callable[[List[Dict[str, Any]]], List[Any]] = build) -> Any:
+                    records = b(batch)
+                    return records, [app.build_query_item(record) for record in records]
+
+                records_bytes, _, _ = measure_memory(lambda b=build: b(batch))
+                _, peak_bytes, blocks = measure_memory(run)
+                stats = summarize(time_calls(run, args.repeat))
+                rows.append(
+                    [
+                        size,
+                        method,
+                        records_bytes // 1024,
+                        peak_bytes // 1024,
+                        blocks,
+                        stats["p50"],
+                        stats["p99"],
+                    ]
+                )
+
+    print()
+    print_table(["records", "method", "records KB", "peak KB", "blocks", "p50 ms", "p99 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
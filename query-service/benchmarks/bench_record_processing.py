@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+EKS QueryService 記錄處理效能比較：完整驗證 vs 信任上游 schema 版本
+
+以模擬的 Internal API 回應（query_result_lambda 已格式化的記錄）呼叫
+QueryService.query_failed_notifications，比較：
+
+- strict：回應不帶 schema_version（或 STRICT_RECORD_VALIDATION=true），
+  每筆記錄重新轉換 UTC+8 字串並以 Pydantic 完整驗證
+- trusted：回應帶有 schema_version，不重新轉換，整批以 TypeAdapter 驗證
+
+兩者都包含 FastAPI 對 response model 的驗證與序列化，輸出每次請求的 p50 / p99 與節省的 CPU 時間。
+
+使用方式：
+    python benchmarks/bench_record_processing.py --sizes 100,5000 --repeat 50
+"""
+
+import argparse
+import asyncio
+import random
+from typing import Any, Dict, List
+
+from _common import parse_sizes, print_table, summarize, time_calls
+
+BASE_TS = 1704038400000
+
+
+def generate_formatted_item(i: int, main: Any) -> Dict[str, Any]:
+    """產生一筆 query_result_lambda 格式化後的失敗推播記錄"""
+    created_at = BASE_TS + random.randrange(3600 * 1000)
+    failed_ts = created_at + random.randrange(5000)
+    return {
+        "transaction_id": f"txn-{i:08d}",
+        "token": f"device-token-{i:08d}",
+        "platform": random.choice(["IOS", "ANDROID", "WEBPUSH"]),
+        "notification_title": "Payment Confirmation",
+        "notification_body": "Your payment has been processed successfully",
+        "status": "FAILED",
+        "failed_ts": failed_ts,
+        "ap_id": "payment-service",
+        "created_at": created_at,
+        "retry_cnt": random.randrange(3),
+        "failed_time_utc8": main.convert_timestamp_to_utc8_string(failed_ts),
+        "created_time_utc8": main.convert_timestamp_to_utc8_string(created_at),
+    }
+
+
+class StubAdapter:
+    """回傳固定內容的 Internal API adapter"""
+
+    def __init__(self, response: Dict[str, Any]) -> None:
+        self.response = response
+
+    async def invoke_failed_query(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return self.response
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=parse_sizes, default=[100, 5000])
+    parser.add_argument("--repeat", type=int, default=50, help="每種資料量的請求次數")
+    args = parser.parse_args()
+
+    from eks_handler import main as eks_main
+
+    loop = asyncio.new_event_loop()
+    rows: List[List[Any]] = []
+    for size in args.sizes:
+        items = [generate_formatted_item(i, eks_main) for i in range(size)]
+        p50: Dict[str, float] = {}
+        modes = [("strict", None), ("trusted", eks_main.NOTIFICATION_SCHEMA_VERSION)]
+        for mode, schema_version in modes:
+            response = {"success": True, "items": items, "schema_version": schema_version}
+            service = eks_main.QueryService(StubAdapter(response))  # type: ignore[arg-type]
+
+            def handle_request() -> None:
+                result = loop.run_until_complete(service.query_failed_notifications())
+                # FastAPI 依 response model 驗證並序列化回應
+                eks_main.QueryResult.model_validate(result.model_dump()).model_dump_json()
+
+            stats = summarize(time_calls(handle_request, args.repeat))
+            p50[mode] = stats["p50"]
+            rows.append([size, mode, stats["p50"], stats["p99"], ""])
+
+        rows[-1][-1] = f"{p50['strict'] - p50['trusted']:.2f} ms"
+    loop.close()
+
+    print()
+    print_table(["items", "mode", "p50 ms", "p99 ms", "saved / request"], rows)
+
+
+if __name__ == "__main__":
+    main()
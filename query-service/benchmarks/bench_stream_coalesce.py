@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+突發 stream 寫入合併比較：逐事件寫入 vs 同一主鍵合併為最終狀態
+
+產生突發的推播狀態變化 stream：每則推播在同一批次內依序出現 INSERT 與數個 MODIFY
+（SENT → FAILED → DELIVERED、retry_cnt 遞增），以 lambda_handler 處理並比較：
+
+- per event：PROJECTION_COALESCE_WRITES=false，每個事件各自寫入（PutItem / UpdateItem）
+- coalesced：同一主鍵的事件合併為一次最終狀態的寫入
+
+輸出每批次的寫入 API 呼叫數、合併的記錄數與批次延遲，並驗證兩者寫出的投影相同。
+
+使用方式：
+    python benchmarks/bench_stream_coalesce.py --sizes 100,1000 --burst 3 --rtt-ms 5
+"""
+
+import argparse
+import sys
+import time
+from typing import Any, Dict, List
+
+from _common import (
+    READ_TABLE_NAME,
+    add_simulated_rtt,
+    create_read_table,
+    dynamodb_stand_in,
+    generate_stream_record,
+    get_dynamodb_resource,
+    parse_sizes,
+    print_table,
+)
+
+# 合併情境：(名稱, PROJECTION_COALESCE_WRITES)
+SCENARIOS = [("per event", False), ("coalesced", True)]
+
+WRITE_OPERATIONS = ("PutItem", "UpdateItem", "DeleteItem", "BatchWriteItem")
+
+
+def generate_bursty_records(notifications: int, burst: int) -> List[Dict[str, Any]]:
+    """每則推播產生一個 INSERT 與 burst - 1 個 MODIFY，同一批次內交錯出現"""
+    records: List[Dict[str, Any]] = []
+    images = [generate_stream_record(i)["dynamodb"]["NewImage"] for i in range(notifications)]
+    for step in range(burst):
+        for i, old in enumerate(images):
+            sequence_number = str(100000 + step * notifications + i)
+            if step == 0:
+                records.append(
+                    {
+                        "eventName": "INSERT",
+                        "dynamodb": {"NewImage": old, "SequenceNumber": sequence_number},
+                    }
+                )
+                continue
+            new = dict(old, retry_cnt={"N": str(step)})
+            if step < burst - 1:
+                new.update(status={"S": "FAILED"}, error_msg={"S": "Delivery timeout"})
+            else:
+                new["status"] = {"S": "DELIVERED"}
+                new.pop("error_msg", None)
+            records.append(
+                {
+                    "eventName": "MODIFY",
+                    "dynamodb": {
+                        "OldImage": old,
+                        "NewImage": new,
+                        "SequenceNumber": sequence_number,
+                    },
+                }
+            )
+            images[i] = new
+    return records
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=parse_sizes, default=[100, 1000], help="每批次的推播數")
+    parser.add_argument("--burst", type=int, default=3, help="每則推播在批次內的事件數")
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="模擬的每次呼叫往返延遲")
+    parser.add_argument("--endpoint-url", default=None, help="DynamoDB Local / LocalStack")
+    args = parser.parse_args()
+
+    with dynamodb_stand_in(args.endpoint_url):
+        from lambdas.stream_processor_lambda import app
+
+        dynamodb = get_dynamodb_resource(args.endpoint_url)
+        table = create_read_table(dynamodb)
+        add_simulated_rtt(dynamodb, args.rtt_ms)
+        app._dynamodb = dynamodb
+        app.READ_TABLE_NAME = READ_TABLE_NAME
+
+        calls = {"writes": 0}
+
+        def count_write(**kwargs: Any) -> None:
+            calls["writes"] += 1
+
+        for operation in WRITE_OPERATIONS:
+            dynamodb.meta.client.meta.events.register(
+                f"before-call.dynamodb.{operation}", count_write
+            )
+
+        rows: List[List[Any]] = []
+        for size in args.sizes:
+            print(f"Processing {size:,} notifications x {args.burst} events...", file=sys.stderr)
+            event = {"Records": generate_bursty_records(size, args.burst)}
+            projections = []
+            for name, coalesce in SCENARIOS:
+                app.PROJECTION_COALESCE_WRITES = coalesce
+                app._applied_versions.clear()
+                calls["writes"] = 0
+                start = time.perf_counter()
+                result = app.lambda_handler(event, None)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                writes = calls["writes"]
+                assert not result["batchItemFailures"]
+
+                items = table.scan(ConsistentRead=True)["Items"]
+                projections.append(sorted(items, key=lambda item: item["transaction_id"]))
+                with table.batch_writer() as batch:
+                    for item in items:
+                        batch.delete_item(
+                            Key={"user_id": item["user_id"], "created_at": item["created_at"]}
+                        )
+
+                rows.append(
+                    [
+                        len(event["Records"]),
+                        name,
+                        writes,
+                        result["coalescedRecords"],
+                        elapsed_ms,
+                    ]
+                )
+            assert all(p == projections[0] for p in projections), "projections differ"
+
+        print()
+        print_table(["records", "scenario", "write calls", "coalesced", "batch ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
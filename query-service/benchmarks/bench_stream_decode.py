@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Stream image 解碼比較：逐欄 extract_value vs 欄位表單次解碼
+
+將模擬的 DynamoDB Stream NewImage 轉換為 CommandRecord，比較：
+
+- legacy：舊版 parse_command_record，每個欄位呼叫一次 extract_value
+  （13 次 dict 查找 + try/except），並以暫時的 list 檢查必要欄位
+- compiled：目前的 parse_command_record，依欄位表單次走訪 NewImage
+
+輸出每種資料量下的 images/sec 與 p50 / p99，並驗證兩者解析出的 CommandRecord 相同。
+
+使用方式：
+    python benchmarks/bench_stream_decode.py --sizes 10000,100000 --repeat 5
+"""
+
+import argparse
+from typing import Any, Callable, Dict, List, Tuple
+
+from _common import (
+    dynamodb_stand_in,
+    generate_stream_record,
+    parse_sizes,
+    print_table,
+    summarize,
+    time_calls,
+)
+
+
+def legacy_parse_command_record(dynamo_record: Dict[str, Any], app: Any) -> Any:
+    """舊版逐欄解析實作，作為比較基準"""
+
+    def extract_value(item: Dict[str, Any], key: str, default: Any = None) -> Any:
+        if key not in item:
+            return default
+
+        dynamo_value = item[key]
+        try:
+            if "S" in dynamo_value:
+                return dynamo_value["S"]
+            elif "N" in dynamo_value:
+                return int(dynamo_value["N"])
+            elif "BOOL" in dynamo_value:
+                return dynamo_value["BOOL"]
+            else:
+                return default
+        except (ValueError, KeyError):
+            return default
+
+    status_str = extract_value(dynamo_record, "status")
+    platform_str = extract_value(dynamo_record, "platform")
+
+    transaction_id = extract_value(dynamo_record, "transaction_id")
+    created_at = extract_value(dynamo_record, "created_at")
+    user_id = extract_value(dynamo_record, "user_id")
+    notification_title = extract_value(dynamo_record, "notification_title")
+
+    if not all([transaction_id, created_at, user_id, notification_title]):
+        missing_fields = [
+            field
+            for field, value in [
+                ("transaction_id", transaction_id),
+                ("created_at", created_at),
+                ("user_id", user_id),
+                ("notification_title", notification_title),
+            ]
+            if not value
+        ]
+        raise ValueError(f"Missing required fields: {missing_fields}")
+
+    return app.CommandRecord(
+        transaction_id=transaction_id,
+        created_at=created_at,
+        user_id=user_id,
+        marketing_id=extract_value(dynamo_record, "marketing_id"),
+        notification_title=notification_title,
+        status=app.NotificationStatus(status_str) if status_str else app.NotificationStatus.SENT,
+        platform=app.Platform(platform_str) if platform_str else app.Platform.IOS,
+        device_token=extract_value(dynamo_record, "device_token"),
+        payload=extract_value(dynamo_record, "payload"),
+        error_msg=extract_value(dynamo_record, "error_msg"),
+        ap_id=extract_value(dynamo_record, "ap_id"),
+        sns_id=extract_value(dynamo_record, "sns_id"),
+        retry_cnt=extract_value(dynamo_record, "retry_cnt", 0),
+    )
+
+
+def generate_image(i: int) -> Dict[str, Any]:
+    """產生一筆 NewImage，欄位組合接近實際的推播命令記錄"""
+    image: Dict[str, Any] = generate_stream_record(i)["dynamodb"]["NewImage"]
+    image.update(
+        {
+            "device_token": {"S": f"device-token-{i:08d}"},
+            "payload": {"S": '{"deep_link": "app://payments"}'},
+            "sns_id": {"S": f"sns-{i:08d}"},
+            "retry_cnt": {"N": str(i % 3)},
+        }
+    )
+    if i % 10 == 0:
+        image["status"] = {"S": "FAILED"}
+        image["error_msg"] = {"S": "Device token invalid"}
+    return image
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=parse_sizes, default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5, help="每種資料量的重複次數")
+    args = parser.parse_args()
+
+    with dynamodb_stand_in():
+        from lambdas.stream_processor_lambda import app
+
+        candidates: List[Tuple[str, Callable[[Dict[str, Any]], Any]]] = [
+            ("legacy", lambda image: legacy_parse_command_record(image, app)),
+            ("compiled", app.parse_command_record),
+        ]
+
+        rows: List[List[Any]] = []
+        for size in args.sizes:
+            images = [generate_image(i) for i in range(size)]
+            outputs = [[parse(image) for image in images] for _, parse in candidates]
+            assert all(output == outputs[0] for output in outputs), "parsed records differ"
+
+            size_rows: List[List[Any]] = []
+            for method, parse in candidates:
+                stats = summarize(
+                    time_calls(lambda p=parse: [p(image) for image in images], args.repeat)
+                )
+                images_per_sec = int(size / (stats["p50"] / 1000)) if stats["p50"] else 0
+                size_rows.append([size, method, images_per_sec, stats["p50"], stats["p99"], ""])
+            if size_rows[-1][3]:
+                size_rows[-1][-1] = f"{size_rows[0][3] / size_rows[-1][3]:.1f}x"
+            rows.extend(size_rows)
+
+    print()
+    print_table(["images", "method", "images/sec", "p50 ms", "p99 ms", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+MODIFY 事件寫入量比較：每次 MODIFY 整筆 PutItem vs 差異 UpdateItem
+
+產生模擬的推播狀態變化 stream（SENT → DELIVERED / FAILED、retry_cnt 遞增，另有一部分 MODIFY
+只變更 device_token、payload 等未投影的欄位），以 to_projection_write 轉換後比較：
+
+- full put：每個 MODIFY 都以 NewImage 整筆寫入投影
+- diff update：只 SET / REMOVE 變更的投影屬性，未變更投影的 MODIFY 不寫入
+
+輸出寫入次數、寫入請求中的屬性資料量（bytes）與估算 WCU。
+注意：UpdateItem 的 WCU 以更新前後較大的 item 大小計算，差異更新節省的是請求大小；
+WCU 的節省來自略過未變更投影的 MODIFY。
+
+使用方式：
+    python benchmarks/bench_stream_modify.py --sizes 1000,10000 --unprojected-rate 0.5
+"""
+
+import argparse
+import math
+import random
+from typing import Any, Dict, List
+
+from _common import dynamodb_stand_in, estimate_item_size, parse_sizes, print_table
+from bench_stream_decode import generate_image
+
+
+def generate_modify_records(size: int, unprojected_rate: float) -> List[Dict[str, Any]]:
+    """產生 MODIFY stream 記錄，OldImage 為前一個狀態"""
+    records = []
+    for i in range(size):
+        old = generate_image(i)
+        old["status"] = {"S": "SENT"}
+        old.pop("error_msg", None)
+        new = dict(old)
+        if random.random() < unprojected_rate:
+            new["device_token"] = {"S": f"rotated-token-{i:08d}"}
+            new["payload"] = {"S": '{"deep_link": "app://payments/v2"}'}
+        elif i % 3 == 0:
+            new["status"] = {"S": "FAILED"}
+            new["error_msg"] = {"S": "Device token invalid"}
+            new["retry_cnt"] = {"N": str(int(old["retry_cnt"]["N"]) + 1)}
+        else:
+            new["status"] = {"S": "DELIVERED"}
+        records.append(
+            {
+                "eventName": "MODIFY",
+                "dynamodb": {"OldImage": old, "NewImage": new, "SequenceNumber": str(i + 1)},
+            }
+        )
+    return records
+
+
+def write_units(item_bytes: int) -> int:
+    """每 1KB 一個 WCU"""
+    return max(1, math.ceil(item_bytes / 1024))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=parse_sizes, default=[1000, 10000])
+    parser.add_argument(
+        "--unprojected-rate", type=float, default=0.5, help="只變更未投影欄位的 MODIFY 比例"
+    )
+    args = parser.parse_args()
+
+    with dynamodb_stand_in():
+        from lambdas.stream_processor_lambda import app
+
+        rows: List[List[Any]] = []
+        for size in args.sizes:
+            records = generate_modify_records(size, args.unprojected_rate)
+
+            full_items = [
+                app.build_query_item(app.parse_command_record(record["dynamodb"]["NewImage"]))
+                for record in records
+            ]
+            full_bytes = sum(estimate_item_size(item) for item in full_items)
+            full_wcu = sum(write_units(estimate_item_size(item)) for item in full_items)
+
+            writes = [app.to_projection_write(record) for record in records]
+            updates = [write for write in writes if isinstance(write, app.ProjectionUpdate)]
+            update_bytes = sum(
+                estimate_item_size(update.set_attributes)
+                + sum(len(name) for name in update.remove_attributes)
+                for update in updates
+            )
+            update_wcu = sum(write_units(estimate_item_size(update.item)) for update in updates)
+
+            rows.append([size, "full put", len(full_items), full_bytes, full_wcu])
+            rows.append([size, "diff update", len(updates), update_bytes, update_wcu])
+
+    print()
+    print_table(["MODIFY events", "method", "writes", "request bytes", "est. WCU"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+stream_processor_lambda 並行度比較：不同 STREAM_PROCESSOR_PARALLELISM 下的批次延遲
+
+以 100 / 1000 筆的模擬 stream 批次呼叫 lambda_handler，輸出每種並行度的
+批次延遲 p50 / p99。記錄依投影主鍵（user_id, created_at）分 lane，同一 lane 內依序寫入。
+
+moto 沒有網路往返成本，建議搭配 --rtt-ms 模擬每次 API 呼叫的延遲，
+或用 --endpoint-url 指向 DynamoDB Local / LocalStack。
+
+使用方式：
+    python benchmarks/bench_stream_parallelism.py --sizes 100,1000 --parallelism 1,4,8 --rtt-ms 5
+"""
+
+import argparse
+import sys
+from typing import Any, Dict
+
+from _common import (
+    READ_TABLE_NAME,
+    add_simulated_rtt,
+    create_read_table,
+    dynamodb_stand_in,
+    generate_stream_record,
+    get_dynamodb_resource,
+    parse_sizes,
+    print_table,
+    summarize,
+    time_calls,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=parse_sizes, default=[100, 1000])
+    parser.add_argument("--parallelism", type=parse_sizes, default=[1, 2, 4, 8])
+    parser.add_argument("--runs", type=int, default=10, help="每種組合的批次次數")
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="模擬的每次呼叫往返延遲")
+    parser.add_argument("--endpoint-url", default=None, help="DynamoDB Local / LocalStack")
+    args = parser.parse_args()
+
+    with dynamodb_stand_in(args.endpoint_url):
+        from lambdas.stream_processor_lambda import app
+
+        dynamodb = get_dynamodb_resource(args.endpoint_url)
+        create_read_table(dynamodb)
+        add_simulated_rtt(dynamodb, args.rtt_ms)
+        app._dynamodb = dynamodb
+        app.READ_TABLE_NAME = READ_TABLE_NAME
+
+        rows = []
+        for size in args.sizes:
+            event: Dict[str, Any] = {"Records": [generate_stream_record(i) for i in range(size)]}
+            for parallelism in args.parallelism:
+                print(f"{size:,} records, parallelism {parallelism}...", file=sys.stderr)
+                app.STREAM_PROCESSOR_PARALLELISM = parallelism
+                if app._executor is not None:
+                    app._executor.shutdown()
+                app._executor = None
+
+                def run_batch() -> None:
+                    # 每次都模擬新容器收到的批次，否則本地版本快取會略過所有寫入
+                    app._applied_versions.clear()
+                    result = app.lambda_handler(event, None)
+                    assert not result["batchItemFailures"]
+
+                stats = summarize(time_calls(run_batch, args.runs))
+                rows.append([size, parallelism, stats["p50"], stats["p99"]])
+
+        print()
+        print_table(["records", "parallelism", "p50 ms", "p99 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
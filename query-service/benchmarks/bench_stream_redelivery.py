@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Stream 重送成本比較：批次寫入（讀取已存版本）vs 條件式寫入 vs 暖容器本地快取
+
+先以 lambda_handler 處理一批模擬 stream 記錄，再把同一批記錄重送一次（模擬 Lambda 重試），
+量測重送時的寫入行為：
+
+- batch (cold)：預設的 BatchWriteItem，新容器沒有本地快取，先以 BatchGetItem 讀取已存的版本，
+  重送的記錄不寫入
+- batch (warm)：預設的 BatchWriteItem，同一個容器重送，本地版本快取直接略過，不送出任何寫入
+- conditional (cold)：PROJECTION_CONDITIONAL_WRITES=true，新容器每筆送出條件式 PutItem，
+  由 DynamoDB 拒絕
+- conditional (warm)：同一個容器重送，本地版本快取直接略過，不送出任何寫入
+
+輸出重送批次的 API 呼叫數、實際覆寫的筆數、略過的重複筆數與批次延遲。
+注意：被條件拒絕的寫入仍會消耗 WCU；批次寫入改為每筆約 1 RCU 的讀取，暖容器的本地快取則兩者都省下。
+
+使用方式：
+    python benchmarks/bench_stream_redelivery.py --sizes 100,1000 --rtt-ms 5
+"""
+
+import argparse
+import sys
+import time
+from typing import Any, Dict, List
+
+from _common import (
+    READ_TABLE_NAME,
+    add_simulated_rtt,
+    create_read_table,
+    dynamodb_stand_in,
+    generate_stream_record,
+    get_dynamodb_resource,
+    parse_sizes,
+    print_table,
+)
+
+# 重送情境：(名稱, 條件式寫入, 重送前是否清空本地快取)
+SCENARIOS = [
+    ("batch (cold)", False, True),
+    ("batch (warm)", False, False),
+    ("conditional (cold)", True, True),
+    ("conditional (warm)", True, False),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=parse_sizes, default=[100, 1000])
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="模擬的每次呼叫往返延遲")
+    parser.add_argument("--endpoint-url", default=None, help="DynamoDB Local / LocalStack")
+    args = parser.parse_args()
+
+    with dynamodb_stand_in(args.endpoint_url):
+        from lambdas.stream_processor_lambda import app
+
+        dynamodb = get_dynamodb_resource(args.endpoint_url)
+        create_read_table(dynamodb)
+        add_simulated_rtt(dynamodb, args.rtt_ms)
+        app._dynamodb = dynamodb
+        app.READ_TABLE_NAME = READ_TABLE_NAME
+
+        calls: Dict[str, int] = {"PutItem": 0, "BatchWriteItem": 0, "BatchGetItem": 0}
+
+        def count_call(event_name: str, **kwargs: Any) -> None:
+            operation = event_name.rsplit(".", 1)[-1]
+            if operation in calls:
+                calls[operation] += 1
+
+        dynamodb.meta.client.meta.events.register("before-call.dynamodb", count_call)
+
+        rows: List[List[Any]] = []
+        for size in args.sizes:
+            print(f"Redelivering {size:,} records...", file=sys.stderr)
+            for name, conditional, cold in SCENARIOS:
+                offset = len(rows) * size
+                event = {"Records": [generate_stream_record(offset + i) for i in range(size)]}
+                app.PROJECTION_CONDITIONAL_WRITES = conditional
+                app._applied_versions.clear()
+                app.lambda_handler(event, None)
+
+                if cold:
+                    app._applied_versions.clear()
+                calls.update(PutItem=0, BatchWriteItem=0, BatchGetItem=0)
+                start = time.perf_counter()
+                result = app.lambda_handler(event, None)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                assert not result["batchItemFailures"]
+
+                duplicates = result["duplicateRecords"]
+                rows.append(
+                    [
+                        size,
+                        name,
+                        sum(calls.values()),
+                        size - duplicates,
+                        duplicates,
+                        elapsed_ms,
+                    ]
+                )
+
+        print()
+        print_table(
+            ["records", "scenario", "API calls", "rewritten", "duplicates", "batch ms"], rows
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+stream_processor_lambda 寫入吞吐量比較：逐筆 put_item vs BatchWriteItem vs 條件式 put_item
+
+將模擬的 DynamoDB Stream 記錄轉換為 QueryRecord 後，比較：
+
+- 舊做法：每筆記錄呼叫一次 save_query_record（put_item）
+- 批次：batch_save_query_records 的預設行為，每 25 筆一次 BatchWriteItem，
+  另外每 100 筆一次 BatchGetItem 讀取已存的版本
+- 條件式：PROJECTION_CONDITIONAL_WRITES=true，有版本的記錄逐筆以 ConditionExpression 寫入
+
+moto 在同一行程內處理請求，沒有網路往返成本；可用 --rtt-ms 為每次 DynamoDB
+API 呼叫加上模擬的往返延遲，或用 --endpoint-url 指向 DynamoDB Local / LocalStack。
+
+使用方式：
+    python benchmarks/bench_stream_writes.py --sizes 100,1000 --rtt-ms 5
+"""
+
+import argparse
+import sys
+import time
+from typing import Any, List
+
+from _common import (
+    READ_TABLE_NAME,
+    add_simulated_rtt,
+    create_read_table,
+    dynamodb_stand_in,
+    generate_stream_record,
+    get_dynamodb_resource,
+    parse_sizes,
+    print_table,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=parse_sizes, default=[100, 1000])
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="模擬的每次呼叫往返延遲")
+    parser.add_argument("--endpoint-url", default=None, help="DynamoDB Local / LocalStack")
+    args = parser.parse_args()
+
+    with dynamodb_stand_in(args.endpoint_url):
+        from lambdas.stream_processor_lambda import app
+
+        dynamodb = get_dynamodb_resource(args.endpoint_url)
+        create_read_table(dynamodb)
+        add_simulated_rtt(dynamodb, args.rtt_ms)
+        app._dynamodb = dynamodb
+        app.READ_TABLE_NAME = READ_TABLE_NAME
+
+        rows = []
+        offset = 0
+        for size in args.sizes:
+            print(f"Writing {size:,} records...", file=sys.stderr)
+            # 每輪使用尚未存在的主鍵：已存的版本相同或較新時，寫入會被略過
+            query_records: List[Any] = [
+                app.to_query_record(generate_stream_record(offset + i)) for i in range(size)
+            ]
+            fresh_records: List[Any] = [
+                app.to_query_record(generate_stream_record(offset + size + i)) for i in range(size)
+            ]
+            offset += 2 * size
+
+            # 先寫入條件式版本（表中尚無這些記錄，條件都會成立）
+            app._applied_versions.clear()
+            app.PROJECTION_CONDITIONAL_WRITES = True
+            start = time.perf_counter()
+            outcomes = app.batch_save_query_records(query_records)
+            conditional_seconds = time.perf_counter() - start
+            assert all(outcome.success and not outcome.duplicate for outcome in outcomes)
+
+            app.PROJECTION_CONDITIONAL_WRITES = False
+            start = time.perf_counter()
+            for query_record in query_records:
+                app.save_query_record(query_record)
+            loop_seconds = time.perf_counter() - start
+
+            app._applied_versions.clear()
+            start = time.perf_counter()
+            outcomes = app.batch_save_query_records(fresh_records)
+            batch_seconds = time.perf_counter() - start
+            assert all(outcome.success and not outcome.duplicate for outcome in outcomes)
+
+            loop_rate = size / loop_seconds
+            batch_rate = size / batch_seconds
+            rows.append([size, "put_item loop", loop_rate, size])
+            batch_calls = -(-size // app.BATCH_WRITE_SIZE) + -(-size // app.BATCH_GET_SIZE)
+            rows.append([size, "batch_write_item", batch_rate, batch_calls])
+            rows.append([size, "conditional put_item", size / conditional_seconds, size])
+
+        print()
+        print_table(["records", "method", "records/sec", "API calls"], rows)
+
+
+if __name__ == "__main__":
+    main()
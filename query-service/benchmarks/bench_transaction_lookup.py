@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+transaction_id 查詢效能比較：全表 scan vs key-based query
+
+在本地 DynamoDB 替身（預設 moto，可用 --endpoint-url 指向 DynamoDB Local / LocalStack）
+建立 notification-records 表，寫入指定數量的記錄後，比較：
+
+- scan + FilterExpression（跟隨 LastEvaluatedKey 讀完整張表才能得到正確結果）
+- QueryService 的 key-based 查詢（transaction_id-status-index）
+
+輸出每種資料量下的延遲（p50 / p99）與估算 RCU。
+
+使用方式：
+    python benchmarks/bench_transaction_lookup.py --sizes 10000,100000,1000000 --lookups 20
+"""
+
+import argparse
+import random
+import sys
+from typing import Any, Dict, List, Tuple
+
+from _common import (
+    dynamodb_stand_in,
+    estimate_item_size,
+    estimate_read_units,
+    get_dynamodb_resource,
+    parse_sizes,
+    print_table,
+    summarize,
+    time_calls,
+)
+
+INDEX_NAME = "transaction_id-status-index"
+
+
+def create_table(dynamodb: Any, table_name: str) -> Any:
+    """建立與線上結構相同的 notification-records 表"""
+    table = dynamodb.create_table(
+        TableName=table_name,
+        KeySchema=[
+            {"AttributeName": "user_id", "KeyType": "HASH"},
+            {"AttributeName": "created_at", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "user_id", "AttributeType": "S"},
+            {"AttributeName": "created_at", "AttributeType": "N"},
+            {"AttributeName": "transaction_id", "AttributeType": "S"},
+            {"AttributeName": "status", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": INDEX_NAME,
+                "KeySchema": [
+                    {"AttributeName": "transaction_id", "KeyType": "HASH"},
+                    {"AttributeName": "status", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+            }
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    table.wait_until_exists()
+    return table
+
+
+def generate_item(i: int) -> Dict[str, Any]:
+    """產生一筆模擬推播記錄"""
+    return {
+        "user_id": f"user-{i % 5000:05d}",
+        "created_at": 1704038400000 + i,
+        "transaction_id": f"txn-{i:08d}",
+        "token": f"device-token-{i:08d}",
+        "platform": random.choice(["IOS", "ANDROID", "WEBPUSH"]),
+        "notification_title": "Payment Confirmation",
+        "notification_body": "Your payment has been processed successfully",
+        "status": random.choice(["SENT", "DELIVERED", "FAILED"]),
+        "send_ts": 1704038400000 + i,
+        "ap_id": "payment-service",
+    }
+
+
+def load_items(table: Any, start: int, end: int) -> None:
+    """以 batch_writer 寫入 [start, end) 範圍的記錄"""
+    with table.batch_writer() as batch:
+        for i in range(start, end):
+            batch.put_item(Item=generate_item(i))
+            if (i + 1) % 50000 == 0:
+                print(f"  ...loaded {i + 1:,} items", file=sys.stderr)
+
+
+def full_scan_lookup(table: Any, transaction_id: str) -> Tuple[List[Dict[str, Any]], int]:
+    """舊做法：scan + FilterExpression，回傳 (items, scanned_count)"""
+    from boto3.dynamodb.conditions import Attr
+
+    kwargs: Dict[str, Any] = {"FilterExpression": Attr("transaction_id").eq(transaction_id)}
+    items: List[Dict[str, Any]] = []
+    scanned = 0
+    while True:
+        response = table.scan(**kwargs)
+        items.extend(response.get("Items", []))
+        scanned += response.get("ScannedCount", 0)
+        if "LastEvaluatedKey" not in response:
+            return items, scanned
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=parse_sizes, default=[10000, 100000, 1000000])
+    parser.add_argument("--lookups", type=int, default=20, help="每種資料量的查詢次數")
+    parser.add_argument("--endpoint-url", default=None, help="DynamoDB Local / LocalStack")
+    parser.add_argument("--table-name", default="bench-notification-records")
+    args = parser.parse_args()
+
+    with dynamodb_stand_in(args.endpoint_url):
+        from lambdas.query_result_lambda import app
+
+        dynamodb = get_dynamodb_resource(args.endpoint_url)
+        table = create_table(dynamodb, args.table_name)
+        service = app.QueryService(args.table_name, transaction_index_name=INDEX_NAME)
+        avg_item_size = estimate_item_size(generate_item(0))
+
+        rows = []
+        loaded = 0
+        for size in sorted(args.sizes):
+            print(f"Loading table up to {size:,} items...", file=sys.stderr)
+            load_items(table, loaded, size)
+            loaded = size
+
+            targets = [f"txn-{random.randrange(size):08d}" for _ in range(args.lookups)]
+            scan_targets = iter(targets)
+            query_targets = iter(targets)
+
+            scanned_counts: List[int] = []
+
+            def scan_once() -> None:
+                _, scanned = full_scan_lookup(table, next(scan_targets))
+                scanned_counts.append(scanned)
+
+            def query_once() -> None:
+                result = service.query_transaction_notifications(next(query_targets))
+                assert result["count"] == 1
+
+            scan_stats = summarize(time_calls(scan_once, args.lookups))
+            query_stats = summarize(time_calls(query_once, args.lookups))
+
+            scan_rcu = estimate_read_units(scanned_counts[0] * avg_item_size)
+            query_rcu = estimate_read_units(avg_item_size)
+            rows.append([size, "scan", scan_stats["p50"], scan_stats["p99"], scan_rcu])
+            rows.append([size, "query", query_stats["p50"], query_stats["p99"], query_rcu])
+
+        print()
+        print_table(["items", "method", "p50 ms", "p99 ms", "est. RCU/lookup"], rows)
+
+
+if __name__ == "__main__":
+    main()
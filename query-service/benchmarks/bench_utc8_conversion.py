@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+UTC+8 時間字串轉換效能比較：datetime.strftime vs 算術組字串 vs 每秒快取
+
+產生模擬推播記錄的毫秒時間戳（每筆記錄的 created_at / send_ts / delivered_ts /
+failed_ts 落在相近的幾秒內，記錄本身分布在 --spread-seconds 範圍），比較：
+
+- strftime：舊做法，每個時間戳建立 timezone-aware datetime 後呼叫 strftime
+- arithmetic：format_utc8_second 的算術快速路徑（不經過快取）
+- cached：convert_timestamp_to_utc8_string（每秒一筆的有界 LRU 快取）
+
+並驗證 EKS handler 與 query_result_lambda 兩份實作的輸出與 strftime 完全一致。
+
+使用方式：
+    python benchmarks/bench_utc8_conversion.py --count 1000000 --spread-seconds 86400
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime
+from typing import Any, Callable, List, Optional
+
+from _common import dynamodb_stand_in, print_table
+
+BASE_TS = 1704038400000
+
+
+def generate_timestamps(count: int, spread_seconds: int) -> List[int]:
+    """每筆記錄產生 4 個時間戳：created_at 與其後數秒內的 send / delivered / failed"""
+    timestamps: List[int] = []
+    while len(timestamps) < count:
+        created_at = BASE_TS + random.randrange(spread_seconds * 1000)
+        timestamps.append(created_at)
+        timestamps.extend(created_at + random.randrange(3000) for _ in range(3))
+    return timestamps[:count]
+
+
+def strftime_convert(timestamp: Optional[int], utc_plus_8: Any) -> Optional[str]:
+    """舊版轉換實作，作為比較基準"""
+    if timestamp is None or timestamp == 0:
+        return None
+    try:
+        dt = datetime.fromtimestamp(timestamp / 1000.0, tz=utc_plus_8)
+        return dt.strftime("%Y-%m-%d %H:%M:%S UTC+8")
+    except (ValueError, TypeError, OSError):
+        return None
+
+
+def measure(convert: Callable[[int], Optional[str]], timestamps: List[int]) -> float:
+    """回傳轉換全部時間戳的耗時（毫秒）"""
+    start = time.perf_counter()
+    for timestamp in timestamps:
+        convert(timestamp)
+    return (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--count", type=int, default=1_000_000, help="時間戳數量")
+    parser.add_argument(
+        "--spread-seconds", type=int, default=86400, help="記錄分布的時間範圍（秒）"
+    )
+    args = parser.parse_args()
+
+    with dynamodb_stand_in():
+        from eks_handler import main as eks_main
+        from lambdas.query_result_lambda import app as lambda_app
+
+    timestamps = generate_timestamps(args.count, args.spread_seconds)
+    distinct_seconds = len({timestamp // 1000 for timestamp in timestamps})
+
+    for module in (eks_main, lambda_app):
+        sample = timestamps[:100_000]
+        expected = [strftime_convert(ts, module.UTC_PLUS_8) for ts in sample]
+        assert [
+            module.convert_timestamp_to_utc8_string(ts) for ts in sample
+        ] == expected, f"{module.__name__} output differs from strftime"
+
+    rows = []
+    for name, module in [("eks_handler", eks_main), ("query_result_lambda", lambda_app)]:
+        module.format_utc8_second.cache_clear()
+        uncached = module.format_utc8_second.__wrapped__
+        candidates = [
+            ("strftime", lambda ts, tz=module.UTC_PLUS_8: strftime_convert(ts, tz)),
+            ("arithmetic", lambda ts, f=uncached: f(ts // 1000)),
+            ("cached", module.convert_timestamp_to_utc8_string),
+        ]
+        for method, convert in candidates:
+            elapsed_ms = measure(convert, timestamps)
+            per_sec = len(timestamps) / (elapsed_ms / 1000) if elapsed_ms else 0.0
+            rows.append([name, method, elapsed_ms, per_sec])
+
+        info = module.format_utc8_second.cache_info()
+        print(
+            f"{name}: {distinct_seconds:,} distinct seconds, "
+            f"cache hits={info.hits:,} misses={info.misses:,} size={info.currsize:,}"
+        )
+
+    print()
+    print_table(["module", "method", "total ms", "timestamps/sec"], rows)
+
+
+if __name__ == "__main__":
+    main()
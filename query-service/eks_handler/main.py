@@ -17,16 +17,43 @@ CQRS 架構的查詢服務 - Query Side 實現
 - Web Layer: FastAPI 路由控制器
 """
 
+import asyncio
+import functools
+import json
 import logging
 import os
 import sys
+import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from datetime import UTC, datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional
+from types import ModuleType
+from typing import (
+    Annotated,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import httpx
-from fastapi import Depends, FastAPI, HTTPException, Query
-from pydantic import BaseModel, Field
+from fastapi import Depends, FastAPI, HTTPException, Query, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+orjson: Optional[ModuleType]
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 未安裝時回退到標準庫 json
+    orjson = None
 
 # 設置日誌
 logging.basicConfig(
@@ -36,23 +63,107 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # UTC+8 timezone object
+# 以下 UTC+8 格式化與 lambdas/query_result_lambda/app.py 的副本相同（兩個部署各自打包），修改時需同步兩份；
+# test_utc8_formatter_matches_eks_handler 確保兩者輸出一致
 UTC_PLUS_8 = timezone(timedelta(hours=8))
+UTC8_OFFSET_SECONDS = 8 * 3600
+
+# 每秒一筆的 UTC+8 字串快取上限
+UTC8_CACHE_SIZE = int(os.environ.get("UTC8_CACHE_SIZE", "65536"))
+
+
+def _civil_from_days(days: int) -> Tuple[int, int, int]:
+    """將 1970-01-01 起算的天數轉為 (年, 月, 日)，不需建立 datetime"""
+    days += 719468
+    era = days // 146097
+    day_of_era = days - era * 146097
+    year_of_era = (
+        day_of_era - day_of_era // 1460 + day_of_era // 36524 - day_of_era // 146096
+    ) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4 - year_of_era // 100)
+    month_index = (5 * day_of_year + 2) // 153
+    day = day_of_year - (153 * month_index + 2) // 5 + 1
+    month = month_index + 3 if month_index < 10 else month_index - 9
+    return year_of_era + era * 400 + (month <= 2), month, day
+
+
+@functools.lru_cache(maxsize=4096)
+def _utc8_date_prefix(days: int) -> Optional[str]:
+    """UTC+8 日期部分 "YYYY-MM-DD "，非四位數年份回傳 None"""
+    year, month, day = _civil_from_days(days)
+    if not 1000 <= year <= 9999:
+        return None
+    return "%04d-%02d-%02d " % (year, month, day)
+
+
+@functools.lru_cache(maxsize=UTC8_CACHE_SIZE)
+def format_utc8_second(second: int) -> Optional[str]:
+    """
+    將 Unix 秒數轉為 UTC+8 字串
+
+    輸出格式不含毫秒，因此以秒為快取 key；日期部分依天快取，時間部分以算術組字串，
+    非四位數年份交由 datetime 處理（包含超出範圍的錯誤判斷）
+    """
+    days, seconds_of_day = divmod(second + UTC8_OFFSET_SECONDS, 86400)
+    prefix = _utc8_date_prefix(days)
+    if prefix is not None:
+        hour, rest = divmod(seconds_of_day, 3600)
+        minute, sec = divmod(rest, 60)
+        return "%s%02d:%02d:%02d UTC+8" % (prefix, hour, minute, sec)
+
+    try:
+        dt = datetime.fromtimestamp(second, tz=UTC_PLUS_8)
+        return dt.strftime("%Y-%m-%d %H:%M:%S UTC+8")
+    except (ValueError, TypeError, OSError, OverflowError) as e:
+        logger.warning(f"Failed to convert timestamp {second * 1000}: {e}")
+        return None
 
 
 def convert_timestamp_to_utc8_string(timestamp: Optional[int]) -> Optional[str]:
     """Convert Unix timestamp to UTC+8 timezone string format"""
     if timestamp is None or timestamp == 0:
         return None
+    if type(timestamp) is int:
+        return format_utc8_second(timestamp // 1000)
 
     try:
-        # Convert timestamp to datetime in UTC+8
+        # 非整數（例如 float）維持原本的 datetime 轉換
         dt = datetime.fromtimestamp(timestamp / 1000.0, tz=UTC_PLUS_8)
         return dt.strftime("%Y-%m-%d %H:%M:%S UTC+8")
-    except (ValueError, TypeError, OSError) as e:
+    except (ValueError, TypeError, OSError, OverflowError) as e:
         logger.warning(f"Failed to convert timestamp {timestamp}: {e}")
         return None
 
 
+# query_result_lambda 格式化後記錄的 schema 版本；回應帶有相同版本時信任其欄位
+NOTIFICATION_SCHEMA_VERSION = "1"
+
+# 串流查詢時每次向 Internal API 讀取的筆數
+STREAM_PAGE_SIZE = int(os.environ.get("STREAM_PAGE_SIZE", "200"))
+
+# 分頁查詢單頁筆數上限，需與 query_result_lambda 的 MAX_PAGE_LIMIT 一致
+MAX_PAGE_LIMIT = int(os.environ.get("MAX_PAGE_LIMIT", "1000"))
+
+# next_token 為 query_result_lambda 產生的 URL-safe base64 字串，內容不透明
+NEXT_TOKEN_PATTERN = r"^[A-Za-z0-9_-]+$"
+
+# 回應壓縮：客戶端接受 gzip 且回應大於門檻（bytes）時才壓縮
+RESPONSE_COMPRESSION_ENABLED = (
+    os.environ.get("RESPONSE_COMPRESSION_ENABLED", "true").lower() == "true"
+)
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.environ.get("RESPONSE_COMPRESSION_MIN_SIZE", "1024"))
+
+# 端點預設的 JSON 回應類別：已安裝 orjson 時以 orjson 序列化，否則使用標準庫 json
+DEFAULT_RESPONSE_CLASS = ORJSONResponse if orjson is not None else JSONResponse
+
+
+def json_size(value: Any) -> int:
+    """估算值序列化為 JSON 後的大小，供回應快取計算容量"""
+    if orjson is not None:
+        return len(orjson.dumps(value, default=str))
+    return len(json.dumps(value, default=str))
+
+
 # ================================
 # Domain Models (領域模型)
 # ================================
@@ -82,6 +193,41 @@ class NotificationRecord(BaseModel):
     created_time_utc8: Optional[str] = Field(None, description="建立時間 (UTC+8)")
 
 
+# 信任上游記錄時整批驗證，由 pydantic-core 一次處理整個 list
+NOTIFICATION_RECORDS_ADAPTER = TypeAdapter(List[NotificationRecord])
+
+# 部分欄位的記錄在嚴格模式下逐欄驗證，沿用 NotificationRecord 各欄位的型別與限制
+NOTIFICATION_FIELD_ADAPTERS: Dict[str, TypeAdapter[Any]] = {
+    name: TypeAdapter(Annotated[field.annotation, field])  # type: ignore[arg-type]
+    for name, field in NotificationRecord.model_fields.items()
+}
+
+# 可透過 fields 參數選取的欄位，需與 query_result_lambda 的 NOTIFICATION_FIELDS 一致
+NOTIFICATION_FIELDS: Tuple[str, ...] = tuple(
+    name for name in NotificationRecord.model_fields if not name.endswith("_utc8")
+)
+
+# 時間戳欄位與對應的 UTC+8 字串欄位
+UTC8_TIME_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("send_ts", "send_time_utc8"),
+    ("delivered_ts", "delivered_time_utc8"),
+    ("failed_ts", "failed_time_utc8"),
+    ("created_at", "created_time_utc8"),
+)
+
+# fields 參數格式：以逗號分隔的欄位名稱
+_FIELD_NAME_PATTERN = "|".join(NOTIFICATION_FIELDS)
+FIELDS_PATTERN = rf"^({_FIELD_NAME_PATTERN})(,({_FIELD_NAME_PATTERN}))*$"
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """將 fields 參數轉為依 NOTIFICATION_FIELDS 排序、去重後的 tuple，未提供時回傳 None"""
+    if not fields:
+        return None
+    requested = set(fields.split(","))
+    return tuple(name for name in NOTIFICATION_FIELDS if name in requested)
+
+
 class QueryResult(BaseModel):
     """查詢結果模型"""
 
@@ -90,6 +236,7 @@ class QueryResult(BaseModel):
     message: str = ""
     total_count: int = 0
     query_info: Optional[Dict[str, Any]] = None
+    next_token: Optional[str] = None  # 尚有下一頁時，帶入下次請求以續讀
 
 
 # ================================
@@ -102,18 +249,34 @@ class QueryPort(ABC):
 
     @abstractmethod
     async def query_transaction_notifications(
-        self, transaction_id: Optional[str] = None, limit: int = 30
+        self,
+        transaction_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        next_token: Optional[str] = None,
+        fields: Optional[Tuple[str, ...]] = None,
     ) -> QueryResult:
         """查詢交易推播記錄"""
         pass  # pragma: no cover
 
     @abstractmethod
-    async def query_failed_notifications(self, transaction_id: Optional[str] = None) -> QueryResult:
+    async def query_failed_notifications(
+        self,
+        transaction_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        next_token: Optional[str] = None,
+        fields: Optional[Tuple[str, ...]] = None,
+    ) -> QueryResult:
         """查詢失敗推播記錄"""
         pass  # pragma: no cover
 
     @abstractmethod
-    async def query_sns_notifications(self, sns_id: str) -> QueryResult:
+    async def query_sns_notifications(
+        self,
+        sns_id: str,
+        limit: Optional[int] = None,
+        next_token: Optional[str] = None,
+        fields: Optional[Tuple[str, ...]] = None,
+    ) -> QueryResult:
         """查詢 SNS 推播記錄"""
         pass  # pragma: no cover
 
@@ -155,8 +318,41 @@ class InternalAPIAdapter(InternalAPIInvokerPort):
         # 設置請求超時時間
         self.timeout = int(os.environ.get("REQUEST_TIMEOUT", "5"))
 
+        # 連線池設定 - 由單一長連線 client 共用，避免每次請求重新建立 TCP/TLS 連線
+        self.limits = httpx.Limits(
+            max_connections=int(os.environ.get("HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")),
+            keepalive_expiry=float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30")),
+        )
+        self.http2 = os.environ.get("HTTP2_ENABLED", "false").lower() == "true"
+        if self.http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP2_ENABLED is set but the h2 package is missing, using HTTP/1.1")
+                self.http2 = False
+        self._client: Optional[httpx.AsyncClient] = None
+
         logger.info(f"Internal API Gateway adapter initialized with URL: {self.internal_api_url}")
-        logger.info(f"Request timeout: {self.timeout}s")
+        logger.info(
+            f"Request timeout: {self.timeout}s, HTTP/2: {self.http2}, limits: {self.limits}"
+        )
+
+    def open(self) -> httpx.AsyncClient:
+        """取得共用的 httpx.AsyncClient，尚未建立時才建立"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """關閉共用的 httpx.AsyncClient 並釋放連線池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     def _is_local_development(self) -> bool:
         """檢查是否為本地開發環境"""
@@ -190,26 +386,24 @@ class InternalAPIAdapter(InternalAPIInvokerPort):
             headers = {"Content-Type": "application/json", "User-Agent": "ECS-QueryService/1.0"}
 
             # 統一使用 GET 方法 - 所有查詢都是 GET 語義
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(url, params=payload, headers=headers)
-
-                # 記錄響應狀態
-                logger.info(f"Internal API Gateway response status: {response.status_code}")
-
-                # 檢查響應狀態
-                if response.status_code == 200:
-                    result: Dict[str, Any] = response.json()
-                    logger.info(f"Internal API Gateway response: {result}")
-                    return result
-                else:
-                    error_text = response.text
-                    logger.error(
-                        f"Internal API Gateway error: {response.status_code} - {error_text}"
-                    )
-                    raise HTTPException(
-                        status_code=502,
-                        detail=f"Internal API Gateway error: {response.status_code} - {error_text}",
-                    )
+            client = self.open()
+            response = await client.get(url, params=payload, headers=headers)
+
+            # 記錄響應狀態
+            logger.info(f"Internal API Gateway response status: {response.status_code}")
+
+            # 檢查響應狀態
+            if response.status_code == 200:
+                result: Dict[str, Any] = response.json()
+                logger.info(f"Internal API Gateway response: {result}")
+                return result
+            else:
+                error_text = response.text
+                logger.error(f"Internal API Gateway error: {response.status_code} - {error_text}")
+                raise HTTPException(
+                    status_code=502,
+                    detail=f"Internal API Gateway error: {response.status_code} - {error_text}",
+                )
 
         except httpx.TimeoutException:
             logger.error(f"Request to Internal API Gateway timed out after {self.timeout}s")
@@ -242,6 +436,137 @@ class InternalAPIAdapter(InternalAPIInvokerPort):
             raise ValueError(f"Unsupported query type: {query_type}")
 
 
+CacheKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class ResponseCache:
+    """
+    Internal API 回應快取 - 以 (endpoint, 正規化參數) 為 key
+
+    - 每個 endpoint 各自的 TTL（秒），TTL 為 0 時不快取該 endpoint
+    - LRU 淘汰，同時限制筆數與總位元組數
+    - single-flight：相同 key 的並發 miss 只會觸發一次上游呼叫
+    - 只快取 success=True 的回應
+    """
+
+    def __init__(
+        self,
+        ttls: Dict[str, float],
+        max_entries: int = 1024,
+        max_bytes: int = 16 * 1024 * 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._entries: "OrderedDict[CacheKey, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[CacheKey, "asyncio.Future[Dict[str, Any]]"] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(endpoint: str, params: Dict[str, Any]) -> CacheKey:
+        """正規化參數：忽略空值、排序並統一轉為字串"""
+        normalized = tuple(
+            sorted(
+                (name, str(value).strip())
+                for name, value in params.items()
+                if value is not None and str(value).strip() != ""
+            )
+        )
+        return endpoint, normalized
+
+    async def get_or_load(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        loader: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """取得快取的回應，miss 時呼叫 loader 並寫入快取"""
+        key = self.make_key(endpoint, params)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, size, value = entry
+            if expires_at > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self._remove(key)
+            self.expirations += 1
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except BaseException as e:
+            future.set_exception(e)
+            # 標記例外已被讀取，避免沒有等待者時出現 "exception was never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            if value.get("success", False):
+                self._store(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _store(self, key: CacheKey, value: Dict[str, Any]) -> None:
+        ttl = self.ttls.get(key[0], 0)
+        if ttl <= 0:
+            return
+        size = json_size(value)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (self._clock() + ttl, size, value)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: CacheKey) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self) -> None:
+        """清空快取內容（不重設計數器）"""
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """快取計數器，供 /metrics 端點輸出"""
+        return {
+            "enabled": True,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": dict(self.ttls),
+        }
+
+
 # ================================
 # Application Services (應用服務)
 # ================================
@@ -250,21 +575,69 @@ class InternalAPIAdapter(InternalAPIInvokerPort):
 class QueryService(QueryPort):
     """查詢應用服務實現"""
 
-    def __init__(self, internal_api_adapter: InternalAPIInvokerPort):
+    def __init__(
+        self,
+        internal_api_adapter: InternalAPIInvokerPort,
+        response_cache: Optional[ResponseCache] = None,
+    ):
         self.internal_api_adapter = internal_api_adapter
+        self.response_cache = response_cache
+        # 嚴格模式：即使上游帶有 schema 版本，仍重新轉換並完整驗證每筆記錄
+        self.strict_validation = (
+            os.environ.get("STRICT_RECORD_VALIDATION", "false").lower() == "true"
+        )
+
+    async def _invoke(
+        self,
+        endpoint: str,
+        invoker: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        payload: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """調用 Internal API，啟用快取時經由 ResponseCache"""
+        if self.response_cache is None:
+            return await invoker(payload)
+        return await self.response_cache.get_or_load(endpoint, payload, lambda: invoker(payload))
+
+    @staticmethod
+    def _page_params(
+        limit: Optional[int],
+        next_token: Optional[str],
+        fields: Optional[Tuple[str, ...]] = None,
+    ) -> Dict[str, Any]:
+        """組合分頁與欄位參數，未指定的參數不送出"""
+        params: Dict[str, Any] = {}
+        if limit is not None:
+            params["limit"] = limit
+        if next_token:
+            params["next_token"] = next_token
+        if fields:
+            params["fields"] = ",".join(fields)
+        return params
 
     async def query_transaction_notifications(
-        self, transaction_id: Optional[str] = None, limit: int = 30
+        self,
+        transaction_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        next_token: Optional[str] = None,
+        fields: Optional[Tuple[str, ...]] = None,
     ) -> QueryResult:
-        """查詢交易推播記錄 - 支持可選 transaction_id 和限制筆數"""
+        """
+        查詢交易推播記錄 - 支持可選 transaction_id 和限制筆數
+
+        指定 transaction_id 時 limit 為單頁筆數，可用回應的 next_token 續讀，未指定時回傳全部記錄；
+        未指定 transaction_id 時回傳最新的 limit 筆（預設 30）；
+        指定 fields 時只回傳這些欄位
+        """
         try:
             # ECS 應該調用 Internal API Gateway 來查詢資料
             payload: Dict[str, Any] = {}
             if transaction_id:
                 payload["transaction_id"] = transaction_id
-            payload["limit"] = limit
+            payload.update(self._page_params(limit, next_token, fields))
 
-            response_data = await self.internal_api_adapter.invoke_transaction_query(payload)
+            response_data = await self._invoke(
+                "/tx", self.internal_api_adapter.invoke_transaction_query, payload
+            )
 
             if not response_data.get("success", False):
                 logger.warning(f"Query failed: {response_data}")
@@ -275,7 +648,9 @@ class QueryService(QueryPort):
                 )
 
             items = response_data.get("items", [])
-            processed_records = await self._process_notification_records(items)
+            processed_records = await self._process_notification_records(
+                items, response_data.get("schema_version"), fields
+            )
 
             query_type = "specific" if transaction_id else "recent"
             message = response_data.get("message", f"查詢完成 ({query_type})")
@@ -289,20 +664,33 @@ class QueryService(QueryPort):
                     "query_info",
                     {"transaction_id": transaction_id, "limit": limit, "query_type": query_type},
                 ),
+                next_token=response_data.get("next_token"),
             )
 
         except Exception as e:
             logger.error(f"Error querying transaction notifications: {e}")
             raise HTTPException(status_code=500, detail=f"查詢服務錯誤: {str(e)}")
 
-    async def query_failed_notifications(self, transaction_id: Optional[str] = None) -> QueryResult:
-        """查詢失敗推播記錄"""
+    async def query_failed_notifications(
+        self,
+        transaction_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        next_token: Optional[str] = None,
+        fields: Optional[Tuple[str, ...]] = None,
+    ) -> QueryResult:
+        """
+        查詢失敗推播記錄，指定 limit 時分頁回傳，可用回應的 next_token 續讀；
+        指定 fields 時只回傳這些欄位
+        """
         try:
             payload: Dict[str, Any] = {}
             if transaction_id and transaction_id.strip():
                 payload["transaction_id"] = transaction_id
+            payload.update(self._page_params(limit, next_token, fields))
 
-            response_data = await self.internal_api_adapter.invoke_failed_query(payload)
+            response_data = await self._invoke(
+                "/fail", self.internal_api_adapter.invoke_failed_query, payload
+            )
 
             if not response_data.get("success", False):
                 logger.warning(f"Failed query failed: {response_data}")
@@ -313,24 +701,67 @@ class QueryService(QueryPort):
                 )
 
             items = response_data.get("items", [])
-            processed_records = await self._process_notification_records(items)
+            processed_records = await self._process_notification_records(
+                items, response_data.get("schema_version"), fields
+            )
 
             return QueryResult(
                 success=True,
                 data=processed_records,
                 message=response_data.get("message", "失敗記錄查詢完成"),
                 total_count=len(processed_records),
+                next_token=response_data.get("next_token"),
             )
 
         except Exception as e:
             logger.error(f"Error querying failed notifications: {e}")
             raise HTTPException(status_code=500, detail=f"查詢服務錯誤: {str(e)}")
 
-    async def query_sns_notifications(self, sns_id: str) -> QueryResult:
-        """查詢 SNS 推播記錄"""
+    async def stream_failed_notifications(
+        self, transaction_id: Optional[str] = None, page_size: int = STREAM_PAGE_SIZE
+    ) -> AsyncIterator[List[NotificationRecord]]:
+        """
+        逐頁串流失敗推播記錄
+
+        以 limit + next_token 向 Internal API 逐頁讀取，每頁處理完即交給呼叫端，
+        記憶體用量只與單頁大小有關，不隨結果總數成長
+        """
+        payload: Dict[str, Any] = {"limit": page_size}
+        if transaction_id and transaction_id.strip():
+            payload["transaction_id"] = transaction_id
+
+        while True:
+            response_data = await self.internal_api_adapter.invoke_failed_query(payload)
+            if not response_data.get("success", False):
+                logger.warning(f"Failed query page failed: {response_data}")
+                return
+
+            yield await self._process_notification_records(
+                response_data.get("items", []), response_data.get("schema_version")
+            )
+
+            next_token = response_data.get("next_token")
+            if not next_token:
+                return
+            payload = {**payload, "next_token": next_token}
+
+    async def query_sns_notifications(
+        self,
+        sns_id: str,
+        limit: Optional[int] = None,
+        next_token: Optional[str] = None,
+        fields: Optional[Tuple[str, ...]] = None,
+    ) -> QueryResult:
+        """
+        查詢 SNS 推播記錄，指定 limit 時分頁回傳，可用回應的 next_token 續讀；
+        指定 fields 時只回傳這些欄位
+        """
         try:
             payload: Dict[str, Any] = {"sns_id": sns_id}
-            response_data = await self.internal_api_adapter.invoke_sns_query(payload)
+            payload.update(self._page_params(limit, next_token, fields))
+            response_data = await self._invoke(
+                "/sns", self.internal_api_adapter.invoke_sns_query, payload
+            )
 
             if not response_data.get("success", False):
                 logger.warning(f"SNS query failed: {response_data}")
@@ -341,13 +772,16 @@ class QueryService(QueryPort):
                 )
 
             items = response_data.get("items", [])
-            processed_records = await self._process_notification_records(items)
+            processed_records = await self._process_notification_records(
+                items, response_data.get("schema_version"), fields
+            )
 
             return QueryResult(
                 success=True,
                 data=processed_records,
                 message=response_data.get("message", "SNS 推播記錄查詢完成"),
                 total_count=len(processed_records),
+                next_token=response_data.get("next_token"),
             )
 
         except Exception as e:
@@ -355,57 +789,25 @@ class QueryService(QueryPort):
             raise HTTPException(status_code=500, detail=f"查詢服務錯誤: {str(e)}")
 
     async def _process_notification_records(
-        self, items: List[Dict[str, Any]]
+        self,
+        items: List[Dict[str, Any]],
+        schema_version: Optional[str] = None,
+        fields: Optional[Tuple[str, ...]] = None,
     ) -> List[NotificationRecord]:
         """處理推播記錄並轉換時間戳為 UTC+8 格式"""
+        if fields:
+            return self._build_partial_records(items, fields)
+        if schema_version == NOTIFICATION_SCHEMA_VERSION and not self.strict_validation:
+            return self._validate_trusted_records(items)
+        return self._process_records_strict(items)
+
+    def _process_records_strict(self, items: List[Dict[str, Any]]) -> List[NotificationRecord]:
+        """逐筆重新轉換時間戳並完整驗證，無效的記錄會被略過"""
         records = []
 
         for item in items:
             try:
-                # 轉換時間戳為 UTC+8 字串
-                send_time_utc8 = convert_timestamp_to_utc8_string(item.get("send_ts"))
-                delivered_time_utc8 = convert_timestamp_to_utc8_string(item.get("delivered_ts"))
-                failed_time_utc8 = convert_timestamp_to_utc8_string(item.get("failed_ts"))
-                created_time_utc8 = convert_timestamp_to_utc8_string(item.get("created_at"))
-
-                # 處理 platform 欄位：空字符串視為 None
-                platform = item.get("platform")
-                if platform == "":
-                    platform = None
-
-                # 安全處理 retry_cnt 欄位
-                retry_cnt = item.get("retry_cnt", 0)
-                if retry_cnt is None:
-                    retry_cnt = 0
-                try:
-                    retry_cnt = int(retry_cnt)
-                except (ValueError, TypeError):
-                    retry_cnt = 0
-
-                record_data = {
-                    "transaction_id": item.get("transaction_id", ""),
-                    "token": item.get("token"),
-                    "platform": platform,
-                    "notification_title": item.get("notification_title", ""),
-                    "notification_body": item.get("notification_body", ""),
-                    "status": item.get("status", ""),
-                    "send_ts": item.get("send_ts"),
-                    "delivered_ts": item.get("delivered_ts"),
-                    "failed_ts": item.get("failed_ts"),
-                    "ap_id": str(item.get("ap_id")) if item.get("ap_id") is not None else None,
-                    "created_at": int(item.get("created_at", 0)),
-                    "sns_id": item.get("sns_id"),
-                    "retry_cnt": retry_cnt,
-                    "send_time_utc8": send_time_utc8,
-                    "delivered_time_utc8": delivered_time_utc8,
-                    "failed_time_utc8": failed_time_utc8,
-                    "created_time_utc8": created_time_utc8,
-                }
-
-                # 只保留非 None 值
-                record_data = {k: v for k, v in record_data.items() if v is not None}
-
-                record = NotificationRecord(**record_data)
+                record = NotificationRecord(**self._normalize_record(item))
                 records.append(record)
 
             except Exception as e:
@@ -414,6 +816,111 @@ class QueryService(QueryPort):
 
         return records
 
+    @staticmethod
+    def _normalize_record(item: Dict[str, Any]) -> Dict[str, Any]:
+        """重新轉換時間戳為 UTC+8 字串並正規化欄位，只保留非 None 值"""
+        # 處理 platform 欄位：空字符串視為 None
+        platform = item.get("platform")
+        if platform == "":
+            platform = None
+
+        # 安全處理 retry_cnt 欄位
+        retry_cnt = item.get("retry_cnt", 0)
+        if retry_cnt is None:
+            retry_cnt = 0
+        try:
+            retry_cnt = int(retry_cnt)
+        except (ValueError, TypeError):
+            retry_cnt = 0
+
+        record_data = {
+            "transaction_id": item.get("transaction_id", ""),
+            "token": item.get("token"),
+            "platform": platform,
+            "notification_title": item.get("notification_title", ""),
+            "notification_body": item.get("notification_body", ""),
+            "status": item.get("status", ""),
+            "send_ts": item.get("send_ts"),
+            "delivered_ts": item.get("delivered_ts"),
+            "failed_ts": item.get("failed_ts"),
+            "ap_id": str(item.get("ap_id")) if item.get("ap_id") is not None else None,
+            "created_at": int(item.get("created_at", 0)),
+            "sns_id": item.get("sns_id"),
+            "retry_cnt": retry_cnt,
+            "send_time_utc8": convert_timestamp_to_utc8_string(item.get("send_ts")),
+            "delivered_time_utc8": convert_timestamp_to_utc8_string(item.get("delivered_ts")),
+            "failed_time_utc8": convert_timestamp_to_utc8_string(item.get("failed_ts")),
+            "created_time_utc8": convert_timestamp_to_utc8_string(item.get("created_at")),
+        }
+
+        # 只保留非 None 值
+        return {k: v for k, v in record_data.items() if v is not None}
+
+    def _build_partial_records(
+        self, items: List[Dict[str, Any]], fields: Tuple[str, ...]
+    ) -> List[NotificationRecord]:
+        """
+        只保留 fields 指定的欄位（及其 UTC+8 字串）建立記錄
+
+        部分欄位的記錄缺少必填欄位，以 model_construct 建立且不做完整驗證；
+        未選取的欄位不會出現在 model_fields_set，輸出時以 exclude_unset 略過。
+        嚴格模式下與完整記錄相同重新轉換時間戳，並逐欄驗證選取的欄位，無效的記錄會被略過
+        """
+        time_fields = [(ts, tf) for ts, tf in UTC8_TIME_FIELDS if ts in fields]
+        records = []
+        for item in items:
+            if self.strict_validation:
+                selected = {name: item[name] for name in fields if item.get(name) is not None}
+                try:
+                    normalized = self._normalize_record(selected)
+                    record_data = {
+                        name: NOTIFICATION_FIELD_ADAPTERS[name].validate_python(normalized[name])
+                        for name in selected
+                        if name in normalized
+                    }
+                except Exception as e:
+                    logger.error(f"Error processing notification record: {e}, item: {item}")
+                    continue
+                for ts_field, time_field in time_fields:
+                    time_string = convert_timestamp_to_utc8_string(record_data.get(ts_field))
+                    if time_string is not None:
+                        record_data[time_field] = time_string
+                records.append(NotificationRecord.model_construct(**record_data))
+                continue
+
+            record_data = {name: item[name] for name in fields if item.get(name) is not None}
+            for ts_field, time_field in time_fields:
+                time_string = item.get(time_field) or convert_timestamp_to_utc8_string(
+                    record_data.get(ts_field)
+                )
+                if time_string is not None:
+                    record_data[time_field] = time_string
+            records.append(NotificationRecord.model_construct(**record_data))
+        return records
+
+    def _validate_trusted_records(self, items: List[Dict[str, Any]]) -> List[NotificationRecord]:
+        """
+        信任上游已格式化的記錄：不重新轉換時間與組裝欄位，整批交給 pydantic-core 驗證
+
+        批次中有記錄不符合 schema（型別、platform 等）時逐筆驗證，
+        不通過的記錄才回退到完整處理（正規化或略過），其餘記錄不受影響
+        """
+        try:
+            return NOTIFICATION_RECORDS_ADAPTER.validate_python(items)
+        except ValidationError as e:
+            logger.warning(
+                f"Trusted records failed validation ({e.error_count()} errors), "
+                "falling back to per-record validation"
+            )
+
+        records = []
+        for item in items:
+            try:
+                records.append(NotificationRecord.model_validate(item))
+            except ValidationError:
+                records.extend(self._process_records_strict([item]))
+        return records
+
 
 # ================================
 # Web Layer (Web 層 - FastAPI 路由)
@@ -433,9 +940,26 @@ class SnsQueryRequest(BaseModel):
     sns_id: str = Field(..., min_length=1, description="SNS 推播識別碼")
 
 
+def _query_response(
+    result: QueryResult, fields: Optional[Tuple[str, ...]]
+) -> Union[QueryResult, Response]:
+    """
+    組成查詢端點的回應
+
+    未指定 fields 時直接回傳 QueryResult；指定時記錄只含部分欄位，
+    不經 response model 驗證，直接輸出已設定的欄位
+    """
+    if not fields:
+        return result
+    content = result.model_dump(mode="json", exclude={"data"})
+    content["data"] = [record.model_dump(mode="json", exclude_unset=True) for record in result.data]
+    return DEFAULT_RESPONSE_CLASS(content=content)
+
+
 # 全局單例實例
 _internal_api_adapter: Optional[InternalAPIAdapter] = None
 _query_service: Optional[QueryService] = None
+_response_cache: Optional[ResponseCache] = None
 
 
 # 依賴注入
@@ -459,12 +983,86 @@ def get_internal_api_adapter() -> InternalAPIAdapter:
     return _internal_api_adapter
 
 
+def create_response_cache() -> Optional[ResponseCache]:
+    """依環境變數建立回應快取，RESPONSE_CACHE_ENABLED=false 時停用"""
+    if os.environ.get("RESPONSE_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    return ResponseCache(
+        ttls={
+            "/tx": float(os.environ.get("RESPONSE_CACHE_TTL_TX", "5")),
+            "/fail": float(os.environ.get("RESPONSE_CACHE_TTL_FAIL", "5")),
+            "/sns": float(os.environ.get("RESPONSE_CACHE_TTL_SNS", "30")),
+        },
+        max_entries=int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1024")),
+        max_bytes=int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    )
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """獲取回應快取單例；測試環境中除非設定為 production，否則不快取以免影響 Mock"""
+    global _response_cache
+    if "pytest" in sys.modules and os.environ.get("ENVIRONMENT", "development") != "production":
+        return None
+    if _response_cache is None:
+        _response_cache = create_response_cache()
+    return _response_cache
+
+
 def get_query_service(
     internal_api_adapter: InternalAPIAdapter = Depends(get_internal_api_adapter),
 ) -> QueryService:
     """獲取查詢服務實例，總是使用最新的internal_api_adapter以支持測試"""
-    return QueryService(internal_api_adapter)
+    return QueryService(internal_api_adapter, get_response_cache())
+
+
+async def startup_event() -> None:
+    """應用啟動時初始化服務"""
+    logger.info("Initializing ECS services...")
+    # 預先初始化 Internal API adapter 與共用連線池
+    adapter = get_internal_api_adapter()
+    adapter.open()
+    logger.info(f"ECS services initialized successfully with adapter: {adapter}")
+
+
+async def shutdown_event() -> None:
+    """應用關閉時釋放 Internal API adapter 的連線池"""
+    if _internal_api_adapter is not None:
+        await _internal_api_adapter.aclose()
+    logger.info("ECS services shut down")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """FastAPI lifespan：啟動時建立、關閉時釋放共用資源"""
+    await startup_event()
+    try:
+        yield
+    finally:
+        await shutdown_event()
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """
+    略過指定路徑的 GZip 中介層
+
+    GZip 會把串流回應壓縮後再送出，NDJSON 串流的記錄無法逐行即時到達客戶端
+    """
 
+    def __init__(
+        self, app: ASGIApp, minimum_size: int = 500, exclude_paths: Tuple[str, ...] = ()
+    ) -> None:
+        super().__init__(app, minimum_size=minimum_size)
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# 不壓縮的串流端點
+UNCOMPRESSED_PATHS: Tuple[str, ...] = ("/fail/stream",)
 
 # 初始化 FastAPI 應用
 app = FastAPI(
@@ -473,16 +1071,16 @@ app = FastAPI(
     version="4.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=DEFAULT_RESPONSE_CLASS,
 )
 
-
-@app.on_event("startup")
-async def startup_event() -> None:
-    """應用啟動時初始化服務"""
-    logger.info("Initializing ECS services...")
-    # 預先初始化 Internal API adapter 以觸發除錯日誌
-    adapter = get_internal_api_adapter()
-    logger.info(f"ECS services initialized successfully with adapter: {adapter}")
+if RESPONSE_COMPRESSION_ENABLED:
+    app.add_middleware(
+        SelectiveGZipMiddleware,
+        minimum_size=RESPONSE_COMPRESSION_MIN_SIZE,
+        exclude_paths=UNCOMPRESSED_PATHS,
+    )
 
 
 # ================================
@@ -502,6 +1100,16 @@ async def health_check() -> Dict[str, str]:
     }
 
 
+@app.get("/metrics")
+async def metrics() -> Dict[str, Any]:
+    """服務指標端點 - 回應快取的命中、未命中與淘汰計數"""
+    cache = get_response_cache()
+    return {
+        "response_cache": cache.stats() if cache is not None else {"enabled": False},
+        "timestamp": datetime.now(UTC).isoformat(),
+    }
+
+
 @app.post("/query/transaction", response_model=QueryResult, deprecated=True)
 async def query_transaction_notifications(
     request: TransactionQueryRequest, query_service: QueryService = Depends(get_query_service)
@@ -532,17 +1140,28 @@ async def query_transaction_notifications(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-@app.get("/tx")
+@app.get("/tx", response_model=QueryResult)
 async def get_transaction_notifications_by_id(
     transaction_id: Optional[str] = Query(None, min_length=1, description="交易唯一識別碼（可選）"),
-    limit: int = Query(30, ge=1, le=100, description="查詢筆數限制（1-100，預設30）"),
+    limit: Optional[int] = Query(
+        None, ge=1, le=100, description="查詢筆數限制（1-100，未指定 transaction_id 時預設30）"
+    ),
+    next_token: Optional[str] = Query(
+        None, pattern=NEXT_TOKEN_PATTERN, description="上一頁回應的 next_token（可選）"
+    ),
+    fields: Optional[str] = Query(
+        None, pattern=FIELDS_PATTERN, description="只回傳指定欄位，以逗號分隔（可選）"
+    ),
     query_service: QueryService = Depends(get_query_service),
-) -> QueryResult:
+) -> Union[QueryResult, Response]:
     """
     根據 transaction_id 查詢交易推播記錄，或查詢最新記錄 (GET 方法)
 
     - **transaction_id**: 交易唯一識別碼（可選）
-    - **limit**: 當未指定 transaction_id 時，返回最新記錄的數量限制
+    - **limit**: 指定 transaction_id 時為單頁筆數（未提供時回傳全部記錄）；
+      未指定 transaction_id 時為返回最新記錄的數量（預設 30）
+    - **next_token**: 上一頁回應的 next_token，用於續讀下一頁
+    - **fields**: 只回傳指定欄位，例如 `transaction_id,status,created_at`
     """
     if transaction_id:
         logger.info(
@@ -552,7 +1171,11 @@ async def get_transaction_notifications_by_id(
         logger.info(f"API: GET querying recent transaction notifications (limit: {limit})")
 
     try:
-        return await query_service.query_transaction_notifications(transaction_id, limit)
+        selected = parse_fields(fields)
+        result = await query_service.query_transaction_notifications(
+            transaction_id, limit, next_token, selected
+        )
+        return _query_response(result, selected)
     except HTTPException:
         raise
     except Exception as e:
@@ -581,21 +1204,37 @@ async def query_failed_notifications(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-@app.get("/fail")
+@app.get("/fail", response_model=QueryResult)
 async def get_failed_notifications(
     transaction_id: Optional[str] = Query(None, min_length=1, description="交易唯一識別碼（可選）"),
+    limit: Optional[int] = Query(
+        None, ge=1, le=MAX_PAGE_LIMIT, description="單頁筆數（可選，不指定則回傳全部）"
+    ),
+    next_token: Optional[str] = Query(
+        None, pattern=NEXT_TOKEN_PATTERN, description="上一頁回應的 next_token（可選）"
+    ),
+    fields: Optional[str] = Query(
+        None, pattern=FIELDS_PATTERN, description="只回傳指定欄位，以逗號分隔（可選）"
+    ),
     query_service: QueryService = Depends(get_query_service),
-) -> QueryResult:
+) -> Union[QueryResult, Response]:
     """
     查詢失敗推播記錄 (GET 方法)
 
     - **transaction_id**: 交易唯一識別碼（可選，如不提供則查詢所有失敗記錄）
+    - **limit**: 單頁筆數，回應帶有 next_token 時表示尚有下一頁
+    - **next_token**: 上一頁回應的 next_token，用於續讀下一頁
+    - **fields**: 只回傳指定欄位，例如 `transaction_id,status,failed_ts`
     """
     logger.info(
         f"API: GET querying failed notifications for transaction: {transaction_id or 'all'}"
     )
     try:
-        return await query_service.query_failed_notifications(transaction_id)
+        selected = parse_fields(fields)
+        result = await query_service.query_failed_notifications(
+            transaction_id, limit, next_token, selected
+        )
+        return _query_response(result, selected)
     except HTTPException:
         raise
     except Exception as e:
@@ -603,6 +1242,55 @@ async def get_failed_notifications(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+def _ndjson_lines(records: List[NotificationRecord]) -> bytes:
+    """將一頁記錄編碼為 NDJSON（每行一筆）"""
+    return "".join(record.model_dump_json() + "\n" for record in records).encode("utf-8")
+
+
+@app.get("/fail/stream")
+async def stream_failed_notifications(
+    transaction_id: Optional[str] = Query(None, min_length=1, description="交易唯一識別碼（可選）"),
+    page_size: int = Query(
+        STREAM_PAGE_SIZE, ge=1, le=MAX_PAGE_LIMIT, description="每次向上游讀取的筆數"
+    ),
+    query_service: QueryService = Depends(get_query_service),
+) -> StreamingResponse:
+    """
+    串流查詢失敗推播記錄 (NDJSON)
+
+    每行一筆推播記錄，隨上游分頁到達即送出，適合大量失敗記錄；
+    串流開始後發生的錯誤會以最後一行 `{"error": ...}` 回報
+
+    - **transaction_id**: 交易唯一識別碼（可選，如不提供則查詢所有失敗記錄）
+    - **page_size**: 每次向上游讀取的筆數
+    """
+    logger.info(f"API: streaming failed notifications for transaction: {transaction_id or 'all'}")
+    pages = query_service.stream_failed_notifications(transaction_id, page_size)
+
+    # 先讀取第一頁，讓上游錯誤仍能以正確的 HTTP 狀態碼回傳
+    try:
+        first_page = await pages.__anext__()
+    except StopAsyncIteration:
+        first_page = []
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in failed stream endpoint: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            yield _ndjson_lines(first_page)
+            async for page in pages:
+                yield _ndjson_lines(page)
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.error(f"Error while streaming failed notifications: {detail}")
+            yield (json.dumps({"error": detail}, ensure_ascii=False) + "\n").encode("utf-8")
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
 @app.post("/query/sns", response_model=QueryResult)
 async def query_sns_notifications(
     request: SnsQueryRequest, query_service: QueryService = Depends(get_query_service)
@@ -622,19 +1310,33 @@ async def query_sns_notifications(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-@app.get("/sns")
+@app.get("/sns", response_model=QueryResult)
 async def get_sns_notifications_by_id(
     sns_id: str = Query(..., min_length=1, description="SNS 推播識別碼"),
+    limit: Optional[int] = Query(
+        None, ge=1, le=MAX_PAGE_LIMIT, description="單頁筆數（可選，不指定則回傳全部）"
+    ),
+    next_token: Optional[str] = Query(
+        None, pattern=NEXT_TOKEN_PATTERN, description="上一頁回應的 next_token（可選）"
+    ),
+    fields: Optional[str] = Query(
+        None, pattern=FIELDS_PATTERN, description="只回傳指定欄位，以逗號分隔（可選）"
+    ),
     query_service: QueryService = Depends(get_query_service),
-) -> QueryResult:
+) -> Union[QueryResult, Response]:
     """
     根據 sns_id 查詢推播記錄 (GET 方法)
 
     - **sns_id**: SNS 推播識別碼
+    - **limit**: 單頁筆數，回應帶有 next_token 時表示尚有下一頁
+    - **next_token**: 上一頁回應的 next_token，用於續讀下一頁
+    - **fields**: 只回傳指定欄位，例如 `transaction_id,status,sns_id`
     """
     logger.info(f"API: GET querying SNS notifications for sns_id: {sns_id}")
     try:
-        return await query_service.query_sns_notifications(sns_id)
+        selected = parse_fields(fields)
+        result = await query_service.query_sns_notifications(sns_id, limit, next_token, selected)
+        return _query_response(result, selected)
     except HTTPException:
         raise
     except Exception as e:
@@ -658,10 +1360,12 @@ async def root() -> Dict[str, Any]:
             "transaction_query_legacy": "/query/transaction",  # Legacy - 僅支援特定交易查詢
             "failed_query": "/query/fail",
             "failed_query_get": "/fail",  # GET 方法
+            "failed_query_stream": "/fail/stream",  # NDJSON 串流
             "sns_query": "/query/sns",
             "sns_query_get": "/sns",  # GET 方法
             "docs": "/docs",
             "health": "/health",
+            "metrics": "/metrics",
         },
         "architecture": "Hexagonal Architecture with CQRS",
         "optimization": "Optimized for transaction_id based primary key queries",
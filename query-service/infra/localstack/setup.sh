@@ -11,6 +11,9 @@ echo "🚀 Setting up Query Service in LocalStack..."
 AWS_REGION=${AWS_REGION:-ap-southeast-1}
 LOCALSTACK_ENDPOINT=${LOCALSTACK_ENDPOINT:-http://localhost:4566}
 DYNAMODB_TABLE_NAME=${DYNAMODB_TABLE_NAME:-notification-records}
+COMMAND_TABLE_NAME=${COMMAND_TABLE_NAME:-command-records}
+STREAM_PROCESSOR_NAME=${STREAM_PROCESSOR_NAME:-query-service-stream_processor_lambda}
+STREAM_DLQ_NAME=${STREAM_DLQ_NAME:-stream-processor-dlq}
 
 # Colors for output
 RED='\033[0;31m'
@@ -61,16 +64,23 @@ wait_for_localstack() {
 create_dynamodb_table() {
     print_step "Creating DynamoDB table: $DYNAMODB_TABLE_NAME"
 
+    # 與 setup_docker.sh 及 query_result_lambda 預設的 TABLE_KEY_ATTRIBUTES（user_id,created_at）一致；
+    # transaction_id 查詢走 transaction_id-status-index。舊版以 transaction_id 為 key 的表需先刪除再重建
+
     aws dynamodb create-table \
         --endpoint-url $LOCALSTACK_ENDPOINT \
         --region $AWS_REGION \
         --table-name $DYNAMODB_TABLE_NAME \
         --attribute-definitions \
-            AttributeName=transaction_id,AttributeType=S \
+            AttributeName=user_id,AttributeType=S \
             AttributeName=created_at,AttributeType=N \
+            AttributeName=transaction_id,AttributeType=S \
+            AttributeName=status,AttributeType=S \
         --key-schema \
-            AttributeName=transaction_id,KeyType=HASH \
+            AttributeName=user_id,KeyType=HASH \
             AttributeName=created_at,KeyType=RANGE \
+        --global-secondary-indexes \
+            'IndexName=transaction_id-status-index,KeySchema=[{AttributeName=transaction_id,KeyType=HASH},{AttributeName=status,KeyType=RANGE}],Projection={ProjectionType=ALL}' \
         --billing-mode PAY_PER_REQUEST \
         --no-cli-pager > /dev/null 2>&1 || true
 
@@ -84,6 +94,7 @@ insert_test_data() {
     # Test data with correct schema structure
     test_items=(
         '{
+            "user_id": {"S": "test-user-001"},
             "transaction_id": {"S": "txn-test-001"},
             "created_at": {"N": "1640995200"},
             "token": {"S": "test-device-token-001"},
@@ -96,6 +107,7 @@ insert_test_data() {
             "ap_id": {"S": "payment-service"}
         }'
         '{
+            "user_id": {"S": "test-user-002"},
             "transaction_id": {"S": "txn-test-002"},
             "created_at": {"N": "1640995300"},
             "token": {"S": "test-device-token-002"},
@@ -107,6 +119,7 @@ insert_test_data() {
             "ap_id": {"S": "ecommerce-service"}
         }'
         '{
+            "user_id": {"S": "test-user-003"},
             "transaction_id": {"S": "txn-failed-001"},
             "created_at": {"N": "1640995400"},
             "token": {"S": "invalid-device-token"},
@@ -119,6 +132,7 @@ insert_test_data() {
             "ap_id": {"S": "security-service"}
         }'
         '{
+            "user_id": {"S": "test-user-004"},
             "transaction_id": {"S": "txn-failed-002"},
             "created_at": {"N": "1640995500"},
             "token": {"S": "expired-device-token"},
@@ -189,6 +203,79 @@ test_lambda_functions() {
     fi
 }
 
+# Configure stream processor retries and DLQ (if available)
+configure_stream_processor() {
+    print_step "Configuring stream processor event source mapping (if available)..."
+
+    if ! aws lambda get-function --endpoint-url $LOCALSTACK_ENDPOINT --region $AWS_REGION --function-name $STREAM_PROCESSOR_NAME > /dev/null 2>&1; then
+        print_warning "Stream processor Lambda not found - skipping"
+        return 0
+    fi
+
+    STREAM_ARN=$(aws dynamodb describe-table \
+        --endpoint-url $LOCALSTACK_ENDPOINT \
+        --region $AWS_REGION \
+        --table-name $COMMAND_TABLE_NAME \
+        --query 'Table.LatestStreamArn' \
+        --output text 2>/dev/null || echo "None")
+    if [ -z "$STREAM_ARN" ] || [ "$STREAM_ARN" = "None" ]; then
+        print_warning "Stream of $COMMAND_TABLE_NAME not found - skipping"
+        return 0
+    fi
+
+    # Records that keep failing (e.g. malformed images) go to the DLQ after the retries,
+    # instead of blocking the shard until they expire
+    DLQ_URL=$(aws sqs create-queue \
+        --endpoint-url $LOCALSTACK_ENDPOINT \
+        --region $AWS_REGION \
+        --queue-name $STREAM_DLQ_NAME \
+        --query 'QueueUrl' \
+        --output text)
+    DLQ_ARN=$(aws sqs get-queue-attributes \
+        --endpoint-url $LOCALSTACK_ENDPOINT \
+        --region $AWS_REGION \
+        --queue-url $DLQ_URL \
+        --attribute-names QueueArn \
+        --query 'Attributes.QueueArn' \
+        --output text)
+
+    RETRY_OPTIONS=(
+        --function-response-types ReportBatchItemFailures
+        --maximum-retry-attempts 3
+        --bisect-batch-on-function-error
+        --destination-config "OnFailure={Destination=$DLQ_ARN}"
+    )
+
+    MAPPING_UUID=$(aws lambda list-event-source-mappings \
+        --endpoint-url $LOCALSTACK_ENDPOINT \
+        --region $AWS_REGION \
+        --function-name $STREAM_PROCESSOR_NAME \
+        --event-source-arn $STREAM_ARN \
+        --query 'EventSourceMappings[0].UUID' \
+        --output text 2>/dev/null || echo "None")
+
+    if [ -n "$MAPPING_UUID" ] && [ "$MAPPING_UUID" != "None" ]; then
+        aws lambda update-event-source-mapping \
+            --endpoint-url $LOCALSTACK_ENDPOINT \
+            --region $AWS_REGION \
+            --uuid $MAPPING_UUID \
+            "${RETRY_OPTIONS[@]}" \
+            --no-cli-pager > /dev/null
+    else
+        aws lambda create-event-source-mapping \
+            --endpoint-url $LOCALSTACK_ENDPOINT \
+            --region $AWS_REGION \
+            --function-name $STREAM_PROCESSOR_NAME \
+            --event-source-arn $STREAM_ARN \
+            --starting-position LATEST \
+            --batch-size 10 \
+            "${RETRY_OPTIONS[@]}" \
+            --no-cli-pager > /dev/null
+    fi
+
+    print_success "Stream processor retries capped, failed records go to $STREAM_DLQ_NAME"
+}
+
 # Verify setup
 verify_setup() {
     print_step "Verifying setup..."
@@ -247,6 +334,7 @@ main() {
     create_dynamodb_table
     insert_test_data
     test_lambda_functions
+    configure_stream_processor
     verify_setup
 
     echo ""
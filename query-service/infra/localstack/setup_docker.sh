@@ -41,6 +41,11 @@ awslocal iam attach-role-policy \
     --role-name lambda-role \
     --policy-arn arn:aws:iam::aws:policy/AmazonDynamoDBFullAccess > /dev/null 2>&1 || true
 
+# 附加 SQS 權限（stream processor 的 on-failure destination）
+awslocal iam attach-role-policy \
+    --role-name lambda-role \
+    --policy-arn arn:aws:iam::aws:policy/AmazonSQSFullAccess > /dev/null 2>&1 || true
+
 echo "IAM roles created successfully."
 
 # 創建 DynamoDB 表
@@ -75,12 +80,18 @@ awslocal dynamodb create-table \
         AttributeName=created_at,AttributeType=N \
         AttributeName=marketing_id,AttributeType=S \
         AttributeName=status,AttributeType=S \
+        AttributeName=day_bucket,AttributeType=S \
+        AttributeName=failed_bucket,AttributeType=S \
+        AttributeName=transaction_id,AttributeType=S \
     --key-schema \
         AttributeName=user_id,KeyType=HASH \
         AttributeName=created_at,KeyType=RANGE \
     --global-secondary-indexes \
         'IndexName=MarketingIndex,KeySchema=[{AttributeName=marketing_id,KeyType=HASH},{AttributeName=created_at,KeyType=RANGE}],Projection={ProjectionType=ALL},ProvisionedThroughput={ReadCapacityUnits=5,WriteCapacityUnits=5}' \
         'IndexName=StatusIndex,KeySchema=[{AttributeName=status,KeyType=HASH},{AttributeName=created_at,KeyType=RANGE}],Projection={ProjectionType=ALL},ProvisionedThroughput={ReadCapacityUnits=5,WriteCapacityUnits=5}' \
+        'IndexName=day_bucket-created_at-index,KeySchema=[{AttributeName=day_bucket,KeyType=HASH},{AttributeName=created_at,KeyType=RANGE}],Projection={ProjectionType=ALL},ProvisionedThroughput={ReadCapacityUnits=5,WriteCapacityUnits=5}' \
+        'IndexName=transaction_id-status-index,KeySchema=[{AttributeName=transaction_id,KeyType=HASH},{AttributeName=status,KeyType=RANGE}],Projection={ProjectionType=ALL},ProvisionedThroughput={ReadCapacityUnits=5,WriteCapacityUnits=5}' \
+        'IndexName=failed_bucket-created_at-index,KeySchema=[{AttributeName=failed_bucket,KeyType=HASH},{AttributeName=created_at,KeyType=RANGE}],Projection={ProjectionType=ALL},ProvisionedThroughput={ReadCapacityUnits=5,WriteCapacityUnits=5}' \
     --billing-mode PAY_PER_REQUEST
 
 # 等待表格創建完成
@@ -250,13 +261,31 @@ fi
 
 echo "Lambda functions deployment completed."
 
+# 創建 stream processor 的 DLQ：重試用盡的記錄位置送到這裡，shard 繼續往下處理
+echo "Creating stream processor DLQ..."
+STREAM_DLQ_URL=$(awslocal sqs create-queue \
+    --queue-name stream-processor-dlq \
+    --query 'QueueUrl' --output text)
+STREAM_DLQ_ARN=$(awslocal sqs get-queue-attributes \
+    --queue-url $STREAM_DLQ_URL \
+    --attribute-names QueueArn \
+    --query 'Attributes.QueueArn' --output text)
+
+echo "Stream DLQ ARN: $STREAM_DLQ_ARN"
+
 # 創建 DynamoDB Stream 事件源映射
+# 格式錯誤的記錄每次都會失敗：最多重試 3 次並拆半批次隔離失敗記錄，
+# 重試用盡後送到 DLQ，避免單筆記錄阻塞整個 shard 直到過期
 echo "Creating DynamoDB Stream event source mapping..."
 awslocal lambda create-event-source-mapping \
     --function-name query-service-stream_processor_lambda \
     --event-source-arn $STREAM_ARN \
     --starting-position LATEST \
-    --batch-size 10
+    --batch-size 10 \
+    --function-response-types ReportBatchItemFailures \
+    --maximum-retry-attempts 3 \
+    --bisect-batch-on-function-error \
+    --destination-config "OnFailure={Destination=$STREAM_DLQ_ARN}"
 
 echo "Event source mapping created successfully."
 
@@ -1,7 +1,13 @@
+import base64
+import binascii
+import functools
 import json
 import os
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional
+from decimal import Decimal
+from types import ModuleType
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
 
 import boto3
 from aws_lambda_powertools import Logger, Tracer
@@ -9,44 +15,277 @@ from aws_lambda_powertools.event_handler import APIGatewayHttpResolver
 from aws_lambda_powertools.event_handler.exceptions import BadRequestError, InternalServerError
 from aws_lambda_powertools.logging import correlation_paths
 from aws_lambda_powertools.utilities.typing import LambdaContext
-from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.conditions import Attr, ConditionBase, ConditionExpressionBuilder, Key
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
 from botocore.exceptions import BotoCoreError, ClientError
 
+orjson: Optional[ModuleType]
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 未安裝時回退到標準庫 json
+    orjson = None
+
 # Environment detection
 IS_LAMBDA_ENV = os.environ.get("AWS_LAMBDA_FUNCTION_NAME") is not None
 
+# X-Ray 只需追蹤 DynamoDB 呼叫；預設會 patch 所有支援的套件（含 httpx、requests），拖慢冷啟動
+TRACER_PATCH_MODULES = ("botocore",)
+
 # Initialize PowerTools
 logger = Logger(disabled=not IS_LAMBDA_ENV, service="query-result-lambda")
-tracer = Tracer(disabled=not IS_LAMBDA_ENV, service="query-result-lambda")
-app = APIGatewayHttpResolver()
+tracer = Tracer(
+    disabled=not IS_LAMBDA_ENV, service="query-result-lambda", patch_modules=TRACER_PATCH_MODULES
+)
 
-# UTC+8 timezone object
-UTC_PLUS_8 = timezone(timedelta(hours=8))
 
-
-def get_dynamodb_resource() -> Any:
-    """Get DynamoDB resource with region configuration"""
+def get_dynamodb_client() -> Any:
+    """Get low-level DynamoDB client with region configuration"""
     region = os.environ.get("AWS_REGION", "ap-southeast-1")
     endpoint_url = os.environ.get("DYNAMODB_ENDPOINT")
 
     if endpoint_url:
         # LocalStack development environment
         logger.info(f"Using LocalStack DynamoDB endpoint: {endpoint_url}")
-        return boto3.resource("dynamodb", region_name=region, endpoint_url=endpoint_url)
+        return boto3.client("dynamodb", region_name=region, endpoint_url=endpoint_url)
     else:
         # Production environment
         logger.info(f"Using AWS DynamoDB in region: {region}")
-        return boto3.resource("dynamodb", region_name=region)
+        return boto3.client("dynamodb", region_name=region)
 
 
-# Initialize DynamoDB with error handling
-try:
-    dynamodb = get_dynamodb_resource()
-    TABLE_NAME = os.environ.get("NOTIFICATION_TABLE_NAME", "notification-records")
-    logger.info(f"DynamoDB resource initialized successfully. Target table: {TABLE_NAME}")
-except Exception as e:
-    logger.error(f"Failed to initialize DynamoDB resource: {str(e)}")
-    raise
+# Global variable with lazy initialization（首次查詢時才建立，不佔用冷啟動的 init 時間）
+_dynamodb = None
+
+
+def get_dynamodb() -> Any:
+    """Get DynamoDB client singleton with error handling"""
+    global _dynamodb
+    if _dynamodb is None:
+        try:
+            _dynamodb = get_dynamodb_client()
+            logger.info("DynamoDB client singleton initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize DynamoDB client: {str(e)}")
+            raise
+    return _dynamodb
+
+
+# ================================
+# Low-level DynamoDB access
+# ================================
+
+_type_serializer = TypeSerializer()
+_type_deserializer = TypeDeserializer()
+
+
+def _deserialize_number(raw: str) -> Any:
+    """DynamoDB 數值字串：整數直接轉 int，其他（小數、指數）保留為 Decimal"""
+    try:
+        return int(raw)
+    except ValueError:
+        return Decimal(raw)
+
+
+def deserialize_item(item: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    將 low-level client 回傳的 item 轉為 Python 值
+
+    推播記錄只使用 S 與 N，直接取出字串或轉為 int，不經過 TypeDeserializer 與 Decimal；
+    其他型別（M、L、BOOL、NULL、集合等）交給 TypeDeserializer
+    """
+    result: Dict[str, Any] = {}
+    for name, value in item.items():
+        raw = value.get("S")
+        if raw is not None:
+            result[name] = raw
+            continue
+        raw = value.get("N")
+        if raw is not None:
+            result[name] = _deserialize_number(raw)
+        else:
+            result[name] = _type_deserializer.deserialize(value)
+    return result
+
+
+class DynamoDBTable:
+    """
+    以 low-level client 讀取單一資料表，query / scan 的參數與回應格式與 boto3 Table 相同
+
+    Key / Attr 條件在送出前編譯為 expression，ExclusiveStartKey 與 expression 值以
+    TypeSerializer 轉換；回傳的 Items 與 LastEvaluatedKey 以 deserialize_item 轉為 str / int
+    """
+
+    _CONDITION_PARAMS = (("KeyConditionExpression", True), ("FilterExpression", False))
+
+    def __init__(self, client: Any, table_name: str) -> None:
+        self.client = client
+        self.table_name = table_name
+
+    def query(self, **kwargs: Any) -> Dict[str, Any]:
+        return self._read(self.client.query, kwargs)
+
+    def scan(self, **kwargs: Any) -> Dict[str, Any]:
+        return self._read(self.client.scan, kwargs)
+
+    def _read(
+        self, operation: Callable[..., Dict[str, Any]], kwargs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        response = operation(**self._build_request(kwargs))
+        response["Items"] = [deserialize_item(item) for item in response.get("Items", [])]
+        if "LastEvaluatedKey" in response:
+            response["LastEvaluatedKey"] = deserialize_item(response["LastEvaluatedKey"])
+        return response
+
+    def _build_request(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        request = {**kwargs, "TableName": self.table_name}
+        names = dict(request.get("ExpressionAttributeNames", {}))
+        values = dict(request.get("ExpressionAttributeValues", {}))
+
+        builder = ConditionExpressionBuilder()
+        for param, is_key_condition in self._CONDITION_PARAMS:
+            condition = request.get(param)
+            if isinstance(condition, ConditionBase):
+                built = builder.build_expression(condition, is_key_condition=is_key_condition)
+                request[param] = built.condition_expression
+                names.update(built.attribute_name_placeholders)
+                values.update(built.attribute_value_placeholders)
+
+        if names:
+            request["ExpressionAttributeNames"] = names
+        if values:
+            request["ExpressionAttributeValues"] = {
+                placeholder: _type_serializer.serialize(value)
+                for placeholder, value in values.items()
+            }
+        if "ExclusiveStartKey" in request:
+            request["ExclusiveStartKey"] = {
+                name: _type_serializer.serialize(value)
+                for name, value in request["ExclusiveStartKey"].items()
+            }
+        return request
+
+
+TABLE_NAME = os.environ.get("NOTIFICATION_TABLE_NAME", "notification-records")
+
+# 主表的 key 屬性（逗號分隔），用來檢查主表查詢與 scan 的 next_token
+TABLE_KEY_ATTRIBUTES: Tuple[str, ...] = tuple(
+    name.strip()
+    for name in os.environ.get("TABLE_KEY_ATTRIBUTES", "user_id,created_at").split(",")
+    if name.strip()
+)
+
+# transaction_id 查詢所使用的索引；設為空字串表示 transaction_id 即為主表的 hash key
+# （此時 TABLE_KEY_ATTRIBUTES 也需設為主表實際的 key）
+TRANSACTION_ID_INDEX_NAME = os.environ.get(
+    "TRANSACTION_ID_INDEX_NAME", "transaction_id-status-index"
+)
+
+# 「最新記錄」查詢使用的日期分桶 GSI（partition key = day_bucket，sort key = created_at）
+# day_bucket 由 stream_processor_lambda 寫入，格式為 UTC 日期 YYYY-MM-DD
+RECENT_INDEX_NAME = os.environ.get("RECENT_INDEX_NAME", "day_bucket-created_at-index")
+DAY_BUCKET_ATTRIBUTE = "day_bucket"
+RECENT_LOOKBACK_DAYS = int(os.environ.get("RECENT_LOOKBACK_DAYS", "30"))
+# 單次「最新記錄」查詢在所有分桶合計最多讀取的頁數（空的分桶也算一頁），避免逐日回溯過多次
+RECENT_MAX_PAGES = int(os.environ.get("RECENT_MAX_PAGES", "7"))
+
+# 失敗記錄的稀疏 GSI（partition key = failed_bucket，sort key = created_at）
+# stream_processor_lambda 只在 status 為 FAILED 的記錄寫入 failed_bucket，索引只包含失敗記錄
+FAILED_INDEX_NAME = os.environ.get("FAILED_INDEX_NAME", "failed_bucket-created_at-index")
+FAILED_BUCKET_ATTRIBUTE = "failed_bucket"
+FAILED_BUCKET_VALUE = "FAILED"
+
+# sns_id 查詢使用的 GSI（partition key = sns_id，sort key = transaction_id）
+SNS_INDEX_NAME = "sns_id-transaction_id-index"
+
+# 索引不存在的 ValidationException 訊息片段（主表查詢時為 key 不符的訊息）
+INDEX_MISSING_MESSAGE = "specified index"
+KEY_SCHEMA_MISMATCH_MESSAGE = "key schema element"
+
+# 每次請求的讀取預算（未設定表示不限制）
+QUERY_MAX_PAGES = int(os.environ["QUERY_MAX_PAGES"]) if os.environ.get("QUERY_MAX_PAGES") else None
+QUERY_MAX_READ_UNITS = (
+    float(os.environ["QUERY_MAX_READ_UNITS"]) if os.environ.get("QUERY_MAX_READ_UNITS") else None
+)
+
+# 分頁查詢（limit + next_token）單頁的筆數上限
+MAX_PAGE_LIMIT = int(os.environ.get("MAX_PAGE_LIMIT", "1000"))
+
+# 未指定 transaction_id 的「最新記錄」查詢預設與最多回傳的筆數
+RECENT_DEFAULT_LIMIT = 30
+RECENT_MAX_LIMIT = 100
+
+# API Gateway 路由的 gzip 壓縮：請求帶有 Accept-Encoding: gzip 時由 Powertools 壓縮 body
+RESPONSE_COMPRESSION_ENABLED = (
+    os.environ.get("RESPONSE_COMPRESSION_ENABLED", "true").lower() == "true"
+)
+
+# ================================
+# Projection (查詢欄位)
+# ================================
+
+# 可查詢的欄位，順序即 ProjectionExpression 的順序
+NOTIFICATION_FIELDS: Tuple[str, ...] = (
+    "transaction_id",
+    "token",
+    "platform",
+    "notification_title",
+    "notification_body",
+    "status",
+    "send_ts",
+    "delivered_ts",
+    "failed_ts",
+    "ap_id",
+    "created_at",
+    "sns_id",
+    "retry_cnt",
+)
+
+# 失敗記錄查詢預設不回傳 sns_id
+FAILED_NOTIFICATION_FIELDS: Tuple[str, ...] = tuple(f for f in NOTIFICATION_FIELDS if f != "sns_id")
+
+# DynamoDB 保留字，需以 ExpressionAttributeNames 代換
+_RESERVED_ATTRIBUTE_NAMES = frozenset({"token", "status"})
+
+
+def parse_fields(value: Any) -> Optional[Tuple[str, ...]]:
+    """
+    解析 fields 參數（逗號分隔字串或字串列表）
+
+    未提供時回傳 None（使用預設欄位），否則回傳依 NOTIFICATION_FIELDS 排序、去重後的 tuple；
+    包含未知欄位時拋出 ValueError
+    """
+    if value is None or value == "":
+        return None
+    names = value.split(",") if isinstance(value, str) else value
+    requested = {str(name).strip() for name in names} - {""}
+    unknown = requested.difference(NOTIFICATION_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    if not requested:
+        return None
+    return tuple(f for f in NOTIFICATION_FIELDS if f in requested)
+
+
+@functools.lru_cache(maxsize=256)
+def build_projection(fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """
+    產生 fields 對應的 ProjectionExpression 參數
+
+    依欄位組合快取，相同欄位共用同一個 dict（呼叫端以 ** 展開，不可直接修改）
+    """
+    names = {f"#{f}": f for f in fields if f in _RESERVED_ATTRIBUTE_NAMES}
+    projection: Dict[str, Any] = {
+        "ProjectionExpression": ", ".join(
+            f"#{f}" if f in _RESERVED_ATTRIBUTE_NAMES else f for f in fields
+        )
+    }
+    if names:
+        projection["ExpressionAttributeNames"] = names
+    return projection
+
+
+# 查詢回傳的預設欄位
+NOTIFICATION_PROJECTION = build_projection(NOTIFICATION_FIELDS)
 
 
 def decimal_to_int(obj: Any) -> int:
@@ -56,28 +295,601 @@ def decimal_to_int(obj: Any) -> int:
     return int(obj)
 
 
+def dumps_json(obj: Any) -> str:
+    """
+    序列化回應 body，API Gateway 路由與直接調用共用
+
+    已安裝 orjson 時使用 orjson（C 實作，輸出為緊湊的 UTF-8），否則回退到標準庫 json；
+    兩者都以 decimal_to_int 處理 DynamoDB 的 Decimal
+    """
+    if orjson is not None:
+        return str(orjson.dumps(obj, default=decimal_to_int), "utf-8")
+    return json.dumps(obj, default=decimal_to_int, separators=(",", ":"))
+
+
+# UTC+8 timezone object
+# 以下 UTC+8 格式化與 eks_handler/main.py 的副本相同（兩個部署各自打包），修改時需同步兩份；
+# test_utc8_formatter_matches_eks_handler 確保兩者輸出一致
+UTC_PLUS_8 = timezone(timedelta(hours=8))
+UTC8_OFFSET_SECONDS = 8 * 3600
+
+# 每秒一筆的 UTC+8 字串快取上限
+UTC8_CACHE_SIZE = int(os.environ.get("UTC8_CACHE_SIZE", "65536"))
+
+
+def _civil_from_days(days: int) -> Tuple[int, int, int]:
+    """將 1970-01-01 起算的天數轉為 (年, 月, 日)，不需建立 datetime"""
+    days += 719468
+    era = days // 146097
+    day_of_era = days - era * 146097
+    year_of_era = (
+        day_of_era - day_of_era // 1460 + day_of_era // 36524 - day_of_era // 146096
+    ) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4 - year_of_era // 100)
+    month_index = (5 * day_of_year + 2) // 153
+    day = day_of_year - (153 * month_index + 2) // 5 + 1
+    month = month_index + 3 if month_index < 10 else month_index - 9
+    return year_of_era + era * 400 + (month <= 2), month, day
+
+
+@functools.lru_cache(maxsize=4096)
+def _utc8_date_prefix(days: int) -> Optional[str]:
+    """UTC+8 日期部分 "YYYY-MM-DD "，非四位數年份回傳 None"""
+    year, month, day = _civil_from_days(days)
+    if not 1000 <= year <= 9999:
+        return None
+    return "%04d-%02d-%02d " % (year, month, day)
+
+
+@functools.lru_cache(maxsize=UTC8_CACHE_SIZE)
+def format_utc8_second(second: int) -> Optional[str]:
+    """
+    將 Unix 秒數轉為 UTC+8 字串
+
+    輸出格式不含毫秒，因此以秒為快取 key；日期部分依天快取，時間部分以算術組字串，
+    非四位數年份交由 datetime 處理（包含超出範圍的錯誤判斷）
+    """
+    days, seconds_of_day = divmod(second + UTC8_OFFSET_SECONDS, 86400)
+    prefix = _utc8_date_prefix(days)
+    if prefix is not None:
+        hour, rest = divmod(seconds_of_day, 3600)
+        minute, sec = divmod(rest, 60)
+        return "%s%02d:%02d:%02d UTC+8" % (prefix, hour, minute, sec)
+
+    try:
+        dt = datetime.fromtimestamp(second, tz=UTC_PLUS_8)
+        return dt.strftime("%Y-%m-%d %H:%M:%S UTC+8")
+    except (ValueError, TypeError, OSError, OverflowError) as e:
+        logger.warning(f"Failed to convert timestamp {second * 1000}: {e}")
+        return None
+
+
 def convert_timestamp_to_utc8_string(timestamp: Optional[int]) -> Optional[str]:
     """Convert Unix timestamp to UTC+8 timezone string format"""
     if timestamp is None or timestamp == 0:
         return None
+    if type(timestamp) is int:
+        return format_utc8_second(timestamp // 1000)
 
     try:
-        # Convert timestamp to datetime in UTC+8
+        # 非整數（例如 float）維持原本的 datetime 轉換
         dt = datetime.fromtimestamp(timestamp / 1000.0, tz=UTC_PLUS_8)
         return dt.strftime("%Y-%m-%d %H:%M:%S UTC+8")
-    except (ValueError, TypeError, OSError) as e:
+    except (ValueError, TypeError, OSError, OverflowError) as e:
         logger.warning(f"Failed to convert timestamp {timestamp}: {e}")
         return None
 
 
+# ================================
+# Pagination (分頁讀取)
+# ================================
+
+
+@dataclass
+class ReadBudget:
+    """單次請求的讀取預算，超過時停止讀取並回傳 continuation token"""
+
+    max_pages: Optional[int] = QUERY_MAX_PAGES
+    max_read_units: Optional[float] = QUERY_MAX_READ_UNITS
+
+
+@dataclass
+class PagedResult:
+    """分頁讀取的彙總結果"""
+
+    items: List[Dict[str, Any]]
+    last_evaluated_key: Optional[Dict[str, Any]]
+    pages: int
+    consumed_capacity: float
+
+
+class InvalidContinuationTokenError(ValueError):
+    """next_token 無法解析，或不是目前查詢的有效起點（回傳 400）"""
+
+
+def encode_continuation_token(last_evaluated_key: Optional[Dict[str, Any]]) -> Optional[str]:
+    """將 DynamoDB LastEvaluatedKey 編碼為不透明的 continuation token"""
+    if not last_evaluated_key:
+        return None
+    payload = json.dumps(last_evaluated_key, default=decimal_to_int, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_continuation_token(token: Optional[str]) -> Optional[Dict[str, Any]]:
+    """將 continuation token 還原為 ExclusiveStartKey，格式錯誤時拋出 ValueError"""
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")), parse_float=Decimal)
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise InvalidContinuationTokenError(f"Invalid continuation token: {e}")
+
+    if not isinstance(key, dict) or not all(
+        isinstance(v, (str, int, Decimal)) and not isinstance(v, bool) for v in key.values()
+    ):
+        raise InvalidContinuationTokenError("Invalid continuation token: unexpected key format")
+    return key
+
+
+def validate_start_key(start_key: Dict[str, Any], key_attributes: FrozenSet[str]) -> None:
+    """ExclusiveStartKey 的屬性需與查詢的 key schema 完全一致，否則拋出 InvalidContinuationTokenError"""
+    if set(start_key) != key_attributes:
+        raise InvalidContinuationTokenError(
+            "Invalid continuation token: keys do not match the key schema of the query"
+        )
+
+
+def is_index_unavailable(error: ClientError, index_name: Optional[str]) -> bool:
+    """
+    錯誤是否表示索引確實無法使用（可回退到 scan）
+
+    只有 ResourceNotFoundException，或訊息指出索引不存在（未指定索引時為 key 不符）的
+    ValidationException 才算；其他 ValidationException（例如無效的起點）不算。
+    """
+    details = error.response.get("Error", {})
+    error_code = details.get("Code", "")
+    if error_code == "ResourceNotFoundException":
+        return True
+    if error_code != "ValidationException":
+        return False
+    message = details.get("Message", "")
+    if index_name:
+        return INDEX_MISSING_MESSAGE in message or index_name in message
+    return KEY_SCHEMA_MISMATCH_MESSAGE in message
+
+
+def parse_page_limit(value: Any) -> Optional[int]:
+    """解析分頁 limit 參數；未提供或無效時回傳 None（不限制筆數），否則限制在 1..MAX_PAGE_LIMIT"""
+    if value is None or value == "":
+        return None
+    try:
+        return max(1, min(int(value), MAX_PAGE_LIMIT))
+    except (ValueError, TypeError):
+        logger.warning(f"Invalid limit parameter: {value}, reading without limit")
+        return None
+
+
+def parse_recent_limit(value: Any) -> int:
+    """解析「最新記錄」查詢的 limit 參數；未提供或無效時回傳預設值，否則限制在 1..RECENT_MAX_LIMIT"""
+    if value is None or value == "":
+        return RECENT_DEFAULT_LIMIT
+    try:
+        return max(1, min(int(value), RECENT_MAX_LIMIT))
+    except (ValueError, TypeError):
+        logger.warning(f"Invalid limit parameter: {value}, using default: {RECENT_DEFAULT_LIMIT}")
+        return RECENT_DEFAULT_LIMIT
+
+
+def _project_key_attributes(
+    request: Dict[str, Any], key_attributes: Iterable[str]
+) -> Tuple[Dict[str, Any], Tuple[str, ...]]:
+    """
+    確保 ProjectionExpression 包含 key_attributes，回傳 (request, 額外加入的屬性)
+
+    額外加入的屬性只用來產生截斷頁面的 LastEvaluatedKey，yield 前會從 item 移除
+    """
+    projection = request.get("ProjectionExpression")
+    if not projection:
+        return request, ()
+    names = request.get("ExpressionAttributeNames", {})
+    projected = {names.get(p.strip(), p.strip()) for p in projection.split(",")}
+    extra = tuple(a for a in sorted(key_attributes) if a not in projected)
+    if not extra:
+        return request, ()
+    placeholders = {f"#key_{a}": a for a in extra}
+    request = dict(
+        request,
+        ProjectionExpression=", ".join([projection, *placeholders]),
+        ExpressionAttributeNames={**names, **placeholders},
+    )
+    return request, extra
+
+
+def iterate_pages(
+    operation: Callable[..., Dict[str, Any]],
+    request: Dict[str, Any],
+    start_key: Optional[Dict[str, Any]] = None,
+    max_items: Optional[int] = None,
+    budget: Optional[ReadBudget] = None,
+    key_attributes: Iterable[str] = (),
+) -> Iterator[Dict[str, Any]]:
+    """
+    跟隨 LastEvaluatedKey 逐頁呼叫 scan / query 並 yield 每一頁的 response
+
+    - max_items: 收集到足夠筆數後停止。沒有 FilterExpression 的 query 會把 Limit 縮小到
+      剩餘筆數；scan 與帶 filter 的 query 的 Limit 是過濾前的筆數，縮小只會增加呼叫次數，
+      因此不設 Limit，改為截斷最後一頁，並以最後保留的 item 的 key_attributes
+      作為 LastEvaluatedKey
+    - budget: 頁數或 RCU 用盡時停止，最後一頁的 LastEvaluatedKey 即為續讀位置
+    """
+    budget = budget or ReadBudget()
+    shrink_limit = "KeyConditionExpression" in request and "FilterExpression" not in request
+    extra: Tuple[str, ...] = ()
+    if max_items is not None and not shrink_limit:
+        request, extra = _project_key_attributes(request, key_attributes)
+    kwargs = dict(request, ReturnConsumedCapacity="TOTAL")
+    if start_key:
+        kwargs["ExclusiveStartKey"] = start_key
+
+    collected = 0
+    pages = 0
+    consumed = 0.0
+    while True:
+        if max_items is not None and shrink_limit:
+            kwargs["Limit"] = min(request.get("Limit", max_items), max_items - collected)
+
+        page = operation(**kwargs)
+        pages += 1
+        consumed += float((page.get("ConsumedCapacity") or {}).get("CapacityUnits", 0))
+        items = page.get("Items", [])
+        if max_items is not None and collected + len(items) > max_items and key_attributes:
+            kept = items[: max_items - collected]
+            if all(a in kept[-1] for a in key_attributes):
+                resume_key = {a: kept[-1][a] for a in key_attributes}
+                page = dict(page, Items=kept, LastEvaluatedKey=resume_key)
+        if extra:
+            page = dict(
+                page,
+                Items=[
+                    {k: v for k, v in item.items() if k not in extra}
+                    for item in page.get("Items", [])
+                ],
+            )
+        collected += len(page.get("Items", []))
+        yield page
+
+        last_key = page.get("LastEvaluatedKey")
+        if not last_key:
+            return
+        if max_items is not None and collected >= max_items:
+            return
+        if budget.max_pages is not None and pages >= budget.max_pages:
+            logger.warning("Read budget exhausted (max pages)", extra={"pages": pages})
+            return
+        if budget.max_read_units is not None and consumed >= budget.max_read_units:
+            logger.warning("Read budget exhausted (max RCU)", extra={"consumed": consumed})
+            return
+        kwargs["ExclusiveStartKey"] = last_key
+
+
+def collect_pages(pages: Iterator[Dict[str, Any]]) -> PagedResult:
+    """讀完 iterate_pages 產生的所有頁面並彙總"""
+    result = PagedResult(items=[], last_evaluated_key=None, pages=0, consumed_capacity=0.0)
+    for page in pages:
+        result.items.extend(page.get("Items", []))
+        result.last_evaluated_key = page.get("LastEvaluatedKey")
+        result.pages += 1
+        result.consumed_capacity += float(
+            (page.get("ConsumedCapacity") or {}).get("CapacityUnits", 0)
+        )
+    return result
+
+
 class QueryService:
     """Query service for notification records with enhanced error handling"""
 
-    def __init__(self, table_name: str):
+    def __init__(
+        self,
+        table_name: str,
+        transaction_index_name: str = TRANSACTION_ID_INDEX_NAME,
+        recent_index_name: str = RECENT_INDEX_NAME,
+        failed_index_name: str = FAILED_INDEX_NAME,
+    ):
         self.table_name = table_name
-        self.table = dynamodb.Table(table_name)
+        self.transaction_index_name = transaction_index_name
+        self.recent_index_name = recent_index_name
+        self.failed_index_name = failed_index_name
+        # 各索引的 key 屬性；索引查詢的 ExclusiveStartKey 包含索引與主表的 key
+        self._index_key_attributes: Dict[str, Tuple[str, ...]] = {
+            name: attributes
+            for name, attributes in [
+                (transaction_index_name, ("transaction_id", "status")),
+                (recent_index_name, (DAY_BUCKET_ATTRIBUTE, "created_at")),
+                (failed_index_name, (FAILED_BUCKET_ATTRIBUTE, "created_at")),
+                (SNS_INDEX_NAME, ("sns_id", "transaction_id")),
+            ]
+            if name
+        }
+        # 已確認不存在的索引，避免每次查詢都先失敗一次
+        self._missing_indexes: Set[str] = set()
         logger.info(f"QueryService initialized with table: {table_name}")
 
+    @functools.cached_property
+    def table(self) -> Any:
+        """以 low-level client 讀取的 DynamoDB Table，首次使用時才建立"""
+        return DynamoDBTable(get_dynamodb(), self.table_name)
+
+    def _start_key_attributes(self, index_name: Optional[str]) -> FrozenSet[str]:
+        """查詢 index_name（未指定為主表或 scan）時 ExclusiveStartKey 應有的屬性"""
+        attributes = frozenset(TABLE_KEY_ATTRIBUTES)
+        if index_name:
+            attributes |= frozenset(self._index_key_attributes.get(index_name, ()))
+        return attributes
+
+    def _resumes_scan(self, next_token: Optional[str], index_name: str) -> bool:
+        """next_token 是否為 scan 回退所產生（只有主表 key），續讀時直接 scan 不再嘗試索引"""
+        start_key = decode_continuation_token(next_token)
+        return (
+            bool(index_name)
+            and start_key is not None
+            and set(start_key) == self._start_key_attributes(None)
+        )
+
+    def _read_all(
+        self,
+        operation: Callable[..., Dict[str, Any]],
+        request: Dict[str, Any],
+        next_token: Optional[str] = None,
+        max_items: Optional[int] = None,
+        budget: Optional[ReadBudget] = None,
+    ) -> PagedResult:
+        """
+        分頁讀取直到資料讀完、收集到 max_items 筆或預算用盡
+
+        next_token 的 key 與查詢的 key schema 不符時，在呼叫 DynamoDB 前拋出
+        InvalidContinuationTokenError；被 DynamoDB 以 ValidationException 拒絕
+        （且不是索引不存在）時亦同
+        """
+        key_attributes = self._start_key_attributes(request.get("IndexName"))
+        start_key = decode_continuation_token(next_token)
+        if start_key is not None:
+            validate_start_key(start_key, key_attributes)
+        try:
+            return collect_pages(
+                iterate_pages(
+                    operation,
+                    request,
+                    start_key=start_key,
+                    max_items=max_items,
+                    budget=budget,
+                    key_attributes=key_attributes,
+                )
+            )
+        except ClientError as e:
+            error_code = e.response.get("Error", {}).get("Code", "")
+            if (
+                start_key is None
+                or error_code != "ValidationException"
+                or is_index_unavailable(e, request.get("IndexName"))
+            ):
+                raise
+            message = e.response.get("Error", {}).get("Message", error_code)
+            raise InvalidContinuationTokenError(f"Invalid continuation token: {message}") from e
+
+    def _build_result(self, paged: PagedResult, **extra: Any) -> Dict[str, Any]:
+        """組合查詢結果，未讀完時附上 next_token 供呼叫端續讀"""
+        self._sort_items_by_created_at_desc(paged.items)
+        result = {
+            "success": True,
+            "items": paged.items,
+            "count": len(paged.items),
+            "next_token": encode_continuation_token(paged.last_evaluated_key),
+        }
+        result.update(extra)
+        return result
+
+    def _query_by_transaction_id(
+        self,
+        transaction_id: str,
+        next_token: Optional[str] = None,
+        budget: Optional[ReadBudget] = None,
+        max_items: Optional[int] = None,
+        status: Optional[str] = None,
+        projection: Dict[str, Any] = NOTIFICATION_PROJECTION,
+    ) -> Tuple[PagedResult, str]:
+        """
+        以 key condition 查詢特定 transaction_id 的記錄
+
+        優先使用 transaction_id 索引（或主表 hash key），
+        只有在索引不存在時才回退到 scan。指定 status 時只回傳該狀態的記錄
+        （使用索引時 status 為 sort key 的 key condition，主表與 scan 則為 filter）。
+        回傳 (paged_result, query_method)
+        """
+        index_name = self.transaction_index_name
+        if index_name not in self._missing_indexes and not self._resumes_scan(
+            next_token, index_name
+        ):
+            key_condition = Key("transaction_id").eq(transaction_id)
+            query_kwargs: Dict[str, Any] = {**projection}
+            if index_name:
+                # status 是索引的 sort key，直接放在 key condition，不讀取其他狀態的記錄
+                query_kwargs["IndexName"] = index_name
+                if status:
+                    key_condition = key_condition & Key("status").eq(status)
+            elif status:
+                query_kwargs["FilterExpression"] = Attr("status").eq(status)
+            query_kwargs["KeyConditionExpression"] = key_condition
+
+            try:
+                paged = self._read_all(
+                    self.table.query, query_kwargs, next_token, max_items=max_items, budget=budget
+                )
+                return paged, "INDEX" if index_name else "TABLE"
+            except ClientError as e:
+                # 索引不存在或 transaction_id 不是主表 key；若是表本身不存在，scan 也會拋出錯誤
+                if not is_index_unavailable(e, index_name):
+                    raise
+                error_code = e.response.get("Error", {}).get("Code", "")
+                logger.warning(
+                    f"Key query on transaction_id unavailable ({error_code}), falling back to scan",
+                    extra={"index_name": index_name or "table"},
+                )
+                # 帶有 next_token 的請求不記錄，避免單一請求讓之後的查詢都改用 scan
+                if not next_token:
+                    self._missing_indexes.add(index_name)
+
+        scan_filter = Attr("transaction_id").eq(transaction_id)
+        if status:
+            scan_filter = scan_filter & Attr("status").eq(status)
+        scan_kwargs = {"FilterExpression": scan_filter, **projection}
+        paged = self._read_all(
+            self.table.scan, scan_kwargs, next_token, max_items=max_items, budget=budget
+        )
+        return paged, "SCAN_FALLBACK"
+
+    def _query_recent(
+        self,
+        limit: int,
+        budget: Optional[ReadBudget] = None,
+        now: Optional[datetime] = None,
+        projection: Dict[str, Any] = NOTIFICATION_PROJECTION,
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        查詢最新的 N 筆記錄
+
+        依日期分桶的 GSI 由今天往前逐日倒序讀取（ScanIndexForward=False），
+        收集到 limit 筆即停止，讀取量與 N 成正比。最多回溯 RECENT_LOOKBACK_DAYS 天，
+        所有分桶合計最多讀取 RECENT_MAX_PAGES 頁（以及 budget 的頁數 / RCU）。
+        索引不存在時回退到 scan + 排序；分桶讀完仍不足 limit 筆時，再以同樣的 scan 補足
+        較舊或沒有 day_bucket 的記錄，補足的部分只掃描一頁，為盡力而為（不保證為全表最新）。
+        回傳 (items, query_method)
+        """
+        index_name = self.recent_index_name
+        if index_name and index_name not in self._missing_indexes:
+            today = (now or datetime.now(timezone.utc)).date()
+            budget = budget or ReadBudget()
+            max_pages = min(RECENT_MAX_PAGES, budget.max_pages or RECENT_MAX_PAGES)
+            pages = 0
+            consumed = 0.0
+            items: List[Dict[str, Any]] = []
+            try:
+                for offset in range(RECENT_LOOKBACK_DAYS):
+                    remaining_units = (
+                        None if budget.max_read_units is None else budget.max_read_units - consumed
+                    )
+                    if pages >= max_pages or (remaining_units is not None and remaining_units <= 0):
+                        logger.warning(
+                            "Recent query read budget exhausted",
+                            extra={"pages": pages, "consumed": consumed, "items": len(items)},
+                        )
+                        break
+                    bucket = (today - timedelta(days=offset)).isoformat()
+                    paged = self._read_all(
+                        self.table.query,
+                        {
+                            "IndexName": index_name,
+                            "KeyConditionExpression": Key(DAY_BUCKET_ATTRIBUTE).eq(bucket),
+                            "ScanIndexForward": False,
+                            **projection,
+                        },
+                        max_items=limit - len(items),
+                        budget=ReadBudget(
+                            max_pages=max_pages - pages, max_read_units=remaining_units
+                        ),
+                    )
+                    pages += paged.pages
+                    consumed += paged.consumed_capacity
+                    items.extend(paged.items)
+                    if len(items) >= limit:
+                        return items, "INDEX"
+            except ClientError as e:
+                if not is_index_unavailable(e, index_name):
+                    raise
+                error_code = e.response.get("Error", {}).get("Code", "")
+                logger.warning(
+                    f"Recent index unavailable ({error_code}), falling back to scan",
+                    extra={"index_name": index_name},
+                )
+                self._missing_indexes.add(index_name)
+            else:
+                # 分桶不足 limit 筆：合併 scan 的結果（盡力而為），涵蓋較舊或沒有 day_bucket 的記錄
+                seen = {tuple(sorted(item.items())) for item in items}
+                items.extend(
+                    item
+                    for item in self._scan_recent(limit, projection)
+                    if tuple(sorted(item.items())) not in seen
+                )
+                self._sort_items_by_created_at_desc(items)
+                return items[:limit], "INDEX_WITH_SCAN"
+
+        return self._scan_recent(limit, projection), "SCAN_FALLBACK"
+
+    def _scan_recent(self, limit: int, projection: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """掃描部分記錄後排序（不保證為全表最新）"""
+        paged = self._read_all(
+            self.table.scan,
+            {**projection, "Limit": limit * 2},  # 多掃描一些以確保有足夠記錄排序
+            budget=ReadBudget(max_pages=1),
+        )
+        self._sort_items_by_created_at_desc(paged.items)
+        return paged.items[:limit]
+
+    def _query_all_failed(
+        self,
+        projection: Dict[str, Any],
+        next_token: Optional[str] = None,
+        max_items: Optional[int] = None,
+        budget: Optional[ReadBudget] = None,
+    ) -> Tuple[PagedResult, str]:
+        """
+        查詢所有失敗記錄，依 created_at 由新到舊
+
+        讀取只包含失敗記錄的稀疏 GSI，讀取量與失敗筆數成正比而非全表大小；
+        索引不存在時回退到 scan + status 過濾。回傳 (paged_result, query_method)
+        """
+        index_name = self.failed_index_name
+        if (
+            index_name
+            and index_name not in self._missing_indexes
+            and not self._resumes_scan(next_token, index_name)
+        ):
+            try:
+                paged = self._read_all(
+                    self.table.query,
+                    {
+                        "IndexName": index_name,
+                        "KeyConditionExpression": Key(FAILED_BUCKET_ATTRIBUTE).eq(
+                            FAILED_BUCKET_VALUE
+                        ),
+                        "ScanIndexForward": False,
+                        **projection,
+                    },
+                    next_token,
+                    max_items=max_items,
+                    budget=budget,
+                )
+                return paged, "INDEX"
+            except ClientError as e:
+                if not is_index_unavailable(e, index_name):
+                    raise
+                error_code = e.response.get("Error", {}).get("Code", "")
+                logger.warning(
+                    f"Failed index unavailable ({error_code}), falling back to scan",
+                    extra={"index_name": index_name},
+                )
+                if not next_token:
+                    self._missing_indexes.add(index_name)
+
+        paged = self._read_all(
+            self.table.scan,
+            {"FilterExpression": Attr("status").eq("FAILED"), **projection},
+            next_token,
+            max_items=max_items,
+            budget=budget,
+        )
+        return paged, "SCAN_FALLBACK"
+
     def _sort_items_by_created_at_desc(self, items: List[Dict[str, Any]]) -> None:
         """
         共用方法：按 created_at 降序排序，確保最新記錄在最前面
@@ -97,42 +909,45 @@ class QueryService:
 
     @tracer.capture_method
     def query_transaction_notifications(
-        self, transaction_id: Optional[str] = None, limit: int = 30
+        self,
+        transaction_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        next_token: Optional[str] = None,
+        budget: Optional[ReadBudget] = None,
+        fields: Optional[Tuple[str, ...]] = None,
     ) -> Dict[str, Any]:
-        """Query notification records by transaction_id or get recent records"""
+        """
+        Query notification records by transaction_id or get recent records
+
+        指定 transaction_id 時 limit 為單頁筆數，未讀完時以 next_token 續讀，未指定時讀取全部；
+        未指定 transaction_id 時回傳最新的 limit 筆（預設 RECENT_DEFAULT_LIMIT，top-N，不提供 next_token）。
+        fields 限制 DynamoDB 讀取的欄位（預設 NOTIFICATION_FIELDS）
+        """
+        projection = build_projection(fields or NOTIFICATION_FIELDS)
         if transaction_id and transaction_id.strip():
-            # 使用 scan 配合 filter expression 查詢特定 transaction_id（因為沒有 GSI）
+            # 使用 transaction_id 索引查詢，索引不存在時才回退到 scan
             logger.info(
                 "Starting transaction notifications query", extra={"transaction_id": transaction_id}
             )
 
             try:
-                response = self.table.scan(
-                    FilterExpression=Attr("transaction_id").eq(transaction_id),
-                    ProjectionExpression=(
-                        "transaction_id, #token, platform, notification_title, "
-                        "notification_body, #status, send_ts, delivered_ts, "
-                        "failed_ts, ap_id, created_at, sns_id, retry_cnt"
-                    ),
-                    ExpressionAttributeNames={"#token": "token", "#status": "status"},
+                paged, query_method = self._query_by_transaction_id(
+                    transaction_id, next_token, budget, max_items=limit, projection=projection
                 )
-                items = response.get("Items", [])
-                consumed_capacity = response.get("ConsumedCapacity", {})
-
-                self._sort_items_by_created_at_desc(items)
+                result = self._build_result(paged)
 
                 logger.info(
                     "Transaction notifications query completed successfully",
                     extra={
                         "transaction_id": transaction_id,
-                        "items_found": len(items),
-                        "consumed_capacity": (
-                            consumed_capacity.get("CapacityUnits", 0) if consumed_capacity else 0
-                        ),
+                        "items_found": result["count"],
+                        "query_method": query_method,
+                        "pages": paged.pages,
+                        "consumed_capacity": paged.consumed_capacity,
                     },
                 )
 
-                return {"success": True, "items": items, "count": len(items)}
+                return result
 
             except ClientError as e:
                 error_code = e.response.get("Error", {}).get("Code", "UnknownError")
@@ -161,36 +976,27 @@ class QueryService:
                 raise
         else:
             # 新增邏輯：查詢最新的 N 筆記錄
+            limit = limit or RECENT_DEFAULT_LIMIT
             logger.info(f"Starting recent transaction notifications query (limit: {limit})")
 
             try:
-                # 使用 scan 並按 created_at 排序取得最新記錄
-                response = self.table.scan(
-                    ProjectionExpression=(
-                        "transaction_id, #token, platform, notification_title, "
-                        "notification_body, #status, send_ts, delivered_ts, "
-                        "failed_ts, ap_id, created_at, sns_id, retry_cnt"
-                    ),
-                    ExpressionAttributeNames={"#token": "token", "#status": "status"},
-                    Limit=limit * 2,  # 多掃描一些以確保有足夠記錄排序
+                if fields and "created_at" not in fields:
+                    # 回退 scan 時需依 created_at 排序，輸出時由 format_notification_items 濾掉
+                    projection = build_projection(parse_fields(fields + ("created_at",)))
+                items, query_method = self._query_recent(
+                    limit, budget=budget, projection=projection
                 )
 
-                items = response.get("Items", [])
-                consumed_capacity = response.get("ConsumedCapacity", {})
-
-                self._sort_items_by_created_at_desc(items)
-                items = items[:limit]
-
                 logger.info(
                     "Recent transaction notifications query completed successfully",
                     extra={
                         "items_found": len(items),
                         "limit": limit,
-                        "consumed_capacity": consumed_capacity,
+                        "query_method": query_method,
                     },
                 )
 
-                return {"success": True, "items": items, "count": len(items)}
+                return {"success": True, "items": items, "count": len(items), "next_token": None}
 
             except ClientError as e:
                 error_code = e.response.get("Error", {}).get("Code", "UnknownError")
@@ -213,75 +1019,72 @@ class QueryService:
                 raise
 
     @tracer.capture_method
-    def query_failed_notifications(self, transaction_id: Optional[str] = None) -> Dict[str, Any]:
-        """Query failed notification records (status='FAILED') by optional transaction_id"""
+    def query_failed_notifications(
+        self,
+        transaction_id: Optional[str] = None,
+        next_token: Optional[str] = None,
+        budget: Optional[ReadBudget] = None,
+        limit: Optional[int] = None,
+        fields: Optional[Tuple[str, ...]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Query failed notification records (status='FAILED') by optional transaction_id
+
+        指定 limit 時最多回傳 limit 筆，未讀完時以 next_token 續讀；
+        fields 限制讀取的欄位（預設 FAILED_NOTIFICATION_FIELDS）
+        """
         logger.info(f"Querying failed notifications for transaction_id: {transaction_id or 'all'}")
 
+        projection = build_projection(fields or FAILED_NOTIFICATION_FIELDS)
+
         try:
             if transaction_id and transaction_id.strip():
-                # 使用 scan 查詢特定 transaction_id 且狀態為 FAILED 的記錄（因為沒有 GSI）
+                # 特定 transaction_id 的記錄很少，以 transaction_id 索引查詢後過濾 FAILED
                 logger.info(f"Querying specific transaction: {transaction_id}")
-                response = self.table.scan(
-                    FilterExpression=Attr("transaction_id").eq(transaction_id)
-                    & Attr("status").eq("FAILED"),
-                    ProjectionExpression=(
-                        "transaction_id, #token, platform, notification_title, "
-                        "notification_body, #status, send_ts, delivered_ts, "
-                        "failed_ts, ap_id, created_at, retry_cnt"
-                    ),
-                    ExpressionAttributeNames={"#token": "token", "#status": "status"},
+                paged, query_method = self._query_by_transaction_id(
+                    transaction_id,
+                    next_token,
+                    budget,
+                    max_items=limit,
+                    status="FAILED",
+                    projection=projection,
                 )
 
-                items = response.get("Items", [])
-                consumed_capacity = response.get("ConsumedCapacity", {})
-
-                self._sort_items_by_created_at_desc(items)
-
-                if items:
+                if paged.items:
                     logger.info(
-                        f"Found {len(items)} failed record(s) for transaction: {transaction_id}"
+                        f"Found {len(paged.items)} failed record(s) for transaction: "
+                        f"{transaction_id}"
                     )
                 else:
                     logger.info(f"No failed record found for transaction: {transaction_id}")
             else:
-                # Query all failed notifications using scan
+                # 所有失敗記錄：讀取稀疏 GSI，由新到舊
                 logger.info("Querying all failed notifications")
-                response = self.table.scan(
-                    FilterExpression=Attr("status").eq("FAILED"),
-                    ProjectionExpression=(
-                        "transaction_id, #token, platform, notification_title, "
-                        "notification_body, #status, send_ts, delivered_ts, "
-                        "failed_ts, ap_id, created_at, retry_cnt"
-                    ),
-                    ExpressionAttributeNames={"#token": "token", "#status": "status"},
+                paged, query_method = self._query_all_failed(
+                    projection, next_token, max_items=limit, budget=budget
                 )
 
-                items = response.get("Items", [])
-                consumed_capacity = response.get("ConsumedCapacity", {})
-
-                self._sort_items_by_created_at_desc(items)
-
-                logger.info(f"Found {len(items)} failed notifications")
+                logger.info(f"Found {len(paged.items)} failed notifications")
 
             # Log consumption details
             logger.info(
                 "Query completed for failed notifications",
                 extra={
                     "transaction_id": transaction_id or "all",
-                    "items_count": len(items),
-                    "consumed_capacity": consumed_capacity,
+                    "items_count": len(paged.items),
+                    "pages": paged.pages,
+                    "consumed_capacity": paged.consumed_capacity,
+                    "query_method": query_method,
                 },
             )
 
-            return {
-                "success": True,
-                "items": items,
-                "count": len(items),
-                "query_info": {
+            return self._build_result(
+                paged,
+                query_info={
                     "transaction_id": transaction_id or "all",
                     "query_type": "failed_notifications",
                 },
-            }
+            )
 
         except ClientError as e:
             error_code = e.response.get("Error", {}).get("Code", "UnknownError")
@@ -298,72 +1101,82 @@ class QueryService:
             raise
 
     @tracer.capture_method
-    def query_sns_notifications(self, sns_id: str) -> Dict[str, Any]:
-        """Query notification records by sns_id using scan with filter"""
+    def query_sns_notifications(
+        self,
+        sns_id: str,
+        next_token: Optional[str] = None,
+        budget: Optional[ReadBudget] = None,
+        limit: Optional[int] = None,
+        fields: Optional[Tuple[str, ...]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Query notification records by sns_id using scan with filter
+
+        指定 limit 時最多回傳 limit 筆，未讀完時以 next_token 續讀；
+        fields 限制讀取的欄位（預設 NOTIFICATION_FIELDS）
+        """
         logger.info(f"Querying notifications for sns_id: {sns_id}")
+        projection = build_projection(fields or NOTIFICATION_FIELDS)
 
         try:
-            # 嘗試使用 GSI 查詢（最佳效能）
-            try:
-                logger.info(f"Attempting GSI query for sns_id: {sns_id}")
-                response = self.table.query(
-                    IndexName="sns_id-transaction_id-index",
-                    KeyConditionExpression=Key("sns_id").eq(sns_id),
-                    ProjectionExpression=(
-                        "transaction_id, #token, platform, notification_title, "
-                        "notification_body, #status, send_ts, delivered_ts, "
-                        "failed_ts, ap_id, created_at, sns_id, retry_cnt"
-                    ),
-                    ExpressionAttributeNames={"#token": "token", "#status": "status"},
-                )
-                query_method = "GSI"
-                logger.info(f"GSI query successful for sns_id: {sns_id}")
-
-            except ClientError as gsi_error:
-                # 如果 GSI 查詢失敗（例如 ValidationException），回退到 scan
-                error_code = gsi_error.response.get("Error", {}).get("Code", "")
-                logger.warning(
-                    f"GSI query failed ({error_code}), falling back to scan for sns_id: {sns_id}"
-                )
+            # 嘗試使用 GSI 查詢（最佳效能）；scan 回退產生的 next_token 直接續讀 scan
+            paged: Optional[PagedResult] = None
+            if not self._resumes_scan(next_token, SNS_INDEX_NAME):
+                try:
+                    logger.info(f"Attempting GSI query for sns_id: {sns_id}")
+                    paged = self._read_all(
+                        self.table.query,
+                        {
+                            "IndexName": SNS_INDEX_NAME,
+                            "KeyConditionExpression": Key("sns_id").eq(sns_id),
+                            **projection,
+                        },
+                        next_token,
+                        max_items=limit,
+                        budget=budget,
+                    )
+                    query_method = "GSI"
+                    logger.info(f"GSI query successful for sns_id: {sns_id}")
+
+                except ClientError as gsi_error:
+                    # 如果 GSI 查詢失敗（例如 ValidationException），回退到 scan
+                    error_code = gsi_error.response.get("Error", {}).get("Code", "")
+                    logger.warning(
+                        f"GSI query failed ({error_code}), "
+                        f"falling back to scan for sns_id: {sns_id}"
+                    )
 
-                response = self.table.scan(
-                    FilterExpression=Attr("sns_id").eq(sns_id),
-                    ProjectionExpression=(
-                        "transaction_id, #token, platform, notification_title, "
-                        "notification_body, #status, send_ts, delivered_ts, "
-                        "failed_ts, ap_id, created_at, sns_id, retry_cnt"
-                    ),
-                    ExpressionAttributeNames={"#token": "token", "#status": "status"},
+            if paged is None:
+                paged = self._read_all(
+                    self.table.scan,
+                    {"FilterExpression": Attr("sns_id").eq(sns_id), **projection},
+                    next_token,
+                    max_items=limit,
+                    budget=budget,
                 )
                 query_method = "SCAN_FALLBACK"
 
-            items = response.get("Items", [])
-            consumed_capacity = response.get("ConsumedCapacity", {})
-
-            self._sort_items_by_created_at_desc(items)
-
-            logger.info(f"Found {len(items)} notifications for sns_id: {sns_id}")
+            logger.info(f"Found {len(paged.items)} notifications for sns_id: {sns_id}")
 
             # Log consumption details
             logger.info(
                 f"Query completed for sns_id: {sns_id} using {query_method}",
                 extra={
                     "sns_id": sns_id,
-                    "items_count": len(items),
-                    "consumed_capacity": consumed_capacity,
+                    "items_count": len(paged.items),
+                    "pages": paged.pages,
+                    "consumed_capacity": paged.consumed_capacity,
                     "query_method": query_method,
                 },
             )
 
-            return {
-                "success": True,
-                "items": items,
-                "count": len(items),
-                "query_info": {
+            return self._build_result(
+                paged,
+                query_info={
                     "sns_id": sns_id,
                     "query_type": "sns_notifications",
                 },
-            }
+            )
 
         except ClientError as e:
             error_code = e.response.get("Error", {}).get("Code", "UnknownError")
@@ -380,73 +1193,100 @@ class QueryService:
             raise
 
 
-def format_notification_items(items: list) -> list:
-    """Format notification record items with enhanced data handling and UTC+8 timezone conversion"""
-    formatted_items = []
+# format_notification_items 輸出的 schema 版本，隨回應一併回傳；
+# EKS handler 看到相同版本時信任記錄內容，不再重新轉換與驗證
+NOTIFICATION_SCHEMA_VERSION = "1"
 
-    for item in items:
-        try:
-            # 安全的時間戳轉換函數
-            def safe_timestamp_convert(value: Any) -> Optional[int]:
-                if value is None or value == "":
-                    return None
-                try:
-                    return int(value)
-                except (ValueError, TypeError):
-                    return None
-
-            # 安全的數值轉換函數
-            def safe_int_convert(value: Any) -> Optional[int]:
-                if value is None or value == "":
-                    return None
-                try:
-                    return int(value)
-                except (ValueError, TypeError):
-                    return None
-
-            formatted_item = {
-                "transaction_id": item.get("transaction_id"),
-                "token": item.get("token"),
-                "platform": item.get("platform"),
-                "notification_title": item.get("notification_title"),
-                "notification_body": item.get("notification_body"),
-                "status": item.get("status"),
-                "send_ts": safe_timestamp_convert(item.get("send_ts")),
-                "delivered_ts": safe_timestamp_convert(item.get("delivered_ts")),
-                "failed_ts": safe_timestamp_convert(item.get("failed_ts")),
-                "ap_id": item.get("ap_id"),
-                "created_at": safe_timestamp_convert(item.get("created_at")) or 0,
-                "sns_id": item.get("sns_id"),
-                "retry_cnt": safe_int_convert(item.get("retry_cnt")) or 0,
-            }
+# 時間戳欄位與對應的 UTC+8 字串欄位
+UTC8_TIME_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("send_ts", "send_time_utc8"),
+    ("delivered_ts", "delivered_time_utc8"),
+    ("failed_ts", "failed_time_utc8"),
+    ("created_at", "created_time_utc8"),
+)
 
-            # 添加 UTC+8 時間戳轉換
-            formatted_item["send_time_utc8"] = convert_timestamp_to_utc8_string(
-                formatted_item["send_ts"]
-            )
-            formatted_item["delivered_time_utc8"] = convert_timestamp_to_utc8_string(
-                formatted_item["delivered_ts"]
-            )
-            formatted_item["failed_time_utc8"] = convert_timestamp_to_utc8_string(
-                formatted_item["failed_ts"]
-            )
-            formatted_item["created_time_utc8"] = convert_timestamp_to_utc8_string(
-                formatted_item["created_at"]
-            )
 
-            # Remove None values to keep response clean
-            formatted_item = {k: v for k, v in formatted_item.items() if v is not None}
+def _to_int(value: Any) -> Optional[int]:
+    """安全的數值轉換，空值或無法轉換時回傳 None"""
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
 
-            formatted_items.append(formatted_item)
 
+def convert_seconds_to_utc8_strings(seconds: Iterable[int]) -> Dict[int, Optional[str]]:
+    """將一批 Unix 秒數轉為 UTC+8 字串，每個不同的秒數只格式化一次"""
+    return {second: format_utc8_second(second) for second in set(seconds)}
+
+
+def format_notification_items(items: list, fields: Optional[Tuple[str, ...]] = None) -> list:
+    """
+    Format notification record items with enhanced data handling and UTC+8 timezone conversion
+
+    以欄為單位批次處理：先取出每筆記錄的欄位，再把四個時間戳欄位的所有值
+    依秒去重後一次轉換為 UTC+8 字串，同一秒的時間戳只格式化一次。
+    指定 fields 時只輸出這些欄位（以及其時間戳對應的 *_utc8 字串），不補預設值
+    """
+    rows = []
+    for item in items:
+        try:
+            rows.append(
+                {
+                    "transaction_id": item.get("transaction_id"),
+                    "token": item.get("token"),
+                    "platform": item.get("platform"),
+                    "notification_title": item.get("notification_title"),
+                    "notification_body": item.get("notification_body"),
+                    "status": item.get("status"),
+                    "send_ts": _to_int(item.get("send_ts")),
+                    "delivered_ts": _to_int(item.get("delivered_ts")),
+                    "failed_ts": _to_int(item.get("failed_ts")),
+                    "ap_id": item.get("ap_id"),
+                    "created_at": _to_int(item.get("created_at")) or 0,
+                    "sns_id": item.get("sns_id"),
+                    "retry_cnt": _to_int(item.get("retry_cnt")) or 0,
+                }
+            )
         except Exception as e:
             logger.error(
                 "Error formatting notification item",
-                extra={"item_id": item.get("transaction_id", "unknown"), "error": str(e)},
+                extra={
+                    "item_id": (
+                        item.get("transaction_id", "unknown")
+                        if isinstance(item, dict)
+                        else "unknown"
+                    ),
+                    "error": str(e),
+                },
             )
             # Continue processing other items
             continue
 
+    utc8_by_second = convert_seconds_to_utc8_strings(
+        row[ts_field] // 1000 for row in rows for ts_field, _ in UTC8_TIME_FIELDS if row[ts_field]
+    )
+
+    time_fields = UTC8_TIME_FIELDS
+    if fields is not None:
+        selected = set(fields)
+        time_fields = tuple((ts, tf) for ts, tf in UTC8_TIME_FIELDS if ts in selected)
+
+    formatted_items = []
+    for row in rows:
+        # Remove None values to keep response clean
+        if fields is None:
+            formatted_item = {k: v for k, v in row.items() if v is not None}
+        else:
+            formatted_item = {k: row[k] for k in fields if row[k] is not None}
+        for ts_field, time_field in time_fields:
+            timestamp = row[ts_field]
+            time_string = utc8_by_second[timestamp // 1000] if timestamp else None
+            if time_string is not None:
+                formatted_item[time_field] = time_string
+        formatted_items.append(formatted_item)
+
     logger.info(f"Formatted {len(formatted_items)} notification items")
     return formatted_items
 
@@ -454,8 +1294,29 @@ def format_notification_items(items: list) -> list:
 # Initialize query service
 query_service = QueryService(TABLE_NAME)
 
+# Initialize API resolver（回應 body 以 dumps_json 序列化）
+app = APIGatewayHttpResolver(serializer=dumps_json)
+
 
-@app.get("/tx")
+def get_next_token_param() -> Optional[str]:
+    """讀取 next_token 查詢參數，格式錯誤時回傳 400"""
+    next_token = app.current_event.get_query_string_value("next_token") or None
+    try:
+        decode_continuation_token(next_token)
+    except ValueError as e:
+        raise BadRequestError(str(e))
+    return next_token
+
+
+def get_fields_param() -> Optional[Tuple[str, ...]]:
+    """讀取 fields 查詢參數（逗號分隔），包含未知欄位時回傳 400"""
+    try:
+        return parse_fields(app.current_event.get_query_string_value("fields"))
+    except ValueError as e:
+        raise BadRequestError(str(e))
+
+
+@app.get("/tx", compress=RESPONSE_COMPRESSION_ENABLED)
 @tracer.capture_method
 def get_transaction_notifications() -> Dict[str, Any]:
     """Query notification records by transaction_id or get recent records"""
@@ -463,24 +1324,24 @@ def get_transaction_notifications() -> Dict[str, Any]:
         transaction_id = app.current_event.get_query_string_value("transaction_id")
         limit_str = app.current_event.get_query_string_value("limit")
 
-        # 處理 limit 參數
-        limit = 30  # 預設值
-        if limit_str:
-            try:
-                limit = int(limit_str)
-                limit = max(1, min(limit, 100))  # 限制在 1-100 之間
-            except ValueError:
-                logger.warning(f"Invalid limit parameter: {limit_str}, using default: {limit}")
-
         # transaction_id 現在是可選的
         if transaction_id and not transaction_id.strip():
             transaction_id = None
 
-        result = query_service.query_transaction_notifications(transaction_id, limit)
-        formatted_items = format_notification_items(result["items"])
+        # 處理 limit 參數：指定 transaction_id 時為可選的單頁筆數（未提供時回傳全部記錄），
+        # 否則為最新記錄的筆數（預設 30，限制在 1-100 之間）
+        limit = parse_page_limit(limit_str) if transaction_id else parse_recent_limit(limit_str)
+
+        next_token = get_next_token_param()
+        fields = get_fields_param()
+        result = query_service.query_transaction_notifications(
+            transaction_id, limit, next_token, fields=fields
+        )
+        formatted_items = format_notification_items(result["items"], fields)
+        result_next_token = result.get("next_token")
 
         # 基礎檢驗：根據查詢類型提供不同的回應
-        if len(formatted_items) == 0:
+        if len(formatted_items) == 0 and not result_next_token:
             if transaction_id:
                 logger.info(f"No notifications found for transaction_id: {transaction_id}")
                 return {
@@ -515,16 +1376,20 @@ def get_transaction_notifications() -> Dict[str, Any]:
             "success": True,
             "count": len(formatted_items),
             "items": formatted_items,
+            "schema_version": NOTIFICATION_SCHEMA_VERSION,
             "message": message,
             "query_info": {
                 "transaction_id": transaction_id,
                 "limit": limit,
                 "query_type": "specific" if transaction_id else "recent",
             },
+            "next_token": result_next_token,
         }
 
     except BadRequestError:
         raise
+    except InvalidContinuationTokenError as e:
+        raise BadRequestError(str(e))
     except ClientError as e:
         error_code = e.response.get("Error", {}).get("Code", "UnknownError")
         logger.error(f"DynamoDB error in query_transaction: {error_code}")
@@ -534,7 +1399,7 @@ def get_transaction_notifications() -> Dict[str, Any]:
         raise InternalServerError("Internal server error")
 
 
-@app.get("/fail")
+@app.get("/fail", compress=RESPONSE_COMPRESSION_ENABLED)
 @tracer.capture_method
 def get_failed_notifications() -> Dict[str, Any]:
     """Query failed notification records by optional transaction_id"""
@@ -544,18 +1409,26 @@ def get_failed_notifications() -> Dict[str, Any]:
         if transaction_id and not transaction_id.strip():
             transaction_id = None
 
-        result = query_service.query_failed_notifications(transaction_id)
-        formatted_items = format_notification_items(result["items"])
+        # 分頁參數（可選）：limit 限制單頁筆數，next_token 由上一頁回應取得
+        next_token = get_next_token_param()
+        limit = parse_page_limit(app.current_event.get_query_string_value("limit"))
+
+        fields = get_fields_param()
+        result = query_service.query_failed_notifications(
+            transaction_id, next_token, limit=limit, fields=fields
+        )
+        formatted_items = format_notification_items(result["items"], fields)
+        result_next_token = result.get("next_token")
 
         # 基礎檢驗：區分特定 transaction_id 查詢和全部失敗記錄查詢
         if len(formatted_items) == 0:
-            if transaction_id:
+            if transaction_id and not result_next_token:
                 # 查詢特定 transaction_id 但無結果
                 logger.info(f"No failed notifications found for transaction_id: {transaction_id}")
                 return {
                     "statusCode": 404,
                     "headers": {"Content-Type": "application/json"},
-                    "body": json.dumps(
+                    "body": dumps_json(
                         {
                             "success": False,
                             "count": 0,
@@ -575,6 +1448,7 @@ def get_failed_notifications() -> Dict[str, Any]:
                     "count": 0,
                     "items": [],
                     "message": "No failed notifications found in the system",
+                    "next_token": result_next_token,
                 }
 
         # 有找到結果或查詢所有失敗記錄
@@ -592,9 +1466,15 @@ def get_failed_notifications() -> Dict[str, Any]:
             "success": True,
             "count": len(formatted_items),
             "items": formatted_items,
+            "schema_version": NOTIFICATION_SCHEMA_VERSION,
             "message": success_msg,
+            "next_token": result_next_token,
         }
 
+    except BadRequestError:
+        raise
+    except InvalidContinuationTokenError as e:
+        raise BadRequestError(str(e))
     except ClientError as e:
         error_code = e.response.get("Error", {}).get("Code", "UnknownError")
         logger.error(f"DynamoDB error in query_failed: {error_code}")
@@ -604,7 +1484,7 @@ def get_failed_notifications() -> Dict[str, Any]:
         raise InternalServerError("Internal server error")
 
 
-@app.get("/sns")
+@app.get("/sns", compress=RESPONSE_COMPRESSION_ENABLED)
 @tracer.capture_method
 def get_sns_notifications() -> Dict[str, Any]:
     """Query notification records by sns_id"""
@@ -614,11 +1494,18 @@ def get_sns_notifications() -> Dict[str, Any]:
             logger.warning("Missing or empty sns_id parameter")
             raise BadRequestError("Missing or empty sns_id parameter")
 
-        result = query_service.query_sns_notifications(sns_id)
-        formatted_items = format_notification_items(result["items"])
+        next_token = get_next_token_param()
+        limit = parse_page_limit(app.current_event.get_query_string_value("limit"))
+
+        fields = get_fields_param()
+        result = query_service.query_sns_notifications(
+            sns_id, next_token, limit=limit, fields=fields
+        )
+        formatted_items = format_notification_items(result["items"], fields)
+        result_next_token = result.get("next_token")
 
         # 基礎檢驗：如果沒有找到任何結果，返回適當的訊息
-        if len(formatted_items) == 0:
+        if len(formatted_items) == 0 and not result_next_token:
             logger.info(f"No notifications found for sns_id: {sns_id}")
             return {
                 "success": False,
@@ -632,15 +1519,19 @@ def get_sns_notifications() -> Dict[str, Any]:
             "success": True,
             "count": len(formatted_items),
             "items": formatted_items,
+            "schema_version": NOTIFICATION_SCHEMA_VERSION,
             "message": (
                 f"Successfully retrieved {len(formatted_items)} "
                 f"notifications for SNS ID: {sns_id}"
             ),
+            "next_token": result_next_token,
         }
 
     except BadRequestError:
         # Re-raise BadRequestError to let PowerTools handle it
         raise
+    except InvalidContinuationTokenError as e:
+        raise BadRequestError(str(e))
     except ClientError as e:
         error_code = e.response.get("Error", {}).get("Code", "UnknownError")
         logger.error(f"DynamoDB error in query_sns: {error_code}")
@@ -684,33 +1575,46 @@ def lambda_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, A
         query_type = body.get("query_type")
         logger.info("Processing direct Lambda invocation", extra={"query_type": query_type})
 
+        # 分頁與欄位參數（可選），三種查詢共用
+        next_token = body.get("next_token") or None
+        try:
+            decode_continuation_token(next_token)
+            fields = parse_fields(body.get("fields"))
+        except ValueError as e:
+            return {
+                "statusCode": 400,
+                "headers": {"Content-Type": "application/json"},
+                "body": dumps_json({"error": str(e)}),
+            }
+
         if query_type == "tx":
             transaction_id = body.get("transaction_id")
-            limit = body.get("limit", 30)
-
-            # 處理 limit 參數
-            try:
-                limit = int(limit)
-                limit = max(1, min(limit, 100))  # 限制在 1-100 之間
-            except (ValueError, TypeError):
-                logger.warning(f"Invalid limit parameter: {limit}, using default: 30")
-                limit = 30
 
             # transaction_id 現在是可選的
             if transaction_id and not transaction_id.strip():
                 transaction_id = None
 
-            result = query_service.query_transaction_notifications(transaction_id, limit)
-            formatted_items = format_notification_items(result["items"])
+            # 處理 limit 參數：與 API Gateway 的 /tx 相同
+            limit = (
+                parse_page_limit(body.get("limit"))
+                if transaction_id
+                else parse_recent_limit(body.get("limit"))
+            )
+
+            result = query_service.query_transaction_notifications(
+                transaction_id, limit, next_token, fields=fields
+            )
+            formatted_items = format_notification_items(result["items"], fields)
+            result_next_token = result.get("next_token")
 
             # 基礎檢驗：根據查詢類型提供不同的回應
-            if len(formatted_items) == 0:
+            if len(formatted_items) == 0 and not result_next_token:
                 if transaction_id:
                     logger.info(f"No notifications found for transaction_id: {transaction_id}")
                     return {
                         "statusCode": 404,
                         "headers": {"Content-Type": "application/json"},
-                        "body": json.dumps(
+                        "body": dumps_json(
                             {
                                 "success": False,
                                 "count": 0,
@@ -727,7 +1631,7 @@ def lambda_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, A
                     return {
                         "statusCode": 200,
                         "headers": {"Content-Type": "application/json"},
-                        "body": json.dumps(
+                        "body": dumps_json(
                             {
                                 "success": True,
                                 "count": 0,
@@ -760,19 +1664,20 @@ def lambda_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, A
                     ),
                     "Access-Control-Allow-Methods": "GET,POST,OPTIONS",
                 },
-                "body": json.dumps(
+                "body": dumps_json(
                     {
                         "success": True,
                         "count": len(formatted_items),
                         "items": formatted_items,
+                        "schema_version": NOTIFICATION_SCHEMA_VERSION,
                         "message": message,
                         "query_info": {
                             "transaction_id": transaction_id,
                             "limit": limit,
                             "query_type": "specific" if transaction_id else "recent",
                         },
+                        "next_token": result_next_token,
                     },
-                    default=decimal_to_int,
                 ),
             }
 
@@ -786,12 +1691,18 @@ def lambda_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, A
                 f"Direct invocation: failed query for " f"transaction_id: {transaction_id or 'all'}"
             )
 
-            result = query_service.query_failed_notifications(transaction_id)
-            formatted_items = format_notification_items(result["items"])
+            result = query_service.query_failed_notifications(
+                transaction_id,
+                next_token,
+                limit=parse_page_limit(body.get("limit")),
+                fields=fields,
+            )
+            formatted_items = format_notification_items(result["items"], fields)
+            result_next_token = result.get("next_token")
 
             # 基礎檢驗：區分特定 transaction_id 查詢和全部失敗記錄查詢
             if len(formatted_items) == 0:
-                if transaction_id:
+                if transaction_id and not result_next_token:
                     # 查詢特定 transaction_id 但無結果
                     logger.info(
                         f"No failed notifications found for transaction_id: {transaction_id}"
@@ -799,7 +1710,7 @@ def lambda_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, A
                     return {
                         "statusCode": 404,
                         "headers": {"Content-Type": "application/json"},
-                        "body": json.dumps(
+                        "body": dumps_json(
                             {
                                 "success": False,
                                 "count": 0,
@@ -836,14 +1747,15 @@ def lambda_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, A
                     ),
                     "Access-Control-Allow-Methods": "GET,POST,OPTIONS",
                 },
-                "body": json.dumps(
+                "body": dumps_json(
                     {
                         "success": True,
                         "count": len(formatted_items),
                         "items": formatted_items,
+                        "schema_version": NOTIFICATION_SCHEMA_VERSION,
                         "message": success_msg,
+                        "next_token": result_next_token,
                     },
-                    default=decimal_to_int,
                 ),
             }
 
@@ -854,19 +1766,22 @@ def lambda_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, A
                 return {
                     "statusCode": 400,
                     "headers": {"Content-Type": "application/json"},
-                    "body": json.dumps({"error": "Missing or empty sns_id"}),
+                    "body": dumps_json({"error": "Missing or empty sns_id"}),
                 }
 
-            result = query_service.query_sns_notifications(sns_id)
-            formatted_items = format_notification_items(result["items"])
+            result = query_service.query_sns_notifications(
+                sns_id, next_token, limit=parse_page_limit(body.get("limit")), fields=fields
+            )
+            formatted_items = format_notification_items(result["items"], fields)
+            result_next_token = result.get("next_token")
 
             # 基礎檢驗：如果沒有找到任何結果，返回適當的訊息
-            if len(formatted_items) == 0:
+            if len(formatted_items) == 0 and not result_next_token:
                 logger.info(f"No notifications found for sns_id: {sns_id}")
                 return {
                     "statusCode": 404,
                     "headers": {"Content-Type": "application/json"},
-                    "body": json.dumps(
+                    "body": dumps_json(
                         {
                             "success": False,
                             "count": 0,
@@ -889,13 +1804,14 @@ def lambda_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, A
                     ),
                     "Access-Control-Allow-Methods": "GET,POST,OPTIONS",
                 },
-                "body": json.dumps(
+                "body": dumps_json(
                     {
                         "success": True,
                         "count": len(formatted_items),
                         "items": formatted_items,
+                        "schema_version": NOTIFICATION_SCHEMA_VERSION,
+                        "next_token": result_next_token,
                     },
-                    default=decimal_to_int,
                 ),
             }
 
@@ -904,7 +1820,7 @@ def lambda_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, A
             return {
                 "statusCode": 400,
                 "headers": {"Content-Type": "application/json"},
-                "body": json.dumps(
+                "body": dumps_json(
                     {
                         "error": "Invalid query_type",
                         "supported_types": ["tx", "fail", "sns"],
@@ -912,18 +1828,24 @@ def lambda_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, A
                 ),
             }
 
+    except InvalidContinuationTokenError as e:
+        return {
+            "statusCode": 400,
+            "headers": {"Content-Type": "application/json"},
+            "body": dumps_json({"error": str(e)}),
+        }
     except ClientError as e:
         error_code = e.response.get("Error", {}).get("Code", "UnknownError")
         logger.error(f"DynamoDB error: {error_code}")
         return {
             "statusCode": 502,
             "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({"error": "Database connection error", "code": error_code}),
+            "body": dumps_json({"error": "Database connection error", "code": error_code}),
         }
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         return {
             "statusCode": 500,
             "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({"error": "Internal server error", "details": str(e)}),
+            "body": dumps_json({"error": "Internal server error", "details": str(e)}),
         }
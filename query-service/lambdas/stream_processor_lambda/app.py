@@ -1,10 +1,20 @@
+import base64
 import os
+import random
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
 from enum import Enum
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
 
 import boto3
-from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
 from aws_lambda_powertools.utilities.typing import LambdaContext
 from botocore.exceptions import ClientError
 
@@ -14,6 +24,10 @@ IS_LAMBDA_ENV = os.environ.get("AWS_LAMBDA_FUNCTION_NAME") is not None
 # Initialize PowerTools (without decorators in lambda_handler)
 logger = Logger(service="stream-processor-lambda")
 tracer = Tracer(service="stream-processor-lambda")
+metrics = Metrics(
+    namespace=os.environ.get("POWERTOOLS_METRICS_NAMESPACE", "QueryService"),
+    service="stream-processor-lambda",
+)
 
 # ================================
 # Domain Models and Value Objects
@@ -36,7 +50,9 @@ class Platform(Enum):
     WEBPUSH = "WEBPUSH"
 
 
-@dataclass
+# 記錄型別使用 __slots__，不建立每個實例的 __dict__（frozen 會讓 __init__ 改走
+# object.__setattr__，建構成本約為 3 倍，因此不使用）
+@dataclass(slots=True)
 class CommandRecord:
     """Command side record structure"""
 
@@ -48,14 +64,15 @@ class CommandRecord:
     status: NotificationStatus
     platform: Platform
     device_token: Optional[str]
-    payload: Optional[str]
+    payload: Optional[Any]  # 字串或 DynamoDB map 解碼後的 dict
     error_msg: Optional[str]
     ap_id: Optional[str]
     sns_id: Optional[str] = None
     retry_cnt: int = 0
+    projection_version: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class QueryRecord:
     """Query side record structure for notification-records table"""
 
@@ -70,6 +87,35 @@ class QueryRecord:
     ap_id: Optional[str]
     sns_id: Optional[str] = None
     retry_cnt: int = 0
+    projection_version: Optional[str] = None
+
+
+# 可直接寫入讀取表的記錄：CommandRecord 包含 QueryRecord 的所有欄位，不需轉換時直接使用
+ProjectionRecord = Union[CommandRecord, QueryRecord]
+
+
+@dataclass(slots=True)
+class ProjectionUpdate:
+    """MODIFY event: only the projected attributes that changed between OldImage and NewImage"""
+
+    transaction_id: str
+    # 完整的新投影 item：提供主鍵與版本，投影記錄不存在時改為整筆寫入
+    item: Dict[str, Any]
+    set_attributes: Dict[str, Any]
+    remove_attributes: Tuple[str, ...] = ()
+
+
+@dataclass(slots=True)
+class ProjectionDelete:
+    """REMOVE event: delete the projection row"""
+
+    transaction_id: str
+    # 讀取表主鍵（user_id, created_at），有版本時另含 projection_version
+    item: Dict[str, Any]
+
+
+# lambda_handler 交給寫入流程的單位：整筆寫入、差異更新或刪除
+ProjectionWrite = Union[CommandRecord, QueryRecord, ProjectionUpdate, ProjectionDelete]
 
 
 def get_dynamodb_resource() -> Any:
@@ -112,69 +158,158 @@ def get_dynamodb() -> Any:
 READ_TABLE_NAME = os.environ.get("NOTIFICATION_TABLE_NAME", "notification-records")
 logger.info(f"Configured read table name: {READ_TABLE_NAME}")
 
+# 「最新記錄」GSI 的分桶欄位（partition key = day_bucket，sort key = created_at）
+DAY_BUCKET_ATTRIBUTE = "day_bucket"
+
+# 失敗記錄稀疏 GSI 的分桶欄位，只寫在 FAILED 記錄上（partition key = failed_bucket）
+# 單一分桶值代表所有失敗記錄寫入同一個 GSI 分區，上限約每秒 1,000 WCU；超過時需改為多個分桶
+FAILED_BUCKET_ATTRIBUTE = "failed_bucket"
+FAILED_BUCKET_VALUE = "FAILED"
+
+# BatchWriteItem 單次上限為 25 筆；UnprocessedItems 以 jittered exponential backoff 重試
+BATCH_WRITE_SIZE = 25
+BATCH_WRITE_MAX_ATTEMPTS = int(os.environ.get("BATCH_WRITE_MAX_ATTEMPTS", "5"))
+BATCH_WRITE_BASE_DELAY = float(os.environ.get("BATCH_WRITE_BASE_DELAY", "0.05"))
+BATCH_WRITE_MAX_DELAY = float(os.environ.get("BATCH_WRITE_MAX_DELAY", "2.0"))
+
+# BatchGetItem 單次上限為 100 個 key，用於讀取已存的投影版本
+BATCH_GET_SIZE = 100
+
+
+# 同一投影主鍵（user_id, created_at）的記錄固定在同一條 lane 依序寫入，不同 lane 之間並行
+STREAM_PROCESSOR_PARALLELISM = int(os.environ.get("STREAM_PROCESSOR_PARALLELISM", "1"))
+
+# 投影版本：stream SequenceNumber 補零為固定長度的字串，可依字典序比較新舊
+PROJECTION_VERSION_ATTRIBUTE = "projection_version"
+SEQUENCE_NUMBER_WIDTH = 40
+
+# 預設以 BatchWriteItem 批次寫入：略過本容器已套用過的版本，其餘有版本的記錄先以
+# BatchGetItem 讀取已存的版本，過期或重送的事件不寫入（讀與寫之間不是原子操作）；
+# 設為 true 時有版本的記錄改以條件式 PutItem 逐筆寫入，由 DynamoDB 原子地拒絕
+PROJECTION_CONDITIONAL_WRITES = (
+    os.environ.get("PROJECTION_CONDITIONAL_WRITES", "false").lower() == "true"
+)
+
+# 暖容器內記住最近寫入的版本（依主鍵，LRU），重送的事件不再送出寫入
+PROJECTION_DEDUPE_CACHE_SIZE = int(os.environ.get("PROJECTION_DEDUPE_CACHE_SIZE", "10000"))
+
+# 同一批次內同一主鍵的多個事件（INSERT → MODIFY → MODIFY）合併為一次最終狀態的寫入
+PROJECTION_COALESCE_WRITES = os.environ.get("PROJECTION_COALESCE_WRITES", "true").lower() == "true"
+
+
+def day_bucket_for(created_at: int) -> str:
+    """Return the UTC day bucket (YYYY-MM-DD) of a millisecond timestamp"""
+    return datetime.fromtimestamp(created_at / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _decode_number(raw: str) -> Any:
+    """DynamoDB 數值字串：整數轉 int，其他（小數、指數）轉 Decimal"""
+    try:
+        return int(raw)
+    except ValueError:
+        return Decimal(raw)
+
+
+# Stream image 屬性型別 → 解碼函式（涵蓋 DynamoDB 的所有資料型別）
+_ATTRIBUTE_DECODERS: Dict[str, Callable[[Any], Any]] = {
+    "S": str,
+    "N": _decode_number,
+    "BOOL": bool,
+    "NULL": lambda raw: None,
+    "B": base64.b64decode,
+    "SS": set,
+    "NS": lambda raw: {_decode_number(number) for number in raw},
+    "BS": lambda raw: {base64.b64decode(value) for value in raw},
+    "L": lambda raw: [decode_attribute(value) for value in raw],
+    "M": lambda raw: {name: decode_attribute(value) for name, value in raw.items()},
+}
+
+
+def decode_attribute(dynamo_value: Dict[str, Any]) -> Any:
+    """
+    Decode a single DynamoDB attribute value ({"S": ...}, {"N": ...}, ...)
+
+    Raises ValueError for unknown types or malformed values.
+    """
+    try:
+        ((type_code, raw),) = dynamo_value.items()
+        return _ATTRIBUTE_DECODERS[type_code](raw)
+    except (ValueError, KeyError, TypeError, AttributeError, ArithmeticError) as e:
+        raise ValueError(f"Invalid DynamoDB attribute value {dynamo_value!r}: {e}") from e
+
 
 def extract_value(item: Dict[str, Any], key: str, default: Any = None) -> Any:
     """Extract value from DynamoDB format with type safety"""
     if key not in item:
         return default
 
-    dynamo_value = item[key]
     try:
-        if "S" in dynamo_value:
-            return dynamo_value["S"]
-        elif "N" in dynamo_value:
-            return int(dynamo_value["N"])
-        elif "BOOL" in dynamo_value:
-            return dynamo_value["BOOL"]
-        else:
-            logger.warning(f"Unknown DynamoDB type for key {key}: {dynamo_value}")
-            return default
-    except (ValueError, KeyError) as e:
-        logger.error(f"Error extracting value for key {key}: {str(e)}")
+        return decode_attribute(item[key])
+    except ValueError as e:
+        logger.warning(f"Unknown DynamoDB type for key {key}: {e}")
         return default
 
 
+# CommandRecord 欄位表：NewImage 屬性名稱即欄位名稱，值為未提供（或 NULL）時的預設值
+_COMMAND_FIELD_DEFAULTS: Dict[str, Any] = {
+    "transaction_id": None,
+    "created_at": None,
+    "user_id": None,
+    "marketing_id": None,
+    "notification_title": None,
+    "status": None,
+    "platform": None,
+    "device_token": None,
+    "payload": None,
+    "error_msg": None,
+    "ap_id": None,
+    "sns_id": None,
+    "retry_cnt": 0,
+}
+_REQUIRED_COMMAND_FIELDS = ("transaction_id", "created_at", "user_id", "notification_title")
+
+_STATUS_BY_VALUE = {status.value: status for status in NotificationStatus}
+_PLATFORM_BY_VALUE = {platform.value: platform for platform in Platform}
+
+
 def parse_command_record(dynamo_record: Dict[str, Any]) -> CommandRecord:
-    """Parse DynamoDB format command record with enhanced error handling"""
+    """
+    Parse DynamoDB format command record with enhanced error handling
+
+    依欄位表單次走訪 NewImage：只解碼 CommandRecord 用到的屬性，NULL 視為未提供
+    """
     try:
-        status_str = extract_value(dynamo_record, "status")
-        platform_str = extract_value(dynamo_record, "platform")
+        values = _COMMAND_FIELD_DEFAULTS.copy()
+        for name, dynamo_value in dynamo_record.items():
+            if name in values:
+                # 推播記錄幾乎只有 S 與 N，直接取值；其他型別才經過 decode_attribute
+                decoded = dynamo_value.get("S")
+                if decoded is None:
+                    raw = dynamo_value.get("N")
+                    if raw is not None:
+                        decoded = _decode_number(raw)
+                    else:
+                        decoded = decode_attribute(dynamo_value)
+                        if decoded is None:
+                            continue
+                values[name] = decoded
 
         # Validate required fields
-        transaction_id = extract_value(dynamo_record, "transaction_id")
-        created_at = extract_value(dynamo_record, "created_at")
-        user_id = extract_value(dynamo_record, "user_id")
-        notification_title = extract_value(dynamo_record, "notification_title")
-
-        if not all([transaction_id, created_at, user_id, notification_title]):
-            missing_fields = [
-                field
-                for field, value in [
-                    ("transaction_id", transaction_id),
-                    ("created_at", created_at),
-                    ("user_id", user_id),
-                    ("notification_title", notification_title),
-                ]
-                if not value
-            ]
+        if not (
+            values["transaction_id"]
+            and values["created_at"]
+            and values["user_id"]
+            and values["notification_title"]
+        ):
+            missing_fields = [field for field in _REQUIRED_COMMAND_FIELDS if not values[field]]
             raise ValueError(f"Missing required fields: {missing_fields}")
 
-        return CommandRecord(
-            transaction_id=transaction_id,
-            created_at=created_at,
-            user_id=user_id,
-            marketing_id=extract_value(dynamo_record, "marketing_id"),
-            notification_title=notification_title,
-            status=NotificationStatus(status_str) if status_str else NotificationStatus.SENT,
-            platform=Platform(platform_str) if platform_str else Platform.IOS,
-            device_token=extract_value(dynamo_record, "device_token"),
-            payload=extract_value(dynamo_record, "payload"),
-            error_msg=extract_value(dynamo_record, "error_msg"),
-            ap_id=extract_value(dynamo_record, "ap_id"),
-            sns_id=extract_value(dynamo_record, "sns_id"),
-            retry_cnt=extract_value(dynamo_record, "retry_cnt", 0),
-        )
-    except (ValueError, KeyError) as e:
+        status_str = values["status"]
+        platform_str = values["platform"]
+        values["status"] = _STATUS_BY_VALUE[status_str] if status_str else NotificationStatus.SENT
+        values["platform"] = _PLATFORM_BY_VALUE[platform_str] if platform_str else Platform.IOS
+        return CommandRecord(**values)
+    except (ValueError, KeyError, TypeError, ArithmeticError) as e:
         logger.error(
             f"Failed to parse command record: {e}, record_keys: {list(dynamo_record.keys())}"
         )
@@ -198,36 +333,209 @@ def transform_to_query_record(command_record: CommandRecord) -> QueryRecord:
         ap_id=command_record.ap_id,
         sns_id=command_record.sns_id,
         retry_cnt=command_record.retry_cnt,
+        projection_version=command_record.projection_version,
     )
 
 
-def save_query_record(query_record: QueryRecord) -> None:
+def build_query_item(query_record: ProjectionRecord) -> Dict[str, Any]:
+    """Build the read table item for a query record (or a command record, field for field)"""
+    item: Dict[str, Any] = {
+        "user_id": query_record.user_id,
+        "created_at": query_record.created_at,
+        "transaction_id": query_record.transaction_id,
+        "notification_title": query_record.notification_title,
+        "status": query_record.status.value,
+        "platform": query_record.platform.value,
+        DAY_BUCKET_ATTRIBUTE: day_bucket_for(query_record.created_at),
+    }
+
+    if query_record.marketing_id:
+        item["marketing_id"] = query_record.marketing_id
+    if query_record.error_msg:
+        item["error_msg"] = query_record.error_msg
+    if query_record.ap_id:
+        item["ap_id"] = query_record.ap_id
+    if query_record.sns_id:
+        item["sns_id"] = query_record.sns_id
+    if query_record.retry_cnt > 0:
+        item["retry_cnt"] = query_record.retry_cnt
+    if query_record.status == NotificationStatus.FAILED:
+        item[FAILED_BUCKET_ATTRIBUTE] = FAILED_BUCKET_VALUE
+    if query_record.projection_version:
+        item[PROJECTION_VERSION_ATTRIBUTE] = query_record.projection_version
+
+    return item
+
+
+def projection_version_of(record: Dict[str, Any]) -> Optional[str]:
+    """Projection version of a stream record (zero-padded SequenceNumber), None if absent"""
+    sequence_number = record.get("dynamodb", {}).get("SequenceNumber")
+    if not sequence_number:
+        return None
+    return str(sequence_number).zfill(SEQUENCE_NUMBER_WIDTH)
+
+
+def conditional_put_kwargs(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    PutItem arguments that only apply the item if it is newer than the stored projection
+
+    Rows written before versioning have no version attribute and are overwritten.
+    """
+    return {
+        "Item": item,
+        "ConditionExpression": "attribute_not_exists(#version) OR #version < :version",
+        "ExpressionAttributeNames": {"#version": PROJECTION_VERSION_ATTRIBUTE},
+        "ExpressionAttributeValues": {":version": item[PROJECTION_VERSION_ATTRIBUTE]},
+    }
+
+
+def _version_condition(names: Dict[str, str], values: Dict[str, Any], version: Any) -> str:
+    """Condition that only lets a newer projection version through (adds its placeholders)"""
+    names["#version"] = PROJECTION_VERSION_ATTRIBUTE
+    values[":version"] = version
+    return "(attribute_not_exists(#version) OR #version < :version)"
+
+
+def update_item_kwargs(update: ProjectionUpdate) -> Dict[str, Any]:
+    """
+    UpdateItem arguments that SET the changed attributes and REMOVE the dropped ones
+
+    The row must already exist, so an update never creates a partial projection;
+    with a version the update must also be newer than the stored projection.
+    """
+    names: Dict[str, str] = {"#pk": "user_id"}
+    values: Dict[str, Any] = {}
+    condition = "attribute_exists(#pk)"
+    assignments: Dict[str, Any] = dict(update.set_attributes)
+
+    version = update.item.get(PROJECTION_VERSION_ATTRIBUTE)
+    if version is not None:
+        condition += " AND " + _version_condition(names, values, version)
+        assignments[PROJECTION_VERSION_ATTRIBUTE] = version
+
+    clauses = []
+    set_clauses = []
+    for index, (name, value) in enumerate(assignments.items()):
+        names[f"#s{index}"] = name
+        values[f":s{index}"] = value
+        set_clauses.append(f"#s{index} = :s{index}")
+    if set_clauses:
+        clauses.append("SET " + ", ".join(set_clauses))
+    if update.remove_attributes:
+        for index, name in enumerate(update.remove_attributes):
+            names[f"#r{index}"] = name
+        clauses.append(
+            "REMOVE " + ", ".join(f"#r{index}" for index in range(len(update.remove_attributes)))
+        )
+
+    kwargs: Dict[str, Any] = {
+        "Key": dict(zip(("user_id", "created_at"), _item_key(update.item))),
+        "UpdateExpression": " ".join(clauses),
+        "ConditionExpression": condition,
+        "ExpressionAttributeNames": names,
+    }
+    # DynamoDB 拒絕空的 ExpressionAttributeValues（只有 REMOVE 且沒有版本時）
+    if values:
+        kwargs["ExpressionAttributeValues"] = values
+    return kwargs
+
+
+def delete_item_kwargs(delete: ProjectionDelete) -> Dict[str, Any]:
+    """DeleteItem arguments; with a version a stale REMOVE cannot delete a newer projection"""
+    kwargs: Dict[str, Any] = {"Key": dict(zip(("user_id", "created_at"), _item_key(delete.item)))}
+    version = delete.item.get(PROJECTION_VERSION_ATTRIBUTE)
+    if version is not None:
+        names: Dict[str, str] = {}
+        values: Dict[str, Any] = {}
+        kwargs["ConditionExpression"] = _version_condition(names, values, version)
+        kwargs["ExpressionAttributeNames"] = names
+        kwargs["ExpressionAttributeValues"] = values
+    return kwargs
+
+
+def build_projection_update(
+    old_record: ProjectionRecord, new_record: ProjectionRecord
+) -> Optional[ProjectionUpdate]:
+    """Diff the projected items of two record versions; None when nothing projected changed"""
+    old_item = build_query_item(old_record)
+    new_item = build_query_item(new_record)
+    set_attributes = {
+        name: value
+        for name, value in new_item.items()
+        if name != PROJECTION_VERSION_ATTRIBUTE and old_item.get(name) != value
+    }
+    remove_attributes = tuple(
+        name for name in old_item if name != PROJECTION_VERSION_ATTRIBUTE and name not in new_item
+    )
+    if not set_attributes and not remove_attributes:
+        return None
+    return ProjectionUpdate(
+        transaction_id=new_record.transaction_id,
+        item=new_item,
+        set_attributes=set_attributes,
+        remove_attributes=remove_attributes,
+    )
+
+
+def is_conditional_check_failure(error: ClientError) -> bool:
+    """Whether a ClientError is a rejected ConditionExpression"""
+    return bool(error.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException")
+
+
+class AppliedVersionCache:
+    """
+    Recently applied projection versions per primary key, kept for the warm container
+
+    LRU bounded by max_size; shared by the write lanes, so access is locked.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._versions: "OrderedDict[Tuple[Any, Any], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_applied(self, key: Tuple[Any, Any], version: str) -> bool:
+        """Whether the key already holds this version or a newer one"""
+        with self._lock:
+            applied = self._versions.get(key)
+            return applied is not None and applied >= version
+
+    def record(self, key: Tuple[Any, Any], version: str) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            applied = self._versions.get(key)
+            if applied is None or applied < version:
+                self._versions[key] = version
+            self._versions.move_to_end(key)
+            while len(self._versions) > self.max_size:
+                self._versions.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._versions.clear()
+
+
+_applied_versions = AppliedVersionCache(PROJECTION_DEDUPE_CACHE_SIZE)
+
+
+def save_query_record(query_record: ProjectionRecord) -> None:
     """Save query record to DynamoDB"""
     try:
         dynamodb = get_dynamodb()
         table = dynamodb.Table(READ_TABLE_NAME)
 
-        item = {
-            "user_id": query_record.user_id,
-            "created_at": query_record.created_at,
-            "transaction_id": query_record.transaction_id,
-            "notification_title": query_record.notification_title,
-            "status": query_record.status.value,
-            "platform": query_record.platform.value,
-        }
-
-        if query_record.marketing_id:
-            item["marketing_id"] = query_record.marketing_id
-        if query_record.error_msg:
-            item["error_msg"] = query_record.error_msg
-        if query_record.ap_id:
-            item["ap_id"] = query_record.ap_id
-        if query_record.sns_id:
-            item["sns_id"] = query_record.sns_id
-        if query_record.retry_cnt > 0:
-            item["retry_cnt"] = query_record.retry_cnt
-
-        table.put_item(Item=item)
+        item = build_query_item(query_record)
+        if PROJECTION_CONDITIONAL_WRITES and PROJECTION_VERSION_ATTRIBUTE in item:
+            try:
+                table.put_item(**conditional_put_kwargs(item))
+            except ClientError as e:
+                if not is_conditional_check_failure(e):
+                    raise
+                logger.info(f"Skipped stale or duplicate record: {query_record.transaction_id}")
+                return
+        else:
+            table.put_item(Item=item)
         logger.info(f"Successfully saved query record: {query_record.transaction_id}")
 
     except ClientError as e:
@@ -239,50 +547,585 @@ def save_query_record(query_record: QueryRecord) -> None:
         raise
 
 
+@dataclass(slots=True)
+class WriteOutcome:
+    """Per-record result of a batch write"""
+
+    query_record: ProjectionWrite
+    success: bool
+    attempts: int = 0
+    error: Optional[str] = None
+    # 重送或過期的事件：已套用（本地快取）或被條件式寫入拒絕，視為成功
+    duplicate: bool = False
+
+
+def _item_key(item: Dict[str, Any]) -> Tuple[Any, Any]:
+    """Primary key (user_id, created_at) of a read table item"""
+    return item["user_id"], item["created_at"]
+
+
+def _chunk_items(items: List[Dict[str, Any]], indexes: Sequence[int]) -> List[List[int]]:
+    """
+    Split item indexes into BatchWriteItem chunks of at most BATCH_WRITE_SIZE
+
+    A single BatchWriteItem request rejects duplicate keys, so a repeated key
+    starts a new chunk; chunks are written in order, so the later write still wins.
+    """
+    chunks: List[List[int]] = []
+    current: List[int] = []
+    keys: Set[Tuple[Any, Any]] = set()
+    for index in indexes:
+        key = _item_key(items[index])
+        if len(current) >= BATCH_WRITE_SIZE or key in keys:
+            chunks.append(current)
+            current, keys = [], set()
+        current.append(index)
+        keys.add(key)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff delay in seconds"""
+    return random.uniform(0, min(BATCH_WRITE_MAX_DELAY, BATCH_WRITE_BASE_DELAY * (2**attempt)))
+
+
+def _write_chunk(
+    dynamodb: Any, items: List[Dict[str, Any]], outcomes: List[WriteOutcome], chunk: List[int]
+) -> None:
+    """Write one chunk, retrying UnprocessedItems until done or attempts run out"""
+    pending = {_item_key(items[index]): index for index in chunk}
+
+    for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+        if attempt:
+            time.sleep(_backoff_delay(attempt))
+
+        requests = [{"PutRequest": {"Item": items[index]}} for index in pending.values()]
+        for index in pending.values():
+            outcomes[index].attempts += 1
+
+        try:
+            response = dynamodb.batch_write_item(RequestItems={READ_TABLE_NAME: requests})
+        except ClientError as e:
+            error_code = e.response.get("Error", {}).get("Code", "UnknownError")
+            logger.error(f"DynamoDB ClientError in batch write: {error_code} - {str(e)}")
+            for index in pending.values():
+                outcomes[index].error = error_code
+            return
+
+        unprocessed = response.get("UnprocessedItems", {}).get(READ_TABLE_NAME, [])
+        unprocessed_keys = {_item_key(request["PutRequest"]["Item"]) for request in unprocessed}
+        for key, index in pending.items():
+            if key not in unprocessed_keys:
+                outcomes[index].success = True
+        pending = {key: pending[key] for key in unprocessed_keys if key in pending}
+        if not pending:
+            return
+
+        logger.warning(f"Batch write left {len(pending)} unprocessed items (attempt {attempt + 1})")
+
+    for index in pending.values():
+        outcomes[index].error = "UnprocessedItems"
+
+
+def _low_level_client(dynamodb: Any) -> Any:
+    """resource 沒有 put_item / update_item，使用其 low-level client（同樣接受 Python 原生型別）"""
+    return dynamodb if hasattr(dynamodb, "put_item") else dynamodb.meta.client
+
+
+def _write_conditionally(
+    outcome: WriteOutcome, operation: Callable[..., Any], **kwargs: Any
+) -> bool:
+    """
+    Run one conditional single-item write and record it on the outcome
+
+    Returns False when the condition rejected the write; other ClientErrors are
+    recorded as the outcome's error.
+    """
+    outcome.attempts += 1
+    try:
+        operation(TableName=READ_TABLE_NAME, **kwargs)
+    except ClientError as e:
+        if is_conditional_check_failure(e):
+            return False
+        error_code = e.response.get("Error", {}).get("Code", "UnknownError")
+        logger.error(f"DynamoDB ClientError in conditional write: {error_code} - {str(e)}")
+        outcome.error = error_code
+        return True
+    outcome.success = True
+    return True
+
+
+def _put_conditionally(dynamodb: Any, item: Dict[str, Any], outcome: WriteOutcome) -> None:
+    """Write one versioned item with a ConditionExpression; a rejection marks it duplicate"""
+    client = _low_level_client(dynamodb)
+    if not _write_conditionally(outcome, client.put_item, **conditional_put_kwargs(item)):
+        outcome.success = outcome.duplicate = True
+
+
+def _update_conditionally(dynamodb: Any, update: ProjectionUpdate, outcome: WriteOutcome) -> None:
+    """
+    Apply a MODIFY diff with UpdateItem
+
+    A rejected update means the row is missing (its INSERT was never projected)
+    or already newer; the full item is then put only if the row does not exist.
+    """
+    client = _low_level_client(dynamodb)
+    if _write_conditionally(outcome, client.update_item, **update_item_kwargs(update)):
+        return
+    if not _write_conditionally(
+        outcome,
+        client.put_item,
+        Item=update.item,
+        ConditionExpression="attribute_not_exists(#pk)",
+        ExpressionAttributeNames={"#pk": "user_id"},
+    ):
+        outcome.success = outcome.duplicate = True
+
+
+def _delete_conditionally(dynamodb: Any, delete: ProjectionDelete, outcome: WriteOutcome) -> None:
+    """Apply a REMOVE with DeleteItem; a rejection means a newer projection exists"""
+    client = _low_level_client(dynamodb)
+    if not _write_conditionally(outcome, client.delete_item, **delete_item_kwargs(delete)):
+        outcome.success = outcome.duplicate = True
+
+
+def _stored_versions(dynamodb: Any, keys: Sequence[Tuple[Any, Any]]) -> Dict[Tuple[Any, Any], str]:
+    """
+    Projection versions stored for keys, read with consistent BatchGetItem in chunks of 100
+
+    Keys missing from the result have no row or an unversioned one. On errors the
+    remaining versions are treated as unknown, so those items are still written.
+    """
+    versions: Dict[Tuple[Any, Any], str] = {}
+    unique_keys = list(dict.fromkeys(keys))
+    for start in range(0, len(unique_keys), BATCH_GET_SIZE):
+        pending = [
+            {"user_id": user_id, "created_at": created_at}
+            for user_id, created_at in unique_keys[start : start + BATCH_GET_SIZE]
+        ]
+        for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+            if attempt:
+                time.sleep(_backoff_delay(attempt))
+            try:
+                response = dynamodb.batch_get_item(
+                    RequestItems={
+                        READ_TABLE_NAME: {
+                            "Keys": pending,
+                            "ConsistentRead": True,
+                            "ProjectionExpression": (
+                                f"user_id, created_at, {PROJECTION_VERSION_ATTRIBUTE}"
+                            ),
+                        }
+                    }
+                )
+            except ClientError as e:
+                error_code = e.response.get("Error", {}).get("Code", "UnknownError")
+                logger.warning(f"Could not read stored projection versions: {error_code}")
+                return versions
+
+            for stored in response.get("Responses", {}).get(READ_TABLE_NAME, []):
+                if PROJECTION_VERSION_ATTRIBUTE in stored:
+                    versions[_item_key(stored)] = stored[PROJECTION_VERSION_ATTRIBUTE]
+            pending = response.get("UnprocessedKeys", {}).get(READ_TABLE_NAME, {}).get("Keys", [])
+            if not pending:
+                break
+    return versions
+
+
+def _projection_item(write: ProjectionWrite) -> Dict[str, Any]:
+    """Item (or key and version) a write targets, used for chunking and version checks"""
+    if isinstance(write, (ProjectionUpdate, ProjectionDelete)):
+        return write.item
+    return build_query_item(write)
+
+
+def batch_save_query_records(
+    query_records: Sequence[ProjectionWrite], dynamodb: Any = None
+) -> List[WriteOutcome]:
+    """
+    Save query records with BatchWriteItem in chunks of 25
+
+    Versioned records already applied in this container are skipped. The remaining
+    versioned puts are checked against the stored versions (one BatchGetItem per 100)
+    and skipped when the row already holds that version or a newer one; with
+    PROJECTION_CONDITIONAL_WRITES they are written one by one with a ConditionExpression
+    instead of being batched.
+    MODIFY diffs and REMOVEs are applied with UpdateItem / DeleteItem after the
+    puts queued before them, so writes to a key stay in stream order.
+    Returns one WriteOutcome per input record, in input order.
+    """
+    outcomes = [WriteOutcome(query_record=record, success=False) for record in query_records]
+    if not query_records:
+        return outcomes
+
+    dynamodb = dynamodb or get_dynamodb()
+    items = [_projection_item(record) for record in query_records]
+    batched: List[int] = []
+
+    stored_versions: Dict[Tuple[Any, Any], str] = {}
+    if not PROJECTION_CONDITIONAL_WRITES:
+        stored_versions = _stored_versions(
+            dynamodb,
+            [
+                _item_key(item)
+                for record, item in zip(query_records, items)
+                if not isinstance(record, (ProjectionUpdate, ProjectionDelete))
+                and PROJECTION_VERSION_ATTRIBUTE in item
+                and not _applied_versions.is_applied(
+                    _item_key(item), item[PROJECTION_VERSION_ATTRIBUTE]
+                )
+            ],
+        )
+
+    def flush_batched() -> None:
+        for chunk in _chunk_items(items, batched):
+            _write_chunk(dynamodb, items, outcomes, chunk)
+        batched.clear()
+
+    for index, (record, item) in enumerate(zip(query_records, items)):
+        version = item.get(PROJECTION_VERSION_ATTRIBUTE)
+        if version is not None and _applied_versions.is_applied(_item_key(item), version):
+            outcomes[index].success = outcomes[index].duplicate = True
+        elif isinstance(record, ProjectionUpdate):
+            flush_batched()
+            _update_conditionally(dynamodb, record, outcomes[index])
+        elif isinstance(record, ProjectionDelete):
+            flush_batched()
+            _delete_conditionally(dynamodb, record, outcomes[index])
+        elif version is not None and PROJECTION_CONDITIONAL_WRITES:
+            _put_conditionally(dynamodb, item, outcomes[index])
+        elif version is not None and stored_versions.get(_item_key(item), "") >= version:
+            outcomes[index].success = outcomes[index].duplicate = True
+        else:
+            batched.append(index)
+    flush_batched()
+
+    for item, outcome in zip(items, outcomes):
+        version = item.get(PROJECTION_VERSION_ATTRIBUTE)
+        if outcome.success and version is not None:
+            _applied_versions.record(_item_key(item), version)
+
+    written = sum(1 for outcome in outcomes if outcome.success and not outcome.duplicate)
+    duplicates = sum(1 for outcome in outcomes if outcome.duplicate)
+    logger.info(
+        f"Batch saved {written}/{len(query_records)} query records, "
+        f"skipped {duplicates} duplicates"
+    )
+    return outcomes
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the write lane thread pool, reused across warm invocations"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=STREAM_PROCESSOR_PARALLELISM, thread_name_prefix="stream-lane"
+        )
+    return _executor
+
+
+def _projection_key(write: ProjectionWrite) -> Tuple[Any, Any]:
+    """Read table primary key a write targets, without building the full item"""
+    if isinstance(write, (ProjectionUpdate, ProjectionDelete)):
+        return _item_key(write.item)
+    return write.user_id, write.created_at
+
+
+def lane_for(key: Tuple[Any, Any], lanes: int) -> int:
+    """Stable lane index for a read table primary key (user_id, created_at)"""
+    user_id, created_at = key
+    return zlib.crc32(f"{user_id}\x1f{created_at}".encode("utf-8")) % lanes
+
+
+def save_query_records(query_records: Sequence[ProjectionWrite]) -> List[WriteOutcome]:
+    """
+    Save query records, writing independent projection rows in parallel
+
+    Records are split into STREAM_PROCESSOR_PARALLELISM lanes by the read table
+    primary key, so every write to a row goes through one lane; each lane keeps
+    stream order and is written with batch_save_query_records.
+    Lanes share the resource's low-level client, which unlike the resource is
+    thread-safe and still accepts native Python types.
+    """
+    if STREAM_PROCESSOR_PARALLELISM <= 1 or len(query_records) <= 1:
+        return batch_save_query_records(query_records)
+
+    lanes: Dict[int, List[int]] = {}
+    for index, record in enumerate(query_records):
+        lane = lane_for(_projection_key(record), STREAM_PROCESSOR_PARALLELISM)
+        lanes.setdefault(lane, []).append(index)
+
+    client = get_dynamodb().meta.client
+    futures = [
+        (
+            indexes,
+            get_executor().submit(
+                batch_save_query_records, [query_records[i] for i in indexes], client
+            ),
+        )
+        for indexes in lanes.values()
+    ]
+
+    outcomes: List[Optional[WriteOutcome]] = [None] * len(query_records)
+    for indexes, future in futures:
+        for index, outcome in zip(indexes, future.result()):
+            outcomes[index] = outcome
+    return [outcome for outcome in outcomes if outcome is not None]
+
+
+def to_command_record(record: Dict[str, Any]) -> Optional[CommandRecord]:
+    """
+    Parse a stream record, returning None for skipped events
+
+    The command record is written as-is (build_query_item reads the same fields),
+    so the write path skips the intermediate QueryRecord copy. Its projection
+    version comes from the stream SequenceNumber.
+    """
+    event_name = record.get("eventName")
+    if event_name != "INSERT":
+        logger.info(f"Skipping event: {event_name}")
+        return None
+
+    new_image = record.get("dynamodb", {}).get("NewImage", {})
+    if not new_image:
+        logger.warning("No NewImage in record")
+        return None
+
+    command_record = parse_command_record(new_image)
+    command_record.projection_version = projection_version_of(record)
+    return command_record
+
+
+def to_query_record(record: Dict[str, Any]) -> Optional[QueryRecord]:
+    """Parse and transform a stream record, returning None for skipped events"""
+    command_record = to_command_record(record)
+    if command_record is None:
+        return None
+    return transform_to_query_record(command_record)
+
+
+def _projection_delete(record: Dict[str, Any]) -> Optional[ProjectionDelete]:
+    """REMOVE event: the projection key comes from OldImage"""
+    old_image = record.get("dynamodb", {}).get("OldImage")
+    if not old_image:
+        logger.warning("No OldImage in REMOVE record")
+        return None
+
+    key = {name: extract_value(old_image, name) for name in ("user_id", "created_at")}
+    transaction_id = extract_value(old_image, "transaction_id")
+    if not all(key.values()) or not transaction_id:
+        raise ValueError(f"Invalid command record format: missing key in {list(old_image)}")
+    version = projection_version_of(record)
+    if version:
+        key[PROJECTION_VERSION_ATTRIBUTE] = version
+    return ProjectionDelete(transaction_id=transaction_id, item=key)
+
+
+def _projection_modify(record: Dict[str, Any]) -> Optional[ProjectionWrite]:
+    """MODIFY event: diff OldImage and NewImage, or put NewImage when OldImage is absent"""
+    stream = record.get("dynamodb", {})
+    new_image = stream.get("NewImage")
+    if not new_image:
+        logger.warning("No NewImage in MODIFY record")
+        return None
+
+    new_record = parse_command_record(new_image)
+    new_record.projection_version = projection_version_of(record)
+    old_image = stream.get("OldImage")
+    if not old_image:
+        return new_record
+
+    update = build_projection_update(parse_command_record(old_image), new_record)
+    if update is None:
+        logger.info(f"MODIFY changed no projected attributes: {new_record.transaction_id}")
+    return update
+
+
+def to_projection_write(record: Dict[str, Any]) -> Optional[ProjectionWrite]:
+    """
+    Turn a stream record into a projection write, returning None for skipped events
+
+    INSERT puts the whole record; MODIFY updates only the projected attributes
+    that changed (or puts NewImage when the stream has no OldImage); REMOVE
+    deletes the projection row.
+    """
+    event_name = record.get("eventName")
+    if event_name == "INSERT":
+        return to_command_record(record)
+    if event_name == "MODIFY":
+        return _projection_modify(record)
+    if event_name == "REMOVE":
+        return _projection_delete(record)
+    logger.info(f"Skipping event: {event_name}")
+    return None
+
+
 def process_stream_record(record: Dict[str, Any]) -> None:
     """Process a single stream record"""
     try:
-        event_name = record.get("eventName")
-        if event_name != "INSERT":
-            logger.info(f"Skipping event: {event_name}")
-            return
-
-        new_image = record.get("dynamodb", {}).get("NewImage", {})
-        if not new_image:
-            logger.warning("No NewImage in record")
+        query_record = to_projection_write(record)
+        if query_record is None:
             return
 
-        # Parse and transform
-        command_record = parse_command_record(new_image)
-        query_record = transform_to_query_record(command_record)
-        save_query_record(query_record)
+        if isinstance(query_record, (ProjectionUpdate, ProjectionDelete)):
+            outcome = batch_save_query_records([query_record])[0]
+            if not outcome.success:
+                raise RuntimeError(f"Failed to apply stream record: {outcome.error}")
+        else:
+            save_query_record(query_record)
 
-        logger.info(f"Successfully processed record: {command_record.transaction_id}")
+        logger.info(f"Successfully processed record: {query_record.transaction_id}")
 
     except Exception as e:
         logger.error(f"Error processing record: {e}")
         raise
 
 
+def sequence_number_of(record: Dict[str, Any]) -> str:
+    """
+    Stream sequence number used as the batchItemFailures itemIdentifier
+
+    A missing sequence number yields an empty identifier, which makes Lambda
+    retry the whole batch rather than silently drop the record.
+    """
+    return str(record.get("dynamodb", {}).get("SequenceNumber", ""))
+
+
+def projection_key_of(record: Dict[str, Any]) -> Optional[Tuple[Any, Any]]:
+    """Read table primary key (user_id, created_at) of a stream record, None if not derivable"""
+    stream = record.get("dynamodb", {})
+    image = stream.get("NewImage") or stream.get("OldImage")
+    if not image:
+        return None
+    key = (extract_value(image, "user_id"), extract_value(image, "created_at"))
+    if key[0] is None or key[1] is None:
+        return None
+    return key
+
+
+def fold_stream_records(earlier: Dict[str, Any], later: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fold two stream events for the same key into one carrying the later state
+
+    INSERT followed by MODIFY becomes an INSERT of the later NewImage; MODIFY
+    followed by MODIFY keeps the earlier OldImage, so the diff spans both changes.
+    INSERT and REMOVE replace whatever came before. The later SequenceNumber
+    becomes the projection version.
+    """
+    if later.get("eventName") != "MODIFY":
+        return later
+    event_name = earlier.get("eventName")
+    if event_name not in ("INSERT", "MODIFY"):
+        return later
+
+    stream = dict(later.get("dynamodb", {}))
+    old_image = earlier.get("dynamodb", {}).get("OldImage")
+    if event_name == "MODIFY" and old_image:
+        stream["OldImage"] = old_image
+    else:
+        stream.pop("OldImage", None)
+    return {**later, "eventName": event_name, "dynamodb": stream}
+
+
+def coalesce_stream_records(
+    records: Sequence[Dict[str, Any]],
+) -> List[Tuple[Dict[str, Any], List[int]]]:
+    """
+    Fold the events of each read table key into one record, in first-seen order
+
+    Returns (record, indexes of the folded input records) pairs; records without a
+    derivable key are kept on their own.
+    """
+    groups: List[Tuple[Dict[str, Any], List[int]]] = []
+    positions: Dict[Tuple[Any, Any], int] = {}
+    for index, record in enumerate(records):
+        key = projection_key_of(record)
+        position = positions.get(key) if key is not None else None
+        if position is None:
+            if key is not None:
+                positions[key] = len(groups)
+            groups.append((record, [index]))
+        else:
+            folded, indexes = groups[position]
+            indexes.append(index)
+            groups[position] = (fold_stream_records(folded, record), indexes)
+    return groups
+
+
+@metrics.log_metrics
 @tracer.capture_lambda_handler
 def lambda_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     """
     Process DynamoDB Stream events and synchronize data to read table
+
+    Failed records are reported in batchItemFailures (ReportBatchItemFailures),
+    so Lambda retries from the first failed sequence number instead of the whole batch.
+    Records that fail deterministically (e.g. malformed images) rely on the event source
+    mapping's retry cap and on-failure destination (see infra/localstack) to not block the shard.
+    Redelivered or stale records are counted as processed and reported in the
+    DuplicateRecordsSkipped metric. With PROJECTION_COALESCE_WRITES, events for the
+    same key are folded into one write whose outcome applies to all of them.
     """
     try:
         records = event.get("Records", [])
         logger.info(f"Processing {len(records)} stream records")
 
+        if PROJECTION_COALESCE_WRITES:
+            groups = coalesce_stream_records(records)
+        else:
+            groups = [(record, [index]) for index, record in enumerate(records)]
+
         processed = 0
-        for record in records:
+        duplicates = 0
+        failed_sequence_numbers: List[str] = []
+        query_records: List[ProjectionWrite] = []
+        members: List[List[int]] = []
+        for record, indexes in groups:
             try:
-                process_stream_record(record)
-                processed += 1
+                query_record = to_projection_write(record)
             except Exception as e:
                 logger.error(f"Failed to process record: {e}")
+                failed_sequence_numbers.extend(sequence_number_of(records[i]) for i in indexes)
+                continue
+            if query_record is None:
+                processed += len(indexes)
+            else:
+                query_records.append(query_record)
+                members.append(indexes)
 
-        logger.info(f"Successfully processed {processed}/{len(records)} records")
-        return {"statusCode": 200, "processedRecords": processed}
+        outcomes = save_query_records(query_records)
+        for outcome, indexes in zip(outcomes, members):
+            if outcome.success:
+                processed += len(indexes)
+                duplicates += len(indexes) if outcome.duplicate else 0
+            else:
+                logger.error(
+                    f"Failed to save record {outcome.query_record.transaction_id} "
+                    f"after {outcome.attempts} attempts: {outcome.error}"
+                )
+                failed_sequence_numbers.extend(sequence_number_of(records[i]) for i in indexes)
+
+        coalesced = len(records) - len(groups)
+        metrics.add_metric(name="DuplicateRecordsSkipped", unit=MetricUnit.Count, value=duplicates)
+        metrics.add_metric(name="CoalescedRecords", unit=MetricUnit.Count, value=coalesced)
+        logger.info(
+            f"Successfully processed {processed}/{len(records)} records "
+            f"({duplicates} duplicates skipped, {coalesced} coalesced)"
+        )
+        return {
+            "statusCode": 200,
+            "processedRecords": processed,
+            "duplicateRecords": duplicates,
+            "coalescedRecords": coalesced,
+            "batchItemFailures": [
+                {"itemIdentifier": sequence_number} for sequence_number in failed_sequence_numbers
+            ],
+        }
 
     except Exception as e:
         logger.error(f"Stream processing failed: {e}")
@@ -10,8 +10,10 @@ EKS Handler Unit Tests
 - 可選參數支援
 """
 
+import json
 import os
 import sys
+from datetime import datetime
 from typing import Any, Dict, List
 from unittest.mock import AsyncMock, Mock, patch
 
@@ -26,11 +28,14 @@ os.environ["ENVIRONMENT"] = "test"
 # 導入被測試的模組  # noqa: E402
 from eks_handler import QueryService, app  # noqa: E402
 from eks_handler.main import (  # noqa: E402
+    NOTIFICATION_SCHEMA_VERSION,
     InternalAPIAdapter,
     NotificationRecord,
+    ResponseCache,
     SnsQueryRequest,
     TransactionQueryRequest,
     convert_timestamp_to_utc8_string,
+    parse_fields,
 )
 
 # 測試客戶端
@@ -65,6 +70,28 @@ class TestTimestampConversion:
         result = convert_timestamp_to_utc8_string(invalid_timestamp)
         assert result is None
 
+    @pytest.mark.parametrize(
+        "timestamp",
+        [
+            1,
+            -1,
+            -1001,
+            951782400000,  # 2000-02-29 (UTC)
+            1704038399999,  # 跨日前一毫秒（UTC+8 午夜）
+            1704067199999,  # 2023-12-31 23:59:59.999 UTC
+            253402271999000,  # 9999-12-31 23:59:59 UTC+8
+            -30610310400000,  # 西元 999 年，交由 datetime 處理
+        ],
+    )
+    def test_convert_timestamp_matches_strftime(self, timestamp: int) -> None:
+        """測試算術快速路徑與 datetime.strftime 輸出一致"""
+        from eks_handler.main import UTC_PLUS_8
+
+        expected = datetime.fromtimestamp(timestamp / 1000.0, tz=UTC_PLUS_8).strftime(
+            "%Y-%m-%d %H:%M:%S UTC+8"
+        )
+        assert convert_timestamp_to_utc8_string(timestamp) == expected
+
 
 @pytest.mark.unit
 class TestAPISchemas:
@@ -491,7 +518,7 @@ class TestQueryService:
 
         # 驗證調用
         mock_internal_api_adapter.invoke_transaction_query.assert_called_once_with(
-            {"transaction_id": "txn-001", "limit": 30}
+            {"transaction_id": "txn-001"}
         )
 
     async def test_query_failed_notifications_success(
@@ -668,6 +695,296 @@ class TestInternalAPIAdapterErrors:
         assert "Unexpected error" in exc_info.value.detail
 
 
+@pytest.mark.unit
+class TestInternalAPIAdapterConnectionPool:
+    """Internal API Adapter 共用連線池測試"""
+
+    async def test_client_is_reused_across_requests(self) -> None:
+        """測試多次請求共用同一個 httpx.AsyncClient"""
+        requests: List[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, json={"success": True, "items": []})
+
+        adapter = InternalAPIAdapter()
+        shared = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        adapter._client = shared
+
+        await adapter.invoke_transaction_query({"transaction_id": "tx-1"})
+        await adapter.invoke_failed_query({"transaction_id": "tx-1"})
+
+        assert adapter.open() is shared
+        assert [request.url.path.rsplit("/", 1)[-1] for request in requests] == ["tx", "fail"]
+
+        await adapter.aclose()
+        assert shared.is_closed
+        assert adapter._client is None
+
+    def test_pool_settings_from_environment(self) -> None:
+        """測試連線池設定可由環境變數調整，缺少 h2 時回退到 HTTP/1.1"""
+        env = {
+            "HTTP_MAX_CONNECTIONS": "50",
+            "HTTP_MAX_KEEPALIVE_CONNECTIONS": "10",
+            "HTTP_KEEPALIVE_EXPIRY": "15",
+            "HTTP2_ENABLED": "true",
+        }
+        with patch.dict(os.environ, env), patch.dict(sys.modules, {"h2": None}):
+            adapter = InternalAPIAdapter()
+
+        assert adapter.limits.max_connections == 50
+        assert adapter.limits.max_keepalive_connections == 10
+        assert adapter.limits.keepalive_expiry == 15
+        assert adapter.http2 is False
+
+    def test_lifespan_opens_and_closes_shared_client(self) -> None:
+        """測試 lifespan 啟動時建立、關閉時釋放共用 client"""
+        import eks_handler.main as main_module
+
+        with (
+            patch.dict(os.environ, {"ENVIRONMENT": "production"}),
+            patch.object(main_module, "_internal_api_adapter", None),
+        ):
+            with TestClient(app):
+                adapter = main_module.get_internal_api_adapter()
+                shared = adapter._client
+                assert shared is not None
+                opened = not shared.is_closed
+
+            assert opened
+            assert shared.is_closed
+            assert adapter._client is None
+
+    async def test_client_requests_gzip_and_decodes_response(self) -> None:
+        """測試 client 由 httpx 協商壓縮（包含 gzip），並自動解壓回應"""
+        import gzip
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert "gzip" in request.headers["Accept-Encoding"]
+            body = gzip.compress(json.dumps({"success": True, "items": []}).encode())
+            return httpx.Response(200, content=body, headers={"Content-Encoding": "gzip"})
+
+        adapter = InternalAPIAdapter()
+        client = adapter.open()
+        adapter._client = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler), headers=client.headers
+        )
+        await client.aclose()
+
+        assert await adapter.invoke_failed_query({}) == {"success": True, "items": []}
+        await adapter.aclose()
+
+
+@pytest.mark.unit
+class TestJsonSerialization:
+    """JSON 序列化測試"""
+
+    def test_default_response_class_uses_orjson_when_available(self) -> None:
+        """測試已安裝 orjson 時端點預設使用 ORJSONResponse"""
+        from fastapi.responses import ORJSONResponse
+
+        pytest.importorskip("orjson")
+        assert app.router.default_response_class is ORJSONResponse
+
+        response = client.get("/health")
+        assert response.status_code == 200
+        assert response.headers["Content-Type"] == "application/json"
+
+    def test_json_size_matches_utf8_length(self) -> None:
+        """測試快取容量以 UTF-8 編碼後的 JSON 大小計算"""
+        import eks_handler.main as main_module
+
+        pytest.importorskip("orjson")
+        value = {"message": "查詢完成", "total_count": 1}
+        expected = len(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode())
+
+        assert main_module.json_size(value) == expected
+
+
+@pytest.mark.unit
+class TestResponseCompression:
+    """FastAPI 回應壓縮測試"""
+
+    @patch("eks_handler.main.InternalAPIAdapter")
+    def test_large_response_is_gzipped_only_when_accepted(self, mock_adapter_class: Any) -> None:
+        """測試超過門檻的回應在客戶端接受 gzip 時壓縮，小回應不壓縮"""
+        items = [
+            {
+                "transaction_id": f"tx-{i}",
+                "notification_title": "Payment Confirmation",
+                "notification_body": "Your payment has been processed successfully",
+                "status": "FAILED",
+                "created_at": 1640995200000,
+            }
+            for i in range(50)
+        ]
+        mock_adapter = mock_adapter_class.return_value
+        mock_adapter.invoke_failed_query = AsyncMock(return_value={"success": True, "items": items})
+
+        compressed = client.get("/fail", headers={"Accept-Encoding": "gzip"})
+        plain = client.get("/fail", headers={"Accept-Encoding": "identity"})
+        health = client.get("/health", headers={"Accept-Encoding": "gzip"})
+
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert int(compressed.headers["Content-Length"]) < len(plain.content)
+        assert compressed.json() == plain.json()
+        assert "Content-Encoding" not in plain.headers
+        assert "Content-Encoding" not in health.headers
+
+
+@pytest.mark.unit
+class TestResponseCache:
+    """Internal API 回應快取測試"""
+
+    @pytest.fixture
+    def clock(self) -> List[float]:
+        return [1000.0]
+
+    @pytest.fixture
+    def cache(self, clock: List[float]) -> ResponseCache:
+        return ResponseCache(ttls={"/tx": 5, "/fail": 0}, clock=lambda: clock[0])
+
+    async def test_hit_within_ttl_and_expire_after(
+        self, cache: ResponseCache, clock: List[float]
+    ) -> None:
+        """測試 TTL 內命中快取、過期後重新載入"""
+        loader = AsyncMock(return_value={"success": True, "items": []})
+
+        await cache.get_or_load("/tx", {"transaction_id": "tx-1", "limit": 30}, loader)
+        await cache.get_or_load("/tx", {"limit": "30", "transaction_id": " tx-1 "}, loader)
+        assert loader.await_count == 1
+
+        clock[0] += 6
+        await cache.get_or_load("/tx", {"transaction_id": "tx-1", "limit": 30}, loader)
+        assert loader.await_count == 2
+
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 2, 1)
+
+    async def test_failed_and_zero_ttl_responses_not_cached(self, cache: ResponseCache) -> None:
+        """測試失敗回應與 TTL 為 0 的端點不寫入快取"""
+        failed = AsyncMock(return_value={"success": False})
+        ok = AsyncMock(return_value={"success": True, "items": []})
+
+        for _ in range(2):
+            await cache.get_or_load("/tx", {"transaction_id": "tx-1"}, failed)
+            await cache.get_or_load("/fail", {"transaction_id": "tx-1"}, ok)
+
+        assert failed.await_count == 2
+        assert ok.await_count == 2
+        assert cache.stats()["entries"] == 0
+
+    async def test_lru_eviction_by_entries_and_bytes(self, clock: List[float]) -> None:
+        """測試超過筆數或位元組上限時淘汰最久未使用的項目"""
+        cache = ResponseCache(ttls={"/tx": 60}, max_entries=2, clock=lambda: clock[0])
+        loader = AsyncMock(return_value={"success": True, "items": []})
+
+        await cache.get_or_load("/tx", {"transaction_id": "a"}, loader)
+        await cache.get_or_load("/tx", {"transaction_id": "b"}, loader)
+        await cache.get_or_load("/tx", {"transaction_id": "a"}, loader)
+        await cache.get_or_load("/tx", {"transaction_id": "c"}, loader)
+
+        assert cache.stats()["evictions"] == 1
+        await cache.get_or_load("/tx", {"transaction_id": "a"}, loader)
+        assert loader.await_count == 3
+
+        size = cache.stats()["bytes"] // cache.stats()["entries"]
+        small = ResponseCache(ttls={"/tx": 60}, max_bytes=size, clock=lambda: clock[0])
+        await small.get_or_load("/tx", {"transaction_id": "a"}, loader)
+        await small.get_or_load("/tx", {"transaction_id": "b"}, loader)
+        assert small.stats()["entries"] == 1
+        assert small.stats()["bytes"] <= size
+
+    async def test_concurrent_misses_are_coalesced(self, cache: ResponseCache) -> None:
+        """測試相同 key 的並發 miss 只呼叫一次上游"""
+        import asyncio
+
+        release = asyncio.Event()
+        calls = 0
+
+        async def loader() -> Dict[str, Any]:
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return {"success": True, "items": []}
+
+        tasks = [
+            asyncio.create_task(cache.get_or_load("/tx", {"transaction_id": "tx-1"}, loader))
+            for _ in range(5)
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks)
+
+        assert calls == 1
+        assert all(result == {"success": True, "items": []} for result in results)
+        assert cache.stats()["coalesced"] == 4
+
+    async def test_query_service_uses_cache(self) -> None:
+        """測試 QueryService 經由快取調用 Internal API"""
+        adapter = Mock()
+        adapter.invoke_sns_query = AsyncMock(return_value={"success": True, "items": []})
+        service = QueryService(adapter, ResponseCache(ttls={"/sns": 30}))
+
+        await service.query_sns_notifications("sns-1")
+        await service.query_sns_notifications("sns-1")
+
+        assert adapter.invoke_sns_query.await_count == 1
+
+    async def test_concurrent_identical_requests_share_one_upstream_call(self) -> None:
+        """測試 N 個並發的相同 /tx 請求只呼叫一次 Internal API（single-flight）"""
+        import asyncio
+
+        import eks_handler.main as main_module
+
+        calls = 0
+
+        async def invoke_transaction_query(payload: Dict[str, Any]) -> Dict[str, Any]:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"success": True, "items": []}
+
+        adapter = Mock(spec=InternalAPIAdapter)
+        adapter.invoke_transaction_query = invoke_transaction_query
+        app.dependency_overrides[main_module.get_internal_api_adapter] = lambda: adapter
+        try:
+            with (
+                patch.dict(os.environ, {"ENVIRONMENT": "production"}),
+                patch.object(main_module, "_response_cache", ResponseCache(ttls={"/tx": 5})),
+            ):
+                async with httpx.AsyncClient(
+                    transport=httpx.ASGITransport(app=app),  # type: ignore[arg-type]
+                    base_url="http://test",
+                ) as async_client:
+                    responses = await asyncio.gather(
+                        *(async_client.get("/tx?transaction_id=tx-1") for _ in range(10))
+                    )
+        finally:
+            app.dependency_overrides.pop(main_module.get_internal_api_adapter)
+
+        assert [response.status_code for response in responses] == [200] * 10
+        assert calls == 1
+
+    def test_metrics_endpoint(self) -> None:
+        """測試 /metrics 輸出快取計數器"""
+        import eks_handler.main as main_module
+
+        with (
+            patch.dict(os.environ, {"ENVIRONMENT": "production"}),
+            patch.object(main_module, "_response_cache", ResponseCache(ttls={"/tx": 5})),
+        ):
+            response = client.get("/metrics")
+
+        assert response.status_code == 200
+        stats = response.json()["response_cache"]
+        assert stats["enabled"] is True
+        assert {"hits", "misses", "evictions"} <= stats.keys()
+
+        response = client.get("/metrics")
+        assert response.json()["response_cache"] == {"enabled": False}
+
+
 @pytest.mark.unit
 class TestQueryServiceErrorHandling:
     """QueryService 錯誤處理測試"""
@@ -718,6 +1035,118 @@ class TestQueryServiceErrorHandling:
         assert processed[1].transaction_id == "invalid-1"
 
 
+@pytest.mark.unit
+class TestTrustedRecordProcessing:
+    """上游 schema 版本標記的快速路徑測試"""
+
+    FORMATTED_ITEMS: List[Dict[str, Any]] = [
+        {
+            "transaction_id": "tx-1",
+            "platform": "IOS",
+            "notification_title": "Title",
+            "notification_body": "Body",
+            "status": "FAILED",
+            "failed_ts": 1640995200000,
+            "created_at": 1640995200000,
+            "retry_cnt": 1,
+            "failed_time_utc8": "2022-01-01 08:00:00 UTC+8",
+            "created_time_utc8": "2022-01-01 08:00:00 UTC+8",
+        },
+        {
+            "transaction_id": "tx-2",
+            "notification_title": "Title",
+            "notification_body": "Body",
+            "status": "SENT",
+            "created_at": 0,
+            "retry_cnt": 0,
+        },
+    ]
+
+    async def test_trusted_path_matches_strict_path(self) -> None:
+        """測試帶有 schema 版本時跳過逐筆轉換，且結果與完整處理一致"""
+        service = QueryService(Mock(spec=InternalAPIAdapter))
+
+        with patch.object(
+            service, "_process_records_strict", wraps=service._process_records_strict
+        ) as mock_strict:
+            trusted = await service._process_notification_records(
+                self.FORMATTED_ITEMS, NOTIFICATION_SCHEMA_VERSION
+            )
+        strict = await service._process_notification_records(self.FORMATTED_ITEMS)
+
+        mock_strict.assert_not_called()
+        assert [r.model_dump() for r in trusted] == [r.model_dump() for r in strict]
+
+    async def test_trusted_record_missing_fields_falls_back_per_record(self) -> None:
+        """測試缺少必填欄位的記錄單獨回退到完整處理，其餘記錄仍只做驗證"""
+        service = QueryService(Mock(spec=InternalAPIAdapter))
+        incomplete = {"transaction_id": "tx-3", "status": "SENT", "created_at": 0}
+        items = self.FORMATTED_ITEMS + [incomplete]
+
+        with patch.object(
+            service, "_process_records_strict", wraps=service._process_records_strict
+        ) as mock_strict:
+            processed = await service._process_notification_records(
+                items, NOTIFICATION_SCHEMA_VERSION
+            )
+
+        mock_strict.assert_called_once_with([incomplete])
+        assert [r.transaction_id for r in processed] == ["tx-1", "tx-2", "tx-3"]
+        assert processed[2].notification_title == ""
+
+    async def test_trusted_path_rejects_invalid_values_like_strict_path(self) -> None:
+        """測試信任路徑對無效 platform 與型別錯誤的處理與完整驗證一致"""
+        service = QueryService(Mock(spec=InternalAPIAdapter))
+        base = self.FORMATTED_ITEMS[0]
+        items = [
+            {**base, "transaction_id": "windows", "platform": "WINDOWS"},
+            {**base, "transaction_id": "empty", "platform": ""},
+            {**base, "transaction_id": "abc", "created_at": "abc"},
+            {**base, "transaction_id": "retry", "retry_cnt": True},
+            base,
+        ]
+
+        trusted = await service._process_notification_records(items, NOTIFICATION_SCHEMA_VERSION)
+        strict = await service._process_notification_records(items)
+
+        assert [r.transaction_id for r in trusted] == ["empty", "retry", base["transaction_id"]]
+        assert trusted[0].platform is None
+        assert trusted[1].retry_cnt == 1
+        assert [r.model_dump() for r in trusted] == [r.model_dump() for r in strict]
+
+    async def test_strict_mode_and_unknown_version_skip_fast_path(self) -> None:
+        """測試 STRICT_RECORD_VALIDATION=true 或未知版本時一律逐筆處理"""
+        with patch.dict(os.environ, {"STRICT_RECORD_VALIDATION": "true"}):
+            strict_service = QueryService(Mock(spec=InternalAPIAdapter))
+        service = QueryService(Mock(spec=InternalAPIAdapter))
+
+        for svc, version in [(strict_service, NOTIFICATION_SCHEMA_VERSION), (service, "0")]:
+            with patch.object(svc, "_validate_trusted_records") as mock_trusted:
+                processed = await svc._process_notification_records(self.FORMATTED_ITEMS, version)
+            mock_trusted.assert_not_called()
+            assert len(processed) == 2
+
+    async def test_query_passes_schema_version(self) -> None:
+        """測試查詢方法依回應的 schema_version 選擇處理路徑"""
+        adapter = Mock(spec=InternalAPIAdapter)
+        adapter.invoke_failed_query = AsyncMock(
+            return_value={
+                "success": True,
+                "items": self.FORMATTED_ITEMS,
+                "schema_version": NOTIFICATION_SCHEMA_VERSION,
+            }
+        )
+        service = QueryService(adapter)
+
+        with patch.object(
+            service, "_validate_trusted_records", wraps=service._validate_trusted_records
+        ) as mock_trusted:
+            result = await service.query_failed_notifications()
+
+        mock_trusted.assert_called_once()
+        assert result.total_count == 2
+
+
 @pytest.mark.unit
 class TestAPIEndpointErrors:
     """API 端點錯誤處理測試"""
@@ -918,5 +1347,219 @@ class TestFailedNotificationsEdgeCases:
         assert "查詢服務錯誤:" in exc_info.value.detail
 
 
+@pytest.mark.unit
+class TestFailedNotificationsStream:
+    """失敗通知 NDJSON 串流測試"""
+
+    PAGES: List[Dict[str, Any]] = [
+        {
+            "success": True,
+            "items": [
+                {"transaction_id": "tx-1", "status": "FAILED", "created_at": 1640995200000},
+                {"transaction_id": "tx-2", "status": "FAILED", "created_at": 1640995200000},
+            ],
+            "next_token": "token-1",
+        },
+        {
+            "success": True,
+            "items": [{"transaction_id": "tx-3", "status": "FAILED", "created_at": 0}],
+        },
+    ]
+
+    async def test_stream_follows_next_token(self) -> None:
+        """測試串流依 next_token 逐頁讀取直到最後一頁"""
+        adapter = Mock(spec=InternalAPIAdapter)
+        adapter.invoke_failed_query = AsyncMock(side_effect=self.PAGES)
+        service = QueryService(adapter)
+
+        pages = [page async for page in service.stream_failed_notifications("tx", page_size=2)]
+
+        assert [[r.transaction_id for r in page] for page in pages] == [["tx-1", "tx-2"], ["tx-3"]]
+        payloads = [call.args[0] for call in adapter.invoke_failed_query.call_args_list]
+        assert payloads == [
+            {"limit": 2, "transaction_id": "tx"},
+            {"limit": 2, "transaction_id": "tx", "next_token": "token-1"},
+        ]
+
+    @patch("eks_handler.main.InternalAPIAdapter")
+    def test_stream_endpoint_returns_ndjson(self, mock_adapter_class: Any) -> None:
+        """測試串流端點每行輸出一筆記錄"""
+        mock_adapter = mock_adapter_class.return_value
+        mock_adapter.invoke_failed_query = AsyncMock(side_effect=self.PAGES)
+
+        response = client.get("/fail/stream", params={"page_size": 2})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["transaction_id"] for line in lines] == ["tx-1", "tx-2", "tx-3"]
+        assert lines[0]["created_time_utc8"] == "2022-01-01 08:00:00 UTC+8"
+
+    @patch("eks_handler.main.InternalAPIAdapter")
+    def test_stream_endpoint_is_not_gzipped(self, mock_adapter_class: Any) -> None:
+        """測試客戶端接受 gzip 時串流端點仍不壓縮，記錄可逐行送出"""
+        mock_adapter = mock_adapter_class.return_value
+        mock_adapter.invoke_failed_query = AsyncMock(side_effect=self.PAGES)
+
+        response = client.get(
+            "/fail/stream", params={"page_size": 2}, headers={"Accept-Encoding": "gzip"}
+        )
+
+        assert response.status_code == 200
+        assert "content-encoding" not in response.headers
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["transaction_id"] for line in lines] == ["tx-1", "tx-2", "tx-3"]
+
+    @patch("eks_handler.main.InternalAPIAdapter")
+    def test_stream_endpoint_errors(self, mock_adapter_class: Any) -> None:
+        """測試第一頁失敗回傳錯誤狀態碼，串流中途失敗則以 error 行結尾"""
+        mock_adapter = mock_adapter_class.return_value
+        mock_adapter.invoke_failed_query = AsyncMock(
+            side_effect=HTTPException(status_code=503, detail="unavailable")
+        )
+        assert client.get("/fail/stream").status_code == 503
+
+        mock_adapter.invoke_failed_query = AsyncMock(
+            side_effect=[self.PAGES[0], RuntimeError("connection reset")]
+        )
+        response = client.get("/fail/stream")
+
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines) == 3
+        assert lines[-1] == {"error": "connection reset"}
+
+
+@pytest.mark.unit
+class TestCursorPagination:
+    """limit + next_token 分頁測試"""
+
+    @pytest.fixture
+    def mock_adapter(self) -> Mock:
+        """建立回傳下一頁 token 的 adapter mock"""
+        adapter = Mock(spec=InternalAPIAdapter)
+        response = {"success": True, "items": [], "next_token": "abc_-123"}
+        adapter.invoke_transaction_query = AsyncMock(return_value=response)
+        adapter.invoke_failed_query = AsyncMock(return_value=response)
+        adapter.invoke_sns_query = AsyncMock(return_value=response)
+        return adapter
+
+    async def test_page_params_forwarded_and_token_returned(self, mock_adapter: Mock) -> None:
+        """測試分頁參數轉送給 Internal API，並回傳上游的 next_token"""
+        service = QueryService(mock_adapter)
+
+        tx = await service.query_transaction_notifications("tx-1", 10, "t1")
+        failed = await service.query_failed_notifications(None, 50, "t2")
+        sns = await service.query_sns_notifications("sns-1", 20)
+
+        mock_adapter.invoke_transaction_query.assert_called_once_with(
+            {"transaction_id": "tx-1", "limit": 10, "next_token": "t1"}
+        )
+        mock_adapter.invoke_failed_query.assert_called_once_with({"limit": 50, "next_token": "t2"})
+        mock_adapter.invoke_sns_query.assert_called_once_with({"sns_id": "sns-1", "limit": 20})
+        assert tx.next_token == failed.next_token == sns.next_token == "abc_-123"
+
+    @patch("eks_handler.main.InternalAPIAdapter")
+    def test_endpoints_accept_page_params(self, mock_adapter_class: Any) -> None:
+        """測試 GET 端點接受 limit / next_token，並拒絕格式錯誤的 token"""
+        mock_adapter = mock_adapter_class.return_value
+        mock_adapter.invoke_sns_query = AsyncMock(
+            return_value={"success": True, "items": [], "next_token": "n2"}
+        )
+
+        response = client.get("/sns", params={"sns_id": "s", "limit": 5, "next_token": "n1"})
+        assert response.status_code == 200
+        assert response.json()["next_token"] == "n2"
+        mock_adapter.invoke_sns_query.assert_called_once_with(
+            {"sns_id": "s", "limit": 5, "next_token": "n1"}
+        )
+
+        assert client.get("/fail", params={"next_token": "bad token!"}).status_code == 422
+        assert client.get("/fail", params={"limit": 0}).status_code == 422
+
+
+@pytest.mark.unit
+class TestFieldSelection:
+    """fields 欄位選取測試"""
+
+    def test_parse_fields(self) -> None:
+        """測試 fields 解析為依預設順序排序、去重的 tuple"""
+        assert parse_fields(None) is None
+        assert parse_fields("status,transaction_id,status") == ("transaction_id", "status")
+
+    async def test_fields_forwarded_and_records_partial(self) -> None:
+        """測試 fields 轉送給 Internal API，記錄只保留選取欄位與其 UTC+8 字串"""
+        adapter = Mock(spec=InternalAPIAdapter)
+        adapter.invoke_failed_query = AsyncMock(
+            return_value={
+                "success": True,
+                "items": [{"transaction_id": "tx-1", "failed_ts": 1640995200000}],
+                "schema_version": NOTIFICATION_SCHEMA_VERSION,
+            }
+        )
+        service = QueryService(adapter)
+
+        result = await service.query_failed_notifications(
+            None, 10, None, ("transaction_id", "failed_ts")
+        )
+
+        adapter.invoke_failed_query.assert_called_once_with(
+            {"limit": 10, "fields": "transaction_id,failed_ts"}
+        )
+        assert result.data[0].model_dump(exclude_unset=True) == {
+            "transaction_id": "tx-1",
+            "failed_ts": 1640995200000,
+            "failed_time_utc8": "2022-01-01 08:00:00 UTC+8",
+        }
+
+    async def test_strict_mode_validates_partial_records(self) -> None:
+        """測試 STRICT_RECORD_VALIDATION=true 時部分欄位記錄逐欄驗證並重新轉換時間"""
+        with patch.dict(os.environ, {"STRICT_RECORD_VALIDATION": "true"}):
+            service = QueryService(Mock(spec=InternalAPIAdapter))
+        items: List[Dict[str, Any]] = [
+            {"platform": "IOS", "created_at": "1640995200000", "created_time_utc8": "stale"},
+            {"platform": "WINDOWS", "created_at": 1640995200000},
+            {"platform": "", "created_at": 1640995200000, "retry_cnt": "abc"},
+        ]
+
+        records = await service._process_notification_records(
+            items, NOTIFICATION_SCHEMA_VERSION, ("platform", "created_at", "retry_cnt")
+        )
+
+        assert [r.model_dump(exclude_unset=True) for r in records] == [
+            {
+                "platform": "IOS",
+                "created_at": 1640995200000,
+                "created_time_utc8": "2022-01-01 08:00:00 UTC+8",
+            },
+            {
+                "created_at": 1640995200000,
+                "retry_cnt": 0,
+                "created_time_utc8": "2022-01-01 08:00:00 UTC+8",
+            },
+        ]
+
+    @patch("eks_handler.main.InternalAPIAdapter")
+    def test_endpoint_returns_only_selected_fields(self, mock_adapter_class: Any) -> None:
+        """測試 GET 端點只輸出選取欄位，並拒絕未知欄位"""
+        mock_adapter = mock_adapter_class.return_value
+        mock_adapter.invoke_sns_query = AsyncMock(
+            return_value={
+                "success": True,
+                "items": [{"transaction_id": "tx-1", "status": "SENT"}],
+                "schema_version": NOTIFICATION_SCHEMA_VERSION,
+            }
+        )
+
+        response = client.get("/sns", params={"sns_id": "s", "fields": "status,transaction_id"})
+
+        assert response.status_code == 200
+        assert response.json()["data"] == [{"transaction_id": "tx-1", "status": "SENT"}]
+        mock_adapter.invoke_sns_query.assert_called_once_with(
+            {"sns_id": "s", "fields": "transaction_id,status"}
+        )
+        assert client.get("/tx", params={"fields": "user_id"}).status_code == 422
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
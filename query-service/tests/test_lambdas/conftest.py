@@ -119,6 +119,60 @@ def notification_records_table_with_data(notification_records_table: Any) -> Any
     return notification_records_table
 
 
+class StreamEventFactory:
+    """建立 stream_processor 測試用的 stream 記錄與 QueryRecord"""
+
+    def image(self, **attributes: Any) -> dict:
+        """推播記錄的 DynamoDB image，attributes 覆寫預設欄位"""
+        image = {
+            "transaction_id": {"S": "tx-001"},
+            "created_at": {"N": "1732000000000"},
+            "user_id": {"S": "user-123"},
+            "notification_title": {"S": "Title"},
+            "status": {"S": "SENT"},
+        }
+        image.update(attributes)
+        return image
+
+    def stream_record(
+        self, event_name: str, sequence_number: str, old: Any = None, new: Any = None
+    ) -> dict:
+        """單筆 stream 記錄"""
+        stream: dict = {"SequenceNumber": sequence_number}
+        if old is not None:
+            stream["OldImage"] = old
+        if new is not None:
+            stream["NewImage"] = new
+        return {"eventName": event_name, "dynamodb": stream}
+
+    def versioned_event(self, sequence_number: str, status: str = "SENT") -> dict:
+        """只有一筆帶 SequenceNumber 的 INSERT 的 stream 事件"""
+        new = self.image(status={"S": status})
+        return {"Records": [self.stream_record("INSERT", sequence_number, new=new)]}
+
+    def query_record(self, index: int, user_id: str = "") -> Any:
+        """第 index 筆 SENT 狀態的 QueryRecord"""
+        from lambdas.stream_processor_lambda.app import NotificationStatus, Platform, QueryRecord
+
+        return QueryRecord(
+            user_id=user_id or f"user-{index}",
+            created_at=1732000000000 + index,
+            transaction_id=f"tx-{index}",
+            marketing_id=None,
+            notification_title="Title",
+            status=NotificationStatus.SENT,
+            platform=Platform.IOS,
+            error_msg=None,
+            ap_id=None,
+        )
+
+
+@pytest.fixture
+def stream_events() -> StreamEventFactory:
+    """提供 stream_processor 測試共用的 stream 記錄 helpers"""
+    return StreamEventFactory()
+
+
 @pytest.fixture(autouse=True)
 def cleanup_localstack_tables() -> Generator[None, None, None]:
     """在每個測試之前清理 LocalStack 中可能殘留的表"""
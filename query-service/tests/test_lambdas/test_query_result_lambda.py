@@ -4,14 +4,18 @@ Query Result Lambda 測試
 測試使用 aws-lambda-powertools 的 query_result_lambda
 """
 
+import json
 import os
 import sys
 import unittest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
 from pathlib import Path
-from typing import Generator
+from typing import Any, Dict, Generator, Optional
 from unittest.mock import MagicMock, patch
 
 import pytest
+from boto3.dynamodb.conditions import Attr, Key
 from moto import mock_dynamodb
 
 # 設置測試環境變數
@@ -129,6 +133,152 @@ class TestQueryResultLambda(unittest.TestCase):
         item = formatted[0]
         self.assertEqual(item["retry_cnt"], 0)  # 應該轉為預設值 0
 
+    def test_format_notification_items_converts_each_second_once(self) -> None:
+        """測試批次格式化依秒去重轉換，且結果與逐筆轉換一致"""
+        items = [
+            {"transaction_id": f"tx_{i}", "created_at": 1704038400000 + i, "send_ts": ""}
+            for i in range(500)
+        ]
+        items.append(
+            {"transaction_id": "tx_f", "created_at": 1704038401500, "failed_ts": 1704038402000}
+        )
+
+        converted: list = []
+        convert = app.convert_seconds_to_utc8_strings
+
+        def spy(seconds: Any) -> Any:
+            converted.extend(seconds)
+            return convert(converted)
+
+        with patch.object(app, "convert_seconds_to_utc8_strings", side_effect=spy):
+            formatted = app.format_notification_items(items)
+
+        self.assertEqual(len(formatted), 501)
+        self.assertEqual(set(converted), {1704038400, 1704038401, 1704038402})
+        for item in formatted:
+            self.assertNotIn("send_ts", item)
+            self.assertEqual(
+                item["created_time_utc8"],
+                app.convert_timestamp_to_utc8_string(item["created_at"]),
+            )
+        self.assertEqual(formatted[-1]["failed_time_utc8"], "2024-01-01 00:00:02 UTC+8")
+
+    def test_convert_timestamp_to_utc8_string_cached_per_second(self) -> None:
+        """測試 UTC+8 轉換依秒快取，且與 datetime.strftime 輸出一致"""
+        app.format_utc8_second.cache_clear()
+        timestamps = [1704038400000 + ms for ms in range(0, 3000, 7)] + [951782400000, -1001]
+
+        for timestamp in timestamps:
+            expected = datetime.fromtimestamp(timestamp / 1000.0, tz=app.UTC_PLUS_8).strftime(
+                "%Y-%m-%d %H:%M:%S UTC+8"
+            )
+            self.assertEqual(app.convert_timestamp_to_utc8_string(timestamp), expected)
+
+        self.assertEqual(app.format_utc8_second.cache_info().misses, 5)
+        self.assertIsNone(app.convert_timestamp_to_utc8_string(999999999999999999))
+
+    def test_utc8_formatter_matches_eks_handler(self) -> None:
+        """測試 UTC+8 格式化與 eks_handler 的副本輸出一致（兩個部署各自打包一份）"""
+        from eks_handler import main as eks_main
+
+        timestamps: list = [None, 0, -1001, -1, 1, 951782400000, 1704038400000, 1704038399999]
+        timestamps += [1704038400000 + ms * 86_399_937 for ms in range(-2000, 2000)]
+        timestamps += [-62135596800000, 253402300799000, 253402300800000, 999999999999999999]
+        timestamps += [1704038400123.5, float("nan")]
+
+        for timestamp in timestamps:
+            self.assertEqual(
+                app.convert_timestamp_to_utc8_string(timestamp),
+                eks_main.convert_timestamp_to_utc8_string(timestamp),
+                f"timestamp {timestamp}",
+            )
+
+    @patch.object(app, "query_service")
+    def test_response_carries_schema_version(self, mock_service: MagicMock) -> None:
+        """測試成功回應帶有格式化記錄的 schema 版本"""
+        mock_service.query_failed_notifications.return_value = {
+            "success": True,
+            "items": [{"transaction_id": "tx_001", "created_at": 1704038400000}],
+        }
+
+        response = app.lambda_handler({"query_type": "fail"}, self.lambda_context)
+
+        body = json.loads(response["body"])
+        self.assertEqual(body["schema_version"], app.NOTIFICATION_SCHEMA_VERSION)
+
+    @patch.object(app, "query_service")
+    def test_direct_invocation_forwards_page_params(self, mock_service: MagicMock) -> None:
+        """測試直接調用時轉送 limit、next_token 與 fields，並回傳下一頁的 token"""
+        token = app.encode_continuation_token({"sns_id": "sns-1", "created_at": 1})
+        mock_service.query_sns_notifications.return_value = {
+            "success": True,
+            "items": [{"transaction_id": "tx_001", "created_at": 1704038400000}],
+            "next_token": "next",
+        }
+
+        event = {
+            "query_type": "sns",
+            "sns_id": "sns-1",
+            "limit": "5",
+            "next_token": token,
+            "fields": "transaction_id,created_at",
+        }
+        response = app.lambda_handler(event, self.lambda_context)
+
+        mock_service.query_sns_notifications.assert_called_once_with(
+            "sns-1", token, limit=5, fields=("transaction_id", "created_at")
+        )
+        body = json.loads(response["body"])
+        self.assertEqual(body["next_token"], "next")
+        self.assertEqual(
+            body["items"],
+            [
+                {
+                    "transaction_id": "tx_001",
+                    "created_at": 1704038400000,
+                    "created_time_utc8": "2024-01-01 00:00:00 UTC+8",
+                }
+            ],
+        )
+
+    def test_direct_invocation_rejects_unknown_fields(self) -> None:
+        """測試直接調用時 fields 包含未知欄位回傳 400"""
+        response = app.lambda_handler(
+            {"query_type": "fail", "fields": "transaction_id,user_id"}, self.lambda_context
+        )
+
+        self.assertEqual(response["statusCode"], 400)
+        self.assertIn("user_id", json.loads(response["body"])["error"])
+
+    @patch.object(app, "query_service")
+    def test_route_gzips_when_accepted(self, mock_service: MagicMock) -> None:
+        """測試 API Gateway 請求帶有 Accept-Encoding: gzip 時回傳 gzip 壓縮的 body"""
+        import base64
+        import gzip
+
+        mock_service.query_sns_notifications.return_value = {
+            "success": True,
+            "items": [{"transaction_id": "tx_001", "created_at": 1704038400000}],
+        }
+        event = {
+            "version": "2.0",
+            "routeKey": "GET /sns",
+            "rawPath": "/sns",
+            "rawQueryString": "sns_id=sns-1",
+            "headers": {"accept-encoding": "gzip, deflate"},
+            "queryStringParameters": {"sns_id": "sns-1"},
+            "requestContext": {"http": {"method": "GET", "path": "/sns"}, "stage": "$default"},
+            "isBase64Encoded": False,
+        }
+
+        response = app.lambda_handler(event, self.lambda_context)
+
+        self.assertEqual(response["statusCode"], 200)
+        self.assertEqual(response["headers"]["Content-Encoding"], "gzip")
+        self.assertTrue(response["isBase64Encoded"])
+        body = json.loads(gzip.decompress(base64.b64decode(response["body"])))
+        self.assertEqual(body["items"][0]["transaction_id"], "tx_001")
+
     def test_missing_parameters(self) -> None:
         """測試缺少必要參數的情況"""
         # 測試缺少 user_id
@@ -168,6 +318,20 @@ class TestQueryResultLambda(unittest.TestCase):
         response = app.lambda_handler(event, self.lambda_context)
         self.assertEqual(response["statusCode"], 500)
 
+    @patch.object(app, "query_service")
+    def test_tx_limit_defaults(self, mock_service: MagicMock) -> None:
+        """測試 tx 查詢未提供 limit 時，指定 transaction_id 讀取全部記錄，最新記錄預設 30 筆"""
+        mock_service.query_transaction_notifications.return_value = {"items": [], "count": 0}
+
+        app.lambda_handler({"query_type": "tx", "transaction_id": "tx001"}, self.lambda_context)
+        app.lambda_handler({"query_type": "tx"}, self.lambda_context)
+        app.lambda_handler({"query_type": "tx", "limit": 500}, self.lambda_context)
+
+        limits = [
+            call.args[1] for call in mock_service.query_transaction_notifications.call_args_list
+        ]
+        self.assertEqual(limits, [None, 30, 100])
+
 
 class TestQueryServiceMethods(unittest.TestCase):
     """QueryService 方法測試類"""
@@ -241,7 +405,7 @@ class TestQueryServiceMethods(unittest.TestCase):
     def test_query_failed_notifications(self) -> None:
         """測試失敗通知查詢"""
         # Mock the service method directly to avoid DynamoDB authentication issues
-        with patch.object(app, "get_dynamodb_resource", return_value=self.dynamodb):
+        with patch.object(app, "get_dynamodb_client", return_value=self.dynamodb.meta.client):
             with patch.object(app.QueryService, "query_failed_notifications") as mock_method:
                 mock_method.return_value = {
                     "success": True,
@@ -268,5 +432,822 @@ class TestQueryServiceMethods(unittest.TestCase):
                 mock_method.assert_called_once_with("tx002")
 
 
-if __name__ == "__main__":
-    unittest.main()
+class TestTransactionKeyLookup(unittest.TestCase):
+    """transaction_id key-based 查詢測試"""
+
+    def _create_table(self, table_name: str, with_index: bool) -> None:
+        import boto3
+
+        dynamodb = boto3.resource("dynamodb", region_name="ap-southeast-1")
+        params: Dict[str, Any] = {
+            "TableName": table_name,
+            "KeySchema": [
+                {"AttributeName": "user_id", "KeyType": "HASH"},
+                {"AttributeName": "created_at", "KeyType": "RANGE"},
+            ],
+            "AttributeDefinitions": [
+                {"AttributeName": "user_id", "AttributeType": "S"},
+                {"AttributeName": "created_at", "AttributeType": "N"},
+            ],
+            "BillingMode": "PAY_PER_REQUEST",
+        }
+        if with_index:
+            params["AttributeDefinitions"] += [
+                {"AttributeName": "transaction_id", "AttributeType": "S"},
+                {"AttributeName": "status", "AttributeType": "S"},
+            ]
+            params["GlobalSecondaryIndexes"] = [
+                {
+                    "IndexName": "transaction_id-status-index",
+                    "KeySchema": [
+                        {"AttributeName": "transaction_id", "KeyType": "HASH"},
+                        {"AttributeName": "status", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                }
+            ]
+        table = dynamodb.create_table(**params)
+        for i in range(3):
+            table.put_item(
+                Item={
+                    "user_id": f"user{i}",
+                    "created_at": 1704038400000 + i,
+                    "transaction_id": "tx001" if i < 2 else "tx002",
+                    "notification_title": f"推播 {i}",
+                    "status": "DELIVERED",
+                    "platform": "IOS",
+                }
+            )
+
+    def test_query_uses_transaction_index(self) -> None:
+        """測試有索引時使用 query 而非 scan"""
+        self._create_table("tx-lookup-indexed", with_index=True)
+        service = app.QueryService("tx-lookup-indexed")
+
+        with patch.object(service.table, "scan", wraps=service.table.scan) as mock_scan:
+            result = service.query_transaction_notifications("tx001")
+
+        mock_scan.assert_not_called()
+        self.assertEqual(result["count"], 2)
+        # 應依 created_at 降序排列
+        self.assertEqual(result["items"][0]["created_at"], 1704038400001)
+
+    def test_failed_status_is_part_of_key_condition(self) -> None:
+        """測試查詢單一交易的失敗記錄時，status 放在索引的 key condition 而非 filter"""
+        import boto3
+
+        self._create_table("tx-lookup-failed", with_index=True)
+        service = app.QueryService("tx-lookup-failed")
+        dynamodb = boto3.resource("dynamodb", region_name="ap-southeast-1")
+        dynamodb.Table("tx-lookup-failed").put_item(
+            Item={
+                "user_id": "user9",
+                "created_at": 1704038400009,
+                "transaction_id": "tx001",
+                "status": "FAILED",
+            }
+        )
+
+        with patch.object(service.table, "query", wraps=service.table.query) as mock_query:
+            result = service.query_failed_notifications("tx001")
+
+        request = mock_query.call_args.kwargs
+        self.assertNotIn("FilterExpression", request)
+        self.assertEqual(
+            request["KeyConditionExpression"],
+            Key("transaction_id").eq("tx001") & Key("status").eq("FAILED"),
+        )
+        self.assertEqual([item["created_at"] for item in result["items"]], [1704038400009])
+
+    def test_scan_fallback_when_index_missing(self) -> None:
+        """測試索引不存在時回退到 scan，且只嘗試一次 query"""
+        self._create_table("tx-lookup-no-index", with_index=False)
+        service = app.QueryService("tx-lookup-no-index")
+
+        with patch.object(service.table, "query", wraps=service.table.query) as mock_query:
+            first = service.query_transaction_notifications("tx001")
+            second = service.query_transaction_notifications("tx002")
+
+        self.assertEqual(first["count"], 2)
+        self.assertEqual(second["count"], 1)
+        mock_query.assert_called_once()
+
+    def test_transaction_pages_with_limit(self) -> None:
+        """測試指定 transaction_id 時以 limit 分頁，並可用 next_token 讀完"""
+        self._create_table("tx-lookup-paged", with_index=True)
+        service = app.QueryService("tx-lookup-paged")
+
+        first = service.query_transaction_notifications("tx001", limit=1)
+        second = service.query_transaction_notifications("tx001", 1, first["next_token"])
+
+        self.assertEqual(first["count"], 1)
+        self.assertIsNotNone(first["next_token"])
+        self.assertEqual(second["count"], 1)
+        self.assertNotEqual(first["items"][0]["created_at"], second["items"][0]["created_at"])
+
+    def test_rejected_start_key_does_not_disable_index(self) -> None:
+        """測試 DynamoDB 拒絕 next_token 起點時回報無效 token，不停用索引也不改用 scan"""
+        from botocore.exceptions import ClientError
+
+        self._create_table("tx-lookup-bad-token", with_index=True)
+        service = app.QueryService("tx-lookup-bad-token")
+        token = app.encode_continuation_token(
+            {"transaction_id": "tx001", "status": "DELIVERED", "user_id": "u", "created_at": 1}
+        )
+        rejected = ClientError(
+            {
+                "Error": {
+                    "Code": "ValidationException",
+                    "Message": "The provided starting key is invalid",
+                }
+            },
+            "Query",
+        )
+
+        with patch.object(service.table, "query", side_effect=rejected):
+            with self.assertRaises(app.InvalidContinuationTokenError):
+                service.query_transaction_notifications("tx001", next_token=token)
+
+        self.assertEqual(service._missing_indexes, set())
+        with patch.object(service.table, "scan", wraps=service.table.scan) as mock_scan:
+            result = service.query_transaction_notifications("tx001")
+        mock_scan.assert_not_called()
+        self.assertEqual(result["count"], 2)
+
+    def test_other_validation_errors_do_not_fall_back(self) -> None:
+        """測試與索引無關的 ValidationException 直接拋出，不回退到 scan"""
+        from botocore.exceptions import ClientError
+
+        service = app.QueryService("tx-lookup-other-error")
+        error = ClientError(
+            {"Error": {"Code": "ValidationException", "Message": "Limit must be positive"}},
+            "Query",
+        )
+
+        with (
+            patch.object(service.table, "query", side_effect=error),
+            patch.object(service.table, "scan") as mock_scan,
+        ):
+            with self.assertRaises(ClientError):
+                service.query_transaction_notifications("tx001")
+
+        mock_scan.assert_not_called()
+        self.assertEqual(service._missing_indexes, set())
+
+    def test_fallback_with_next_token_is_not_cached(self) -> None:
+        """測試帶有 next_token 的請求回退到 scan 時不記住索引不存在"""
+        self._create_table("tx-lookup-token-fallback", with_index=False)
+        service = app.QueryService("tx-lookup-token-fallback")
+        token = app.encode_continuation_token({"user_id": "user0", "created_at": 1704038400000})
+
+        service.query_transaction_notifications("tx001", next_token=token)
+
+        self.assertEqual(service._missing_indexes, set())
+
+    def test_route_rejected_token_returns_400(self) -> None:
+        """測試被 DynamoDB 拒絕的 next_token 回傳 400 而不是 500"""
+        with patch.object(
+            app.query_service,
+            "query_failed_notifications",
+            side_effect=app.InvalidContinuationTokenError("Invalid continuation token"),
+        ):
+            response = app.lambda_handler(
+                {"query_type": "fail", "next_token": app.encode_continuation_token({"a": "b"})},
+                MagicMock(),
+            )
+
+        self.assertEqual(response["statusCode"], 400)
+
+
+class TestPagination(unittest.TestCase):
+    """分頁讀取與 continuation token 測試"""
+
+    # 索引查詢的 LastEvaluatedKey 除了位置（created_at）以外的 key
+    FAILED_INDEX_KEY = {"user_id": "u", "failed_bucket": "FAILED"}
+    SNS_INDEX_KEY = {"user_id": "u", "sns_id": "sns-1", "transaction_id": "tx"}
+
+    @staticmethod
+    def _fake_operation(
+        total: int, page_size: int, position: str = "pos", key: Optional[Dict[str, Any]] = None
+    ) -> MagicMock:
+        """
+        模擬會分頁的 scan/query，依 ExclusiveStartKey 與 Limit 回傳資料
+
+        第 i 筆 item 的 key 為 {**key, position: i}，LastEvaluatedKey 為該頁最後一筆的 key
+        """
+
+        def operation(**kwargs: Any) -> Dict[str, Any]:
+            start_key = kwargs.get("ExclusiveStartKey")
+            start = int(start_key[position]) + 1 if start_key else 0
+            size = min(page_size, kwargs.get("Limit", page_size))
+            end = min(start + size, total)
+            page: Dict[str, Any] = {
+                "Items": [{"created_at": i, **(key or {}), position: i} for i in range(start, end)],
+                "ConsumedCapacity": {"CapacityUnits": 0.5},
+            }
+            if end < total:
+                page["LastEvaluatedKey"] = {**(key or {}), position: Decimal(end - 1)}
+            return page
+
+        return MagicMock(side_effect=operation)
+
+    def test_iterate_pages_follows_last_evaluated_key(self) -> None:
+        """測試跟隨 LastEvaluatedKey 讀完所有頁面"""
+        operation = self._fake_operation(total=25, page_size=10)
+
+        paged = app.collect_pages(app.iterate_pages(operation, {"TableName": "t"}))
+
+        self.assertEqual(len(paged.items), 25)
+        self.assertEqual(paged.pages, 3)
+        self.assertIsNone(paged.last_evaluated_key)
+        self.assertEqual(paged.consumed_capacity, 1.5)
+        self.assertEqual(operation.call_args.kwargs["ReturnConsumedCapacity"], "TOTAL")
+
+    def test_iterate_pages_stops_at_max_items(self) -> None:
+        """測試收集到足夠筆數後提早結束且不會多讀"""
+        operation = self._fake_operation(total=100, page_size=10)
+
+        request = {"KeyConditionExpression": "k = :k"}
+
+        paged = app.collect_pages(app.iterate_pages(operation, request, max_items=15))
+
+        self.assertEqual(len(paged.items), 15)
+        self.assertEqual(operation.call_count, 2)
+        self.assertEqual(operation.call_args.kwargs["Limit"], 5)
+        self.assertEqual(paged.last_evaluated_key, {"pos": Decimal(14)})
+
+    def test_filtered_read_keeps_page_size_and_resumes_after_last_kept_item(self) -> None:
+        """測試 scan / 帶 filter 的 query 不縮小 Limit，截斷最後一頁並從最後保留的 item 續讀"""
+        for request in [{}, {"KeyConditionExpression": "k = :k", "FilterExpression": "f"}]:
+            operation = self._fake_operation(total=100, page_size=10)
+
+            first = app.collect_pages(
+                app.iterate_pages(operation, request, max_items=15, key_attributes=("pos",))
+            )
+            rest = app.collect_pages(
+                app.iterate_pages(
+                    operation,
+                    request,
+                    start_key=first.last_evaluated_key,
+                    max_items=5,
+                    key_attributes=("pos",),
+                )
+            )
+
+            self.assertEqual(operation.call_count, 3)
+            self.assertNotIn("Limit", operation.call_args_list[1].kwargs)
+            self.assertEqual([item["pos"] for item in first.items], list(range(15)))
+            self.assertEqual(first.last_evaluated_key, {"pos": 14})
+            self.assertEqual([item["pos"] for item in rest.items], list(range(15, 20)))
+
+    def test_trimmed_page_projects_key_attributes(self) -> None:
+        """測試截斷頁面時會額外投影 key 屬性產生 LastEvaluatedKey，回傳前移除"""
+        operation = self._fake_operation(total=30, page_size=10)
+        request = {"ProjectionExpression": "created_at"}
+
+        paged = app.collect_pages(
+            app.iterate_pages(operation, request, max_items=5, key_attributes=("pos",))
+        )
+
+        self.assertEqual(operation.call_args.kwargs["ProjectionExpression"], "created_at, #key_pos")
+        self.assertEqual(
+            operation.call_args.kwargs["ExpressionAttributeNames"], {"#key_pos": "pos"}
+        )
+        self.assertEqual(paged.last_evaluated_key, {"pos": 4})
+        self.assertEqual(paged.items, [{"created_at": i} for i in range(5)])
+
+    def test_budget_exhaustion_returns_resumable_token(self) -> None:
+        """測試預算用盡時回傳可續讀的 token"""
+        operation = self._fake_operation(total=30, page_size=10)
+
+        first = app.collect_pages(
+            app.iterate_pages(operation, {}, budget=app.ReadBudget(max_pages=2))
+        )
+        token = app.encode_continuation_token(first.last_evaluated_key)
+        rest = app.collect_pages(
+            app.iterate_pages(operation, {}, start_key=app.decode_continuation_token(token))
+        )
+
+        self.assertEqual(len(first.items), 20)
+        self.assertEqual([item["created_at"] for item in rest.items], list(range(20, 30)))
+
+    def test_read_unit_budget(self) -> None:
+        """測試 RCU 預算"""
+        operation = self._fake_operation(total=100, page_size=10)
+
+        paged = app.collect_pages(
+            app.iterate_pages(operation, {}, budget=app.ReadBudget(max_read_units=1.0))
+        )
+
+        self.assertEqual(paged.pages, 2)
+        self.assertIsNotNone(paged.last_evaluated_key)
+
+    def test_continuation_token_round_trip(self) -> None:
+        """測試 token 編碼與解碼"""
+        key = {"user_id": "user123", "created_at": Decimal("1704038400000")}
+
+        token = app.encode_continuation_token(key)
+
+        self.assertIsInstance(token, str)
+        self.assertEqual(app.decode_continuation_token(token), key)
+        self.assertIsNone(app.encode_continuation_token(None))
+        self.assertIsNone(app.decode_continuation_token(None))
+
+    def test_invalid_continuation_token(self) -> None:
+        """測試無效 token"""
+        with self.assertRaises(ValueError):
+            app.decode_continuation_token("not-a-valid-token!")
+        with self.assertRaises(ValueError):
+            app.decode_continuation_token(app.encode_continuation_token({"k": {"nested": 1}}))
+
+    def test_failed_notifications_reads_all_pages(self) -> None:
+        """測試失敗記錄查詢不會只回傳第一頁"""
+        service = app.QueryService("test-notification-records")
+        service.table = MagicMock()
+        service.table.query = self._fake_operation(total=12, page_size=5)
+
+        result = service.query_failed_notifications()
+
+        self.assertEqual(result["count"], 12)
+        self.assertIsNone(result["next_token"])
+        self.assertEqual(service.table.query.call_count, 3)
+        # 結果依 created_at 降序
+        self.assertEqual(result["items"][0]["created_at"], 11)
+
+    def test_failed_notifications_limit_and_resume(self) -> None:
+        """測試 limit 限制單次回傳筆數，並可用 next_token 續讀"""
+        service = app.QueryService("test-notification-records")
+        service.table = MagicMock()
+        service.table.query = self._fake_operation(
+            total=12, page_size=5, position="created_at", key=self.FAILED_INDEX_KEY
+        )
+
+        first = service.query_failed_notifications(limit=7)
+        rest = service.query_failed_notifications(next_token=first["next_token"], limit=7)
+
+        self.assertEqual(first["count"], 7)
+        self.assertIsNotNone(first["next_token"])
+        self.assertEqual(rest["count"], 5)
+        self.assertIsNone(rest["next_token"])
+
+    def test_sns_notifications_limit_and_resume(self) -> None:
+        """測試 sns 查詢的 limit 與 next_token"""
+        service = app.QueryService("test-notification-records")
+        service.table = MagicMock()
+        service.table.query = self._fake_operation(
+            total=8, page_size=5, position="created_at", key=self.SNS_INDEX_KEY
+        )
+
+        first = service.query_sns_notifications("sns-1", limit=6)
+        rest = service.query_sns_notifications("sns-1", first["next_token"], limit=6)
+
+        self.assertEqual((first["count"], rest["count"]), (6, 2))
+        self.assertIsNone(rest["next_token"])
+
+    def test_token_not_matching_key_schema_is_rejected_before_query(self) -> None:
+        """測試 next_token 的 key 與查詢的索引不符時直接拒絕，不呼叫 DynamoDB"""
+        service = app.QueryService("test-notification-records")
+        service.table = MagicMock()
+        sns_token = app.encode_continuation_token({**self.SNS_INDEX_KEY, "created_at": 5})
+
+        for key in [{"pos": 5}, {**self.FAILED_INDEX_KEY, "created_at": 5, "extra": "x"}]:
+            with self.assertRaises(app.InvalidContinuationTokenError):
+                service.query_failed_notifications(next_token=app.encode_continuation_token(key))
+        with self.assertRaises(app.InvalidContinuationTokenError):
+            service.query_failed_notifications(next_token=sns_token)
+
+        service.table.query.assert_not_called()
+        service.table.scan.assert_not_called()
+
+    def test_scan_token_resumes_scan_without_index(self) -> None:
+        """測試 scan 回退產生的 next_token（只有主表 key）續讀時直接 scan"""
+        service = app.QueryService("test-notification-records")
+        service.table = MagicMock()
+        service.table.scan = self._fake_operation(
+            total=8, page_size=5, position="created_at", key={"user_id": "u"}
+        )
+        token = app.encode_continuation_token({"user_id": "u", "created_at": 4})
+
+        result = service.query_sns_notifications("sns-1", token)
+
+        service.table.query.assert_not_called()
+        self.assertEqual(result["count"], 3)
+        self.assertEqual(result["query_info"]["sns_id"], "sns-1")
+
+    def test_parse_page_limit(self) -> None:
+        """測試 limit 參數解析與上限"""
+        self.assertIsNone(app.parse_page_limit(None))
+        self.assertIsNone(app.parse_page_limit("abc"))
+        self.assertEqual(app.parse_page_limit("0"), 1)
+        self.assertEqual(app.parse_page_limit(50), 50)
+        self.assertEqual(app.parse_page_limit(10**9), app.MAX_PAGE_LIMIT)
+
+    def test_fail_rejects_invalid_token(self) -> None:
+        """測試 /fail 收到無效 next_token 時回傳 400"""
+        response = app.lambda_handler(
+            {"query_type": "fail", "next_token": "not-a-valid-token!"}, MagicMock()
+        )
+
+        self.assertEqual(response["statusCode"], 400)
+
+
+class TestRecentNotificationsIndex(unittest.TestCase):
+    """日期分桶「最新記錄」索引測試"""
+
+    NOW = datetime(2024, 1, 3, 12, 0, tzinfo=timezone.utc)
+
+    def setUp(self) -> None:
+        import boto3
+
+        dynamodb = boto3.resource("dynamodb", region_name="ap-southeast-1")
+        self.table = dynamodb.create_table(
+            TableName="recent-indexed",
+            KeySchema=[
+                {"AttributeName": "user_id", "KeyType": "HASH"},
+                {"AttributeName": "created_at", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "user_id", "AttributeType": "S"},
+                {"AttributeName": "created_at", "AttributeType": "N"},
+                {"AttributeName": "day_bucket", "AttributeType": "S"},
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "day_bucket-created_at-index",
+                    "KeySchema": [
+                        {"AttributeName": "day_bucket", "KeyType": "HASH"},
+                        {"AttributeName": "created_at", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                }
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        # 今天 2 筆、昨天 3 筆、前天 1 筆
+        for days_ago, count in [(0, 2), (1, 3), (2, 1)]:
+            day = self.NOW - timedelta(days=days_ago)
+            for i in range(count):
+                created_at = int(day.timestamp() * 1000) - i * 1000
+                self.table.put_item(
+                    Item={
+                        "user_id": f"user-{days_ago}-{i}",
+                        "created_at": created_at,
+                        "day_bucket": day.strftime("%Y-%m-%d"),
+                        "transaction_id": f"tx-{days_ago}-{i}",
+                        "status": "SENT",
+                    }
+                )
+
+    def test_recent_returns_true_top_n(self) -> None:
+        """測試跨日期分桶回傳真正最新的 N 筆，並在足夠時停止"""
+        service = app.QueryService("recent-indexed")
+
+        with patch.object(service.table, "query", wraps=service.table.query) as mock_query:
+            items, method = service._query_recent(limit=4, now=self.NOW)
+
+        self.assertEqual(method, "INDEX")
+        self.assertEqual(
+            [item["transaction_id"] for item in items], ["tx-0-0", "tx-0-1", "tx-1-0", "tx-1-1"]
+        )
+        # 只讀取今天與昨天兩個分桶
+        self.assertEqual(mock_query.call_count, 2)
+        self.assertFalse(mock_query.call_args.kwargs["ScanIndexForward"])
+        self.assertEqual(mock_query.call_args.kwargs["Limit"], 2)
+
+    def test_recent_fills_from_scan_when_buckets_run_short(self) -> None:
+        """測試分桶不足 limit 筆時以 scan 補上較舊與沒有 day_bucket 的記錄"""
+        self.table.put_item(
+            Item={
+                "user_id": "legacy",
+                "created_at": int((self.NOW - timedelta(days=400)).timestamp() * 1000),
+                "transaction_id": "tx-legacy",
+                "status": "SENT",
+            }
+        )
+        service = app.QueryService("recent-indexed")
+
+        items, method = service._query_recent(limit=10, now=self.NOW)
+
+        self.assertEqual(method, "INDEX_WITH_SCAN")
+        self.assertEqual(len(items), 7)
+        self.assertEqual(items[-1]["transaction_id"], "tx-legacy")
+        self.assertEqual(len({item["transaction_id"] for item in items}), 7)
+
+    def test_recent_lookback_is_capped_by_read_budget(self) -> None:
+        """測試逐日回溯受 RECENT_MAX_PAGES 與請求預算限制，不會每個請求都讀滿回溯天數"""
+        service = app.QueryService("recent-indexed")
+
+        for max_pages, budget, expected_queries in [(7, None, 7), (7, app.ReadBudget(2), 2)]:
+            with (
+                patch.object(app, "RECENT_MAX_PAGES", max_pages),
+                patch.object(service.table, "query", wraps=service.table.query) as mock_query,
+            ):
+                items, method = service._query_recent(limit=10, budget=budget, now=self.NOW)
+
+            self.assertEqual(mock_query.call_count, expected_queries)
+            self.assertEqual(method, "INDEX_WITH_SCAN")
+            self.assertEqual(len(items), 6)
+
+    def test_recent_falls_back_to_scan_without_index(self) -> None:
+        """測試索引不存在時回退到 scan"""
+        service = app.QueryService("recent-indexed", recent_index_name="missing-index")
+
+        items, method = service._query_recent(limit=10, now=self.NOW)
+
+        self.assertEqual(method, "SCAN_FALLBACK")
+        self.assertEqual(len(items), 6)
+        self.assertIn("missing-index", service._missing_indexes)
+
+
+class TestFailedNotificationsIndex(unittest.TestCase):
+    """失敗記錄稀疏索引測試"""
+
+    def setUp(self) -> None:
+        import boto3
+
+        dynamodb = boto3.resource("dynamodb", region_name="ap-southeast-1")
+        self.table = dynamodb.create_table(
+            TableName="failed-indexed",
+            KeySchema=[
+                {"AttributeName": "user_id", "KeyType": "HASH"},
+                {"AttributeName": "created_at", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "user_id", "AttributeType": "S"},
+                {"AttributeName": "created_at", "AttributeType": "N"},
+                {"AttributeName": "transaction_id", "AttributeType": "S"},
+                {"AttributeName": "status", "AttributeType": "S"},
+                {"AttributeName": "failed_bucket", "AttributeType": "S"},
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "transaction_id-status-index",
+                    "KeySchema": [
+                        {"AttributeName": "transaction_id", "KeyType": "HASH"},
+                        {"AttributeName": "status", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                },
+                {
+                    "IndexName": "failed_bucket-created_at-index",
+                    "KeySchema": [
+                        {"AttributeName": "failed_bucket", "KeyType": "HASH"},
+                        {"AttributeName": "created_at", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                },
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        # 每 4 筆中 1 筆失敗，只有失敗記錄帶有 failed_bucket
+        for i in range(20):
+            item: Dict[str, Any] = {
+                "user_id": f"user-{i}",
+                "created_at": 1704038400000 + i,
+                "transaction_id": f"tx-{i % 5}",
+                "status": "FAILED" if i % 4 == 0 else "SENT",
+            }
+            if item["status"] == "FAILED":
+                item["failed_bucket"] = "FAILED"
+            self.table.put_item(Item=item)
+
+    def test_all_failed_reads_only_sparse_index(self) -> None:
+        """測試所有失敗記錄由稀疏索引由新到舊讀取，不掃描全表"""
+        service = app.QueryService("failed-indexed")
+
+        with patch.object(service.table, "scan", wraps=service.table.scan) as mock_scan:
+            result = service.query_failed_notifications()
+
+        mock_scan.assert_not_called()
+        self.assertEqual(
+            [item["created_at"] for item in result["items"]],
+            [1704038400000 + i for i in (16, 12, 8, 4, 0)],
+        )
+
+    def test_all_failed_pages_newest_first(self) -> None:
+        """測試以 limit + next_token 依序讀完所有失敗記錄"""
+        service = app.QueryService("failed-indexed")
+
+        with patch.object(service.table, "query", wraps=service.table.query) as mock_query:
+            first = service.query_failed_notifications(limit=3)
+            rest = service.query_failed_notifications(next_token=first["next_token"], limit=3)
+
+        # 排序由 DynamoDB 負責（moto 在 Limit + 倒序時的分頁順序與實際服務不同，這裡只驗證覆蓋）
+        self.assertFalse(mock_query.call_args.kwargs["ScanIndexForward"])
+        created = [item["created_at"] for item in first["items"] + rest["items"]]
+        self.assertEqual(sorted(created), [1704038400000 + i for i in (0, 4, 8, 12, 16)])
+        self.assertEqual(first["count"], 3)
+        self.assertIsNone(rest["next_token"])
+
+    def test_failed_for_transaction_uses_transaction_index(self) -> None:
+        """測試特定 transaction_id 以索引查詢並只回傳 FAILED 記錄"""
+        service = app.QueryService("failed-indexed")
+
+        with patch.object(service.table, "scan", wraps=service.table.scan) as mock_scan:
+            result = service.query_failed_notifications("tx-0")
+
+        mock_scan.assert_not_called()
+        # tx-0 為 i = 0, 5, 10, 15，其中只有 i = 0 失敗
+        self.assertEqual(result["count"], 1)
+        self.assertEqual(result["items"][0]["created_at"], 1704038400000)
+
+    def test_falls_back_to_scan_without_index(self) -> None:
+        """測試稀疏索引不存在時回退到 scan"""
+        service = app.QueryService("failed-indexed", failed_index_name="missing-index")
+
+        result = service.query_failed_notifications()
+
+        self.assertEqual(result["count"], 5)
+        self.assertIn("missing-index", service._missing_indexes)
+
+
+class TestFieldSelection(unittest.TestCase):
+    """fields 參數與 projection 測試"""
+
+    def test_build_projection_is_shared_and_names_only_used_reserved_words(self) -> None:
+        """測試相同欄位共用同一個 projection，且只宣告用到的保留字"""
+        projection = app.build_projection(("transaction_id", "status"))
+
+        self.assertIs(projection, app.build_projection(("transaction_id", "status")))
+        self.assertEqual(projection["ProjectionExpression"], "transaction_id, #status")
+        self.assertEqual(projection["ExpressionAttributeNames"], {"#status": "status"})
+        self.assertNotIn(
+            "ExpressionAttributeNames", app.build_projection(("transaction_id", "created_at"))
+        )
+        self.assertIs(app.NOTIFICATION_PROJECTION, app.build_projection(app.NOTIFICATION_FIELDS))
+
+    def test_parse_fields(self) -> None:
+        """測試 fields 解析為依預設順序排序、去重的 tuple"""
+        self.assertIsNone(app.parse_fields(None))
+        self.assertIsNone(app.parse_fields(""))
+        self.assertEqual(
+            app.parse_fields("status, transaction_id,status"), ("transaction_id", "status")
+        )
+        self.assertEqual(app.parse_fields(["created_at", "token"]), ("token", "created_at"))
+        with self.assertRaises(ValueError):
+            app.parse_fields("transaction_id,user_id")
+
+    def test_format_keeps_only_selected_fields(self) -> None:
+        """測試指定 fields 時不補預設值，只輸出選取欄位的 UTC+8 字串"""
+        item = {"transaction_id": "tx-1", "failed_ts": Decimal("1704038400000")}
+
+        formatted = app.format_notification_items([item], ("transaction_id", "failed_ts"))
+
+        self.assertEqual(
+            formatted,
+            [
+                {
+                    "transaction_id": "tx-1",
+                    "failed_ts": 1704038400000,
+                    "failed_time_utc8": "2024-01-01 00:00:00 UTC+8",
+                }
+            ],
+        )
+
+    def test_query_reads_only_selected_attributes(self) -> None:
+        """測試 DynamoDB 只回傳選取的欄位"""
+        import boto3
+
+        dynamodb = boto3.resource("dynamodb", region_name="ap-southeast-1")
+        table = dynamodb.create_table(
+            TableName="field-selection",
+            KeySchema=[{"AttributeName": "transaction_id", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "transaction_id", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        table.put_item(
+            Item={
+                "transaction_id": "tx-1",
+                "status": "SENT",
+                "notification_body": "x" * 1000,
+                "created_at": 1704038400000,
+            }
+        )
+        service = app.QueryService("field-selection", transaction_index_name="")
+
+        result = service.query_transaction_notifications(
+            "tx-1", fields=("transaction_id", "status")
+        )
+
+        self.assertEqual(result["items"], [{"transaction_id": "tx-1", "status": "SENT"}])
+
+    @patch.object(app, "query_service")
+    def test_route_rejects_unknown_fields(self, mock_service: MagicMock) -> None:
+        """測試 API Gateway 請求的 fields 包含未知欄位時回傳 400"""
+        event = {
+            "version": "2.0",
+            "routeKey": "GET /sns",
+            "rawPath": "/sns",
+            "rawQueryString": "sns_id=sns-1&fields=password",
+            "queryStringParameters": {"sns_id": "sns-1", "fields": "password"},
+            "requestContext": {"http": {"method": "GET", "path": "/sns"}, "stage": "$default"},
+            "isBase64Encoded": False,
+        }
+
+        response = app.lambda_handler(event, create_mock_lambda_context())
+
+        self.assertEqual(response["statusCode"], 400)
+        mock_service.query_sns_notifications.assert_not_called()
+
+
+class TestLazyInitialization(unittest.TestCase):
+    """DynamoDB client 延遲初始化測試"""
+
+    def test_table_created_on_first_use_and_shared(self) -> None:
+        """測試建立 QueryService 不會建立 client，首次使用時才建立並共用"""
+        client = MagicMock()
+        with (
+            patch.object(app, "_dynamodb", None),
+            patch.object(app, "get_dynamodb_client", return_value=client) as mock_get,
+        ):
+            first = app.QueryService("lazy-table")
+            second = app.QueryService("lazy-table")
+            mock_get.assert_not_called()
+
+            self.assertIs(first.table, first.table)
+            self.assertIsInstance(first.table, app.DynamoDBTable)
+            self.assertIs(second.table.client, first.table.client)
+
+        mock_get.assert_called_once_with()
+        self.assertEqual(first.table.table_name, "lazy-table")
+
+
+class TestLowLevelClient(unittest.TestCase):
+    """low-level client 讀取與反序列化測試"""
+
+    def test_deserialize_item_uses_native_types(self) -> None:
+        """測試 S / N 轉為 str / int，小數保留 Decimal，其他型別交給 TypeDeserializer"""
+        item = app.deserialize_item(
+            {
+                "transaction_id": {"S": "tx001"},
+                "created_at": {"N": "1704038400000"},
+                "ratio": {"N": "0.5"},
+                "tags": {"SS": ["a"]},
+                "extra": {"M": {"retry": {"N": "1"}}},
+                "error_msg": {"NULL": True},
+            }
+        )
+
+        self.assertEqual(item["transaction_id"], "tx001")
+        self.assertEqual(item["created_at"], 1704038400000)
+        self.assertIs(type(item["created_at"]), int)
+        self.assertEqual(item["ratio"], Decimal("0.5"))
+        self.assertEqual(item["tags"], {"a"})
+        self.assertEqual(item["extra"], {"retry": Decimal("1")})
+        self.assertIsNone(item["error_msg"])
+
+    def test_query_builds_low_level_request(self) -> None:
+        """測試 Key / Attr 條件、expression 值與 ExclusiveStartKey 轉為 low-level 格式"""
+        client = MagicMock()
+        client.query.return_value = {
+            "Items": [{"transaction_id": {"S": "tx001"}, "created_at": {"N": "1"}}],
+            "LastEvaluatedKey": {"transaction_id": {"S": "tx001"}, "created_at": {"N": "1"}},
+        }
+        table = app.DynamoDBTable(client, "notification-records")
+
+        response = table.query(
+            IndexName="transaction_id-index",
+            KeyConditionExpression=Key("transaction_id").eq("tx001"),
+            FilterExpression=Attr("status").eq("FAILED"),
+            ProjectionExpression="#token",
+            ExpressionAttributeNames={"#token": "token"},
+            ExclusiveStartKey={"transaction_id": "tx000", "created_at": 0},
+        )
+
+        request = client.query.call_args.kwargs
+        self.assertEqual(request["TableName"], "notification-records")
+        self.assertEqual(request["KeyConditionExpression"], "#n0 = :v0")
+        self.assertEqual(request["FilterExpression"], "#n1 = :v1")
+        self.assertEqual(
+            request["ExpressionAttributeNames"],
+            {"#token": "token", "#n0": "transaction_id", "#n1": "status"},
+        )
+        self.assertEqual(
+            request["ExpressionAttributeValues"], {":v0": {"S": "tx001"}, ":v1": {"S": "FAILED"}}
+        )
+        self.assertEqual(
+            request["ExclusiveStartKey"],
+            {"transaction_id": {"S": "tx000"}, "created_at": {"N": "0"}},
+        )
+        self.assertEqual(response["Items"], [{"transaction_id": "tx001", "created_at": 1}])
+        self.assertEqual(response["LastEvaluatedKey"], {"transaction_id": "tx001", "created_at": 1})
+
+
+class TestJsonSerialization(unittest.TestCase):
+    """回應 body 序列化測試"""
+
+    PAYLOAD = {"count": Decimal("2"), "items": [{"created_at": Decimal("1704038400000")}]}
+
+    def test_dumps_json_converts_decimals(self) -> None:
+        """測試 Decimal 轉為整數，輸出與標準庫 json 等價"""
+        body = app.dumps_json(self.PAYLOAD)
+
+        self.assertEqual(json.loads(body), {"count": 2, "items": [{"created_at": 1704038400000}]})
+        self.assertEqual(body, json.dumps(json.loads(body), separators=(",", ":")))
+
+    def test_dumps_json_falls_back_without_orjson(self) -> None:
+        """測試未安裝 orjson 時回退到標準庫 json 且輸出相同"""
+        expected = app.dumps_json(self.PAYLOAD)
+
+        with patch.object(app, "orjson", None):
+            self.assertEqual(app.dumps_json(self.PAYLOAD), expected)
@@ -9,6 +9,7 @@ stream_processor_lambda 測試模組
 """
 
 import os
+from typing import Any
 from unittest.mock import Mock, patch
 
 import pytest
@@ -28,6 +29,10 @@ class TestStreamProcessorLambda:
         os.environ["AWS_REGION"] = "ap-southeast-1"
         os.environ["NOTIFICATION_TABLE_NAME"] = "notification-records"
 
+        from lambdas.stream_processor_lambda.app import _applied_versions
+
+        _applied_versions.clear()
+
     @pytest.fixture
     def sample_dynamodb_event(self) -> dict:
         """提供標準的 DynamoDB Stream 事件範例"""
@@ -82,9 +87,9 @@ class TestStreamProcessorLambda:
         from lambdas.stream_processor_lambda.app import lambda_handler
 
         # 設置 mock DynamoDB
-        mock_table = Mock()
         mock_dynamodb = Mock()
-        mock_dynamodb.Table.return_value = mock_table
+        mock_dynamodb.batch_get_item.return_value = {"Responses": {}}
+        mock_dynamodb.batch_write_item.return_value = {"UnprocessedItems": {}}
         mock_get_dynamodb.return_value = mock_dynamodb
 
         # 執行測試
@@ -93,7 +98,8 @@ class TestStreamProcessorLambda:
         # 驗證結果
         assert result["statusCode"] == 200
         assert result["processedRecords"] == 1
-        mock_table.put_item.assert_called_once()
+        assert result["batchItemFailures"] == []
+        mock_dynamodb.batch_write_item.assert_called_once()
 
     @patch("lambdas.stream_processor_lambda.app.get_dynamodb")
     def test_lambda_handler_multiple_records(
@@ -123,18 +129,19 @@ class TestStreamProcessorLambda:
         }
 
         # 設置 mock
-        mock_table = Mock()
         mock_dynamodb = Mock()
-        mock_dynamodb.Table.return_value = mock_table
+        mock_dynamodb.batch_write_item.return_value = {"UnprocessedItems": {}}
         mock_get_dynamodb.return_value = mock_dynamodb
 
         # 執行測試
         result = lambda_handler(multi_record_event, mock_context)
 
-        # 驗證結果
+        # 驗證結果：三筆記錄合併為一次 BatchWriteItem
         assert result["statusCode"] == 200
         assert result["processedRecords"] == 3
-        assert mock_table.put_item.call_count == 3
+        mock_dynamodb.batch_write_item.assert_called_once()
+        request_items = mock_dynamodb.batch_write_item.call_args[1]["RequestItems"]
+        assert len(request_items["notification-records"]) == 3
 
     def test_extract_value_function(self) -> None:
         """測試 extract_value 輔助函數"""
@@ -195,6 +202,72 @@ class TestStreamProcessorLambda:
         with pytest.raises(ValueError, match="Missing required fields"):
             parse_command_record(incomplete_record)
 
+    def test_decode_attribute_all_types(self) -> None:
+        """測試 decode_attribute 支援 NULL、L、M 與集合型別"""
+        from decimal import Decimal
+
+        from lambdas.stream_processor_lambda.app import decode_attribute
+
+        assert decode_attribute({"NULL": True}) is None
+        assert decode_attribute({"N": "1.5"}) == Decimal("1.5")
+        assert decode_attribute({"SS": ["a", "b"]}) == {"a", "b"}
+        assert decode_attribute({"NS": ["1", "2"]}) == {1, 2}
+        assert decode_attribute({"B": "aGk="}) == b"hi"
+        assert decode_attribute({"L": [{"S": "a"}, {"N": "1"}]}) == ["a", 1]
+        assert decode_attribute({"M": {"retry": {"N": "2"}, "tags": {"SS": ["x"]}}}) == {
+            "retry": 2,
+            "tags": {"x"},
+        }
+
+        with pytest.raises(ValueError):
+            decode_attribute({"INVALID": "value"})
+        with pytest.raises(ValueError):
+            decode_attribute({"N": "not-a-number"})
+
+    def test_parse_command_record_null_and_nested_values(self) -> None:
+        """測試 NULL 屬性使用預設值，巢狀屬性完整保留，未使用的屬性忽略"""
+        from lambdas.stream_processor_lambda.app import (
+            NotificationStatus,
+            Platform,
+            parse_command_record,
+        )
+
+        result = parse_command_record(
+            {
+                "transaction_id": {"S": "tx-001"},
+                "created_at": {"N": "1732000000"},
+                "user_id": {"S": "user-123"},
+                "notification_title": {"S": "Test Title"},
+                "status": {"NULL": True},
+                "retry_cnt": {"NULL": True},
+                "error_msg": {"NULL": True},
+                "payload": {"M": {"deep_link": {"S": "app://tx"}, "badges": {"L": [{"N": "1"}]}}},
+                "unused": {"BS": ["aGk="]},
+            }
+        )
+
+        assert result.status == NotificationStatus.SENT
+        assert result.platform == Platform.IOS
+        assert result.retry_cnt == 0
+        assert result.error_msg is None
+        assert result.payload == {"deep_link": "app://tx", "badges": [1]}
+
+    def test_parse_command_record_invalid_values(self) -> None:
+        """測試無效的狀態或屬性值回報為格式錯誤"""
+        from lambdas.stream_processor_lambda.app import parse_command_record
+
+        base = {
+            "transaction_id": {"S": "tx-001"},
+            "created_at": {"N": "1732000000"},
+            "user_id": {"S": "user-123"},
+            "notification_title": {"S": "Test Title"},
+        }
+
+        with pytest.raises(ValueError, match="Invalid command record format"):
+            parse_command_record({**base, "status": {"S": "UNKNOWN"}})
+        with pytest.raises(ValueError, match="Invalid command record format"):
+            parse_command_record({**base, "created_at": {"N": "abc"}})
+
     def test_transform_to_query_record(self) -> None:
         """測試命令記錄轉查詢記錄"""
         from lambdas.stream_processor_lambda.app import (
@@ -227,6 +300,49 @@ class TestStreamProcessorLambda:
         assert result.status == NotificationStatus.SENT
         assert result.platform == Platform.IOS
 
+    def test_records_use_slots(self) -> None:
+        """測試記錄型別使用 __slots__，不建立實例 __dict__"""
+        from lambdas.stream_processor_lambda.app import (
+            CommandRecord,
+            QueryRecord,
+            WriteOutcome,
+        )
+
+        for record_type in (CommandRecord, QueryRecord, WriteOutcome):
+            assert "__slots__" in vars(record_type)
+            assert "__dict__" not in dir(record_type)
+
+    def test_command_record_written_without_query_record(self) -> None:
+        """測試 CommandRecord 直接產生的寫入 item 與經過 QueryRecord 轉換的相同"""
+        from lambdas.stream_processor_lambda.app import (
+            build_query_item,
+            to_command_record,
+            to_query_record,
+        )
+
+        record = {
+            "eventName": "INSERT",
+            "dynamodb": {
+                "NewImage": {
+                    "transaction_id": {"S": "tx-001"},
+                    "created_at": {"N": "1732000000000"},
+                    "user_id": {"S": "user-123"},
+                    "notification_title": {"S": "Test Title"},
+                    "status": {"S": "FAILED"},
+                    "device_token": {"S": "token-123"},
+                    "error_msg": {"S": "Device token invalid"},
+                    "retry_cnt": {"N": "2"},
+                }
+            },
+        }
+
+        command_record = to_command_record(record)
+        query_record = to_query_record(record)
+
+        assert command_record is not None and query_record is not None
+        assert build_query_item(command_record) == build_query_item(query_record)
+        assert "device_token" not in build_query_item(command_record)
+
     @patch("lambdas.stream_processor_lambda.app.get_dynamodb")
     def test_save_query_record_success(self, mock_get_dynamodb: Mock) -> None:
         """測試保存查詢記錄成功"""
@@ -266,6 +382,73 @@ class TestStreamProcessorLambda:
         assert call_args["user_id"] == "user-123"
         assert call_args["transaction_id"] == "tx-001"
 
+    def test_day_bucket_for(self) -> None:
+        """測試日期分桶使用 UTC 日期"""
+        from lambdas.stream_processor_lambda.app import day_bucket_for
+
+        assert day_bucket_for(1704067199000) == "2023-12-31"
+        assert day_bucket_for(1704067200000) == "2024-01-01"
+
+    @patch("lambdas.stream_processor_lambda.app.get_dynamodb")
+    def test_save_query_record_writes_day_bucket(self, mock_get_dynamodb: Mock) -> None:
+        """測試寫入「最新記錄」索引使用的 day_bucket 欄位"""
+        from lambdas.stream_processor_lambda.app import (
+            NotificationStatus,
+            Platform,
+            QueryRecord,
+            save_query_record,
+        )
+
+        mock_table = Mock()
+        mock_get_dynamodb.return_value.Table.return_value = mock_table
+
+        save_query_record(
+            QueryRecord(
+                user_id="user-123",
+                created_at=1704067200000,
+                transaction_id="tx-001",
+                marketing_id=None,
+                notification_title="Test Title",
+                status=NotificationStatus.SENT,
+                platform=Platform.IOS,
+                error_msg=None,
+                ap_id=None,
+            )
+        )
+
+        item = mock_table.put_item.call_args[1]["Item"]
+        assert item["day_bucket"] == "2024-01-01"
+
+    def test_build_query_item_failed_bucket_only_on_failed(self) -> None:
+        """測試只有 FAILED 記錄帶有稀疏索引的 failed_bucket 欄位"""
+        from lambdas.stream_processor_lambda.app import (
+            NotificationStatus,
+            Platform,
+            QueryRecord,
+            build_query_item,
+        )
+
+        items = {
+            status: build_query_item(
+                QueryRecord(
+                    user_id="user-123",
+                    created_at=1704067200000,
+                    transaction_id="tx-001",
+                    marketing_id=None,
+                    notification_title="Test Title",
+                    status=status,
+                    platform=Platform.IOS,
+                    error_msg=None,
+                    ap_id=None,
+                )
+            )
+            for status in NotificationStatus
+        }
+
+        assert items[NotificationStatus.FAILED]["failed_bucket"] == "FAILED"
+        assert "failed_bucket" not in items[NotificationStatus.SENT]
+        assert "failed_bucket" not in items[NotificationStatus.DELIVERED]
+
     @patch("lambdas.stream_processor_lambda.app.get_dynamodb")
     def test_save_query_record_client_error(self, mock_get_dynamodb: Mock) -> None:
         """測試保存查詢記錄時的 DynamoDB 錯誤"""
@@ -306,17 +489,33 @@ class TestStreamProcessorLambda:
             save_query_record(query_record)
 
     def test_process_stream_record_skip_non_insert(self) -> None:
-        """測試跳過非 INSERT 事件"""
+        """測試跳過不支援的事件"""
         from lambdas.stream_processor_lambda.app import process_stream_record
 
-        modify_record = {
-            "eventName": "MODIFY",
+        unknown_record = {
+            "eventName": "UNKNOWN",
             "dynamodb": {"NewImage": {"transaction_id": {"S": "tx-001"}}},
         }
 
         # 這應該不會拋出異常，只是跳過處理
+        process_stream_record(unknown_record)
+
+    @patch("lambdas.stream_processor_lambda.app.get_dynamodb")
+    def test_process_stream_record_skip_unprojected_modify(
+        self, mock_get_dynamodb: Mock, stream_events: Any
+    ) -> None:
+        """測試只變更未投影欄位的 MODIFY 不會寫入"""
+        from lambdas.stream_processor_lambda.app import process_stream_record
+
+        image = stream_events.image(device_token={"S": "token-1"})
+        modify_record = stream_events.stream_record(
+            "MODIFY", "100", old=image, new={**image, "device_token": {"S": "token-2"}}
+        )
+
         process_stream_record(modify_record)
 
+        mock_get_dynamodb.assert_not_called()
+
     def test_process_stream_record_no_new_image(self) -> None:
         """測試沒有 NewImage 的情況"""
         from lambdas.stream_processor_lambda.app import process_stream_record
@@ -401,11 +600,18 @@ class TestStreamProcessorLambda:
         """測試部分記錄處理失敗的情況"""
         from lambdas.stream_processor_lambda.app import lambda_handler
 
-        # 設置第二個記錄會失敗
-        mock_table = Mock()
-        mock_table.put_item.side_effect = [None, Exception("DB Error"), None]
+        # 設置第二個記錄始終為 UnprocessedItems
+        def batch_write_item(RequestItems: dict) -> dict:
+            unprocessed = [
+                request
+                for request in RequestItems["notification-records"]
+                if request["PutRequest"]["Item"]["transaction_id"] == "tx-1"
+            ]
+            return {"UnprocessedItems": {"notification-records": unprocessed}}
+
         mock_dynamodb = Mock()
-        mock_dynamodb.Table.return_value = mock_table
+        mock_dynamodb.batch_get_item.return_value = {"Responses": {}}
+        mock_dynamodb.batch_write_item.side_effect = batch_write_item
         mock_get_dynamodb.return_value = mock_dynamodb
 
         event = {
@@ -420,18 +626,59 @@ class TestStreamProcessorLambda:
                             "notification_title": {"S": f"Title {i}"},
                             "status": {"S": "SENT"},
                             "platform": {"S": "IOS"},
-                        }
+                        },
+                        "SequenceNumber": f"{100 + i}",
                     },
                 }
                 for i in range(3)
             ]
         }
 
-        result = lambda_handler(event, mock_context)
+        with patch("lambdas.stream_processor_lambda.app.time.sleep"):
+            result = lambda_handler(event, mock_context)
 
-        # 應該處理成功 2 個記錄（第一個和第三個）
+        # 應該處理成功 2 個記錄（第一個和第三個），失敗的記錄以 sequence number 回報
         assert result["statusCode"] == 200
         assert result["processedRecords"] == 2
+        assert result["batchItemFailures"] == [{"itemIdentifier": "101"}]
+
+    @patch("lambdas.stream_processor_lambda.app.get_dynamodb")
+    def test_lambda_handler_reports_unparseable_records(
+        self, mock_get_dynamodb: Mock, mock_context: Mock
+    ) -> None:
+        """測試無法解析的記錄回報於 batchItemFailures，略過的事件不算失敗"""
+        from lambdas.stream_processor_lambda.app import lambda_handler
+
+        mock_dynamodb = Mock()
+        mock_dynamodb.batch_get_item.return_value = {"Responses": {}}
+        mock_dynamodb.batch_write_item.return_value = {"UnprocessedItems": {}}
+        mock_get_dynamodb.return_value = mock_dynamodb
+
+        valid_image = {
+            "transaction_id": {"S": "tx-ok"},
+            "created_at": {"N": "1732000000000"},
+            "user_id": {"S": "user-1"},
+            "notification_title": {"S": "Title"},
+        }
+        event = {
+            "Records": [
+                {
+                    "eventName": "INSERT",
+                    "dynamodb": {"NewImage": valid_image, "SequenceNumber": "1"},
+                },
+                {
+                    "eventName": "INSERT",
+                    "dynamodb": {"NewImage": {"user_id": {"S": "u"}}, "SequenceNumber": "2"},
+                },
+                {"eventName": "REMOVE", "dynamodb": {"SequenceNumber": "3"}},
+                {"eventName": "INSERT", "dynamodb": {"NewImage": {"user_id": {"S": "u"}}}},
+            ]
+        }
+
+        result = lambda_handler(event, mock_context)
+
+        assert result["processedRecords"] == 2
+        assert result["batchItemFailures"] == [{"itemIdentifier": "2"}, {"itemIdentifier": ""}]
 
     def test_enum_classes(self) -> None:
         """測試枚舉類別"""
@@ -446,3 +693,591 @@ class TestStreamProcessorLambda:
         assert Platform.IOS.value == "IOS"
         assert Platform.ANDROID.value == "ANDROID"
         assert Platform.WEBPUSH.value == "WEBPUSH"
+
+    @patch("lambdas.stream_processor_lambda.app.get_dynamodb")
+    def test_batch_save_chunks_by_25(self, mock_get_dynamodb: Mock, stream_events: Any) -> None:
+        """測試批次寫入以 25 筆為單位分批"""
+        from lambdas.stream_processor_lambda.app import batch_save_query_records
+
+        mock_dynamodb = Mock()
+        mock_dynamodb.batch_write_item.return_value = {"UnprocessedItems": {}}
+        mock_get_dynamodb.return_value = mock_dynamodb
+
+        outcomes = batch_save_query_records([stream_events.query_record(i) for i in range(60)])
+
+        sizes = [
+            len(call[1]["RequestItems"]["notification-records"])
+            for call in mock_dynamodb.batch_write_item.call_args_list
+        ]
+        assert sizes == [25, 25, 10]
+        assert all(outcome.success and outcome.attempts == 1 for outcome in outcomes)
+
+    @patch("lambdas.stream_processor_lambda.app.get_dynamodb")
+    def test_batch_save_splits_duplicate_keys(
+        self, mock_get_dynamodb: Mock, stream_events: Any
+    ) -> None:
+        """測試同一批次內重複主鍵時拆成兩次請求"""
+        from lambdas.stream_processor_lambda.app import batch_save_query_records
+
+        mock_dynamodb = Mock()
+        mock_dynamodb.batch_write_item.return_value = {"UnprocessedItems": {}}
+        mock_get_dynamodb.return_value = mock_dynamodb
+
+        first = stream_events.query_record(1)
+        duplicate = stream_events.query_record(1)
+        duplicate.transaction_id = "tx-1-updated"
+
+        batch_save_query_records([first, stream_events.query_record(2), duplicate])
+
+        calls = mock_dynamodb.batch_write_item.call_args_list
+        assert len(calls) == 2
+        last_request = calls[1][1]["RequestItems"]["notification-records"]
+        assert last_request[0]["PutRequest"]["Item"]["transaction_id"] == "tx-1-updated"
+
+    @patch("lambdas.stream_processor_lambda.app.time.sleep")
+    @patch("lambdas.stream_processor_lambda.app.get_dynamodb")
+    def test_batch_save_retries_unprocessed_items(
+        self, mock_get_dynamodb: Mock, mock_sleep: Mock, stream_events: Any
+    ) -> None:
+        """測試 UnprocessedItems 會以退避重試，直到寫入成功"""
+        from lambdas.stream_processor_lambda.app import batch_save_query_records
+
+        responses = []
+
+        def batch_write_item(RequestItems: dict) -> dict:
+            requests = RequestItems["notification-records"]
+            responses.append(len(requests))
+            # 第一次只處理第一筆
+            unprocessed = requests[1:] if len(responses) == 1 else []
+            return {"UnprocessedItems": {"notification-records": unprocessed}}
+
+        mock_dynamodb = Mock()
+        mock_dynamodb.batch_write_item.side_effect = batch_write_item
+        mock_get_dynamodb.return_value = mock_dynamodb
+
+        outcomes = batch_save_query_records([stream_events.query_record(i) for i in range(3)])
+
+        assert responses == [3, 2]
+        assert mock_sleep.call_count == 1
+        assert [outcome.success for outcome in outcomes] == [True, True, True]
+        assert [outcome.attempts for outcome in outcomes] == [1, 2, 2]
+
+    @patch("lambdas.stream_processor_lambda.app.time.sleep")
+    @patch("lambdas.stream_processor_lambda.app.get_dynamodb")
+    def test_batch_save_reports_exhausted_retries(
+        self, mock_get_dynamodb: Mock, mock_sleep: Mock, stream_events: Any
+    ) -> None:
+        """測試重試用盡後回報失敗的記錄"""
+        from lambdas.stream_processor_lambda import app
+
+        def batch_write_item(RequestItems: dict) -> dict:
+            return {"UnprocessedItems": dict(RequestItems)}
+
+        mock_dynamodb = Mock()
+        mock_dynamodb.batch_write_item.side_effect = batch_write_item
+        mock_get_dynamodb.return_value = mock_dynamodb
+
+        outcomes = app.batch_save_query_records([stream_events.query_record(1)])
+
+        assert mock_dynamodb.batch_write_item.call_count == app.BATCH_WRITE_MAX_ATTEMPTS
+        assert mock_sleep.call_count == app.BATCH_WRITE_MAX_ATTEMPTS - 1
+        assert outcomes[0].success is False
+        assert outcomes[0].error == "UnprocessedItems"
+
+    @patch("lambdas.stream_processor_lambda.app.get_dynamodb")
+    def test_batch_save_client_error(self, mock_get_dynamodb: Mock, stream_events: Any) -> None:
+        """測試 BatchWriteItem 發生 ClientError 時整批標記失敗"""
+        from botocore.exceptions import ClientError
+
+        from lambdas.stream_processor_lambda.app import batch_save_query_records
+
+        mock_dynamodb = Mock()
+        mock_dynamodb.batch_write_item.side_effect = ClientError(
+            {"Error": {"Code": "ValidationException", "Message": "bad"}}, "BatchWriteItem"
+        )
+        mock_get_dynamodb.return_value = mock_dynamodb
+
+        outcomes = batch_save_query_records([stream_events.query_record(i) for i in range(2)])
+
+        assert [outcome.error for outcome in outcomes] == ["ValidationException"] * 2
+
+    @patch("lambdas.stream_processor_lambda.app.get_dynamodb")
+    def test_save_query_records_parallel_lanes_keep_order(
+        self, mock_get_dynamodb: Mock, stream_events: Any
+    ) -> None:
+        """測試並行模式：依投影主鍵分 lane，不同 transaction_id 寫入同一列時仍保持順序"""
+        import threading
+
+        from lambdas.stream_processor_lambda import app
+
+        calls = []
+        lock = threading.Lock()
+
+        def batch_write_item(RequestItems: dict) -> dict:
+            items = [
+                request["PutRequest"]["Item"] for request in RequestItems["notification-records"]
+            ]
+            with lock:
+                calls.append(items)
+            return {"UnprocessedItems": {}}
+
+        mock_client = Mock()
+        mock_client.batch_write_item.side_effect = batch_write_item
+        mock_dynamodb = Mock()
+        mock_dynamodb.meta.client = mock_client
+        mock_get_dynamodb.return_value = mock_dynamodb
+
+        records = []
+        for i in range(40):
+            record = stream_events.query_record(i, user_id=f"user-{i % 8}")
+            record.created_at = 1732000000000 + i % 8
+            records.append(record)
+
+        with (
+            patch.object(app, "STREAM_PROCESSOR_PARALLELISM", 4),
+            patch.object(app, "_executor", None),
+        ):
+            outcomes = app.save_query_records(records)
+
+        assert [outcome.query_record for outcome in outcomes] == records
+        assert all(outcome.success for outcome in outcomes)
+        # 全部經由共用的 low-level client 寫入
+        mock_dynamodb.batch_write_item.assert_not_called()
+        assert sum(len(items) for items in calls) == 40
+
+        # 同一主鍵只會出現在同一 lane，且依原始順序寫入
+        lanes_by_key: dict = {}
+        for items in calls:
+            for item in items:
+                key = (item["user_id"], item["created_at"])
+                lanes_by_key.setdefault(key, set()).add(app.lane_for(key, 4))
+        assert all(len(lanes) == 1 for lanes in lanes_by_key.values())
+        for key in lanes_by_key:
+            written = [
+                int(item["transaction_id"].removeprefix("tx-"))
+                for items in calls
+                for item in items
+                if (item["user_id"], item["created_at"]) == key
+            ]
+            assert written == sorted(written)
+
+    @patch("lambdas.stream_processor_lambda.app.batch_save_query_records")
+    def test_save_query_records_sequential_by_default(
+        self, mock_batch_save: Mock, stream_events: Any
+    ) -> None:
+        """測試預設（parallelism = 1）直接走單一批次寫入"""
+        from lambdas.stream_processor_lambda import app
+
+        records = [stream_events.query_record(i) for i in range(3)]
+        with patch.object(app, "STREAM_PROCESSOR_PARALLELISM", 1):
+            app.save_query_records(records)
+
+        mock_batch_save.assert_called_once_with(records)
+
+    def test_conditional_writes_reject_redelivered_and_stale_events(
+        self,
+        notification_records_table: Any,
+        dynamodb_resource: Any,
+        mock_context: Mock,
+        stream_events: Any,
+    ) -> None:
+        """測試 PROJECTION_CONDITIONAL_WRITES=true 時重送與過期的事件由條件式寫入拒絕"""
+        from lambdas.stream_processor_lambda import app
+
+        key = {"user_id": "user-123", "created_at": 1732000000000}
+        with (
+            patch.object(app, "get_dynamodb", return_value=dynamodb_resource),
+            patch.object(app, "READ_TABLE_NAME", notification_records_table.name),
+            patch.object(app, "PROJECTION_CONDITIONAL_WRITES", True),
+        ):
+            first = app.lambda_handler(stream_events.versioned_event("200"), mock_context)
+            # 新容器（沒有本地快取）收到重送與較舊的事件
+            app._applied_versions.clear()
+            redelivered = app.lambda_handler(stream_events.versioned_event("200"), mock_context)
+            app._applied_versions.clear()
+            stale = app.lambda_handler(stream_events.versioned_event("100", "FAILED"), mock_context)
+            stored = notification_records_table.get_item(Key=key)["Item"]
+            assert stored["status"] == "SENT"
+            assert stored["projection_version"] == "200".zfill(app.SEQUENCE_NUMBER_WIDTH)
+
+            newer = app.lambda_handler(
+                stream_events.versioned_event("1000", "FAILED"), mock_context
+            )
+            stored = notification_records_table.get_item(Key=key)["Item"]
+
+        assert first["duplicateRecords"] == 0
+        assert redelivered["duplicateRecords"] == 1
+        assert stale["duplicateRecords"] == 1
+        assert newer["duplicateRecords"] == 0
+        assert all(
+            result["processedRecords"] == 1 and not result["batchItemFailures"]
+            for result in (first, redelivered, stale, newer)
+        )
+        assert stored["status"] == "FAILED"
+
+    def test_batched_writes_skip_stale_events_in_cold_container(
+        self,
+        notification_records_table: Any,
+        dynamodb_resource: Any,
+        mock_context: Mock,
+        stream_events: Any,
+    ) -> None:
+        """測試預設的批次寫入在新容器收到重送或過期的 INSERT 時，不覆寫較新的投影"""
+        from lambdas.stream_processor_lambda import app
+
+        key = {"user_id": "user-123", "created_at": 1732000000000}
+        with (
+            patch.object(app, "get_dynamodb", return_value=dynamodb_resource),
+            patch.object(app, "READ_TABLE_NAME", notification_records_table.name),
+            patch.object(
+                dynamodb_resource, "batch_write_item", wraps=dynamodb_resource.batch_write_item
+            ) as mock_write,
+        ):
+            app.lambda_handler(stream_events.versioned_event("1000", "FAILED"), mock_context)
+            app._applied_versions.clear()
+            redelivered = app.lambda_handler(
+                stream_events.versioned_event("1000", "FAILED"), mock_context
+            )
+            app._applied_versions.clear()
+            stale = app.lambda_handler(stream_events.versioned_event("200"), mock_context)
+            stored = notification_records_table.get_item(Key=key)["Item"]
+
+        assert mock_write.call_count == 1
+        assert redelivered["duplicateRecords"] == stale["duplicateRecords"] == 1
+        assert not redelivered["batchItemFailures"] and not stale["batchItemFailures"]
+        assert stored["status"] == "FAILED"
+        assert stored["projection_version"] == "1000".zfill(app.SEQUENCE_NUMBER_WIDTH)
+
+    @patch("lambdas.stream_processor_lambda.app.get_dynamodb")
+    def test_dedupe_cache_skips_write_for_redelivered_events(
+        self, mock_get_dynamodb: Mock, mock_context: Mock, stream_events: Any
+    ) -> None:
+        """測試暖容器內重送的事件不再送出寫入"""
+        from lambdas.stream_processor_lambda.app import lambda_handler
+
+        mock_dynamodb = Mock()
+        mock_dynamodb.batch_get_item.return_value = {"Responses": {}}
+        mock_dynamodb.batch_write_item.return_value = {"UnprocessedItems": {}}
+        mock_get_dynamodb.return_value = mock_dynamodb
+
+        first = lambda_handler(stream_events.versioned_event("200"), mock_context)
+        redelivered = lambda_handler(stream_events.versioned_event("200"), mock_context)
+
+        assert mock_dynamodb.batch_write_item.call_count == 1
+        mock_dynamodb.put_item.assert_not_called()
+        assert first["duplicateRecords"] == 0
+        assert redelivered["duplicateRecords"] == 1
+        assert redelivered["processedRecords"] == 1
+
+    def test_applied_version_cache_evicts_least_recent(self) -> None:
+        """測試本地版本快取只保留較新的版本並依 LRU 淘汰"""
+        from lambdas.stream_processor_lambda.app import AppliedVersionCache
+
+        cache = AppliedVersionCache(max_size=2)
+        cache.record(("u", 1), "0002")
+        cache.record(("u", 1), "0001")
+        cache.record(("u", 2), "0001")
+        cache.record(("u", 3), "0001")
+
+        assert not cache.is_applied(("u", 1), "0002")
+        assert cache.is_applied(("u", 2), "0001")
+        assert not cache.is_applied(("u", 2), "0002")
+        assert cache.is_applied(("u", 3), "0001")
+
+    def test_modify_and_remove_events_update_projection(
+        self,
+        notification_records_table: Any,
+        dynamodb_resource: Any,
+        mock_context: Mock,
+        stream_events: Any,
+    ) -> None:
+        """測試 MODIFY 以差異更新投影（含衍生的 failed_bucket），REMOVE 刪除投影"""
+        from lambdas.stream_processor_lambda import app
+
+        sent = stream_events.image(error_msg={"NULL": True})
+        failed = stream_events.image(
+            status={"S": "FAILED"}, error_msg={"S": "Device token invalid"}, retry_cnt={"N": "1"}
+        )
+        delivered = stream_events.image(status={"S": "DELIVERED"}, retry_cnt={"N": "1"})
+        key = {"user_id": "user-123", "created_at": 1732000000000}
+
+        with (
+            patch.object(app, "get_dynamodb", return_value=dynamodb_resource),
+            patch.object(app, "READ_TABLE_NAME", notification_records_table.name),
+        ):
+            app.lambda_handler(
+                {
+                    "Records": [
+                        stream_events.stream_record("INSERT", "100", new=sent),
+                        stream_events.stream_record("MODIFY", "200", old=sent, new=failed),
+                    ]
+                },
+                mock_context,
+            )
+            after_failed = notification_records_table.get_item(Key=key)["Item"]
+
+            app.lambda_handler(
+                {
+                    "Records": [
+                        stream_events.stream_record("MODIFY", "300", old=failed, new=delivered)
+                    ]
+                },
+                mock_context,
+            )
+            after_delivered = notification_records_table.get_item(Key=key)["Item"]
+
+            # 過期的 REMOVE 不會刪除較新的投影
+            app._applied_versions.clear()
+            stale = app.lambda_handler(
+                {"Records": [stream_events.stream_record("REMOVE", "250", old=failed)]},
+                mock_context,
+            )
+            assert "Item" in notification_records_table.get_item(Key=key)
+
+            removed = app.lambda_handler(
+                {"Records": [stream_events.stream_record("REMOVE", "400", old=delivered)]},
+                mock_context,
+            )
+            after_remove = notification_records_table.get_item(Key=key)
+
+        assert after_failed["status"] == "FAILED"
+        assert after_failed["failed_bucket"] == "FAILED"
+        assert after_failed["error_msg"] == "Device token invalid"
+        assert after_failed["retry_cnt"] == 1
+        assert after_delivered["status"] == "DELIVERED"
+        assert "failed_bucket" not in after_delivered
+        assert "error_msg" not in after_delivered
+        assert after_delivered["projection_version"] == "300".zfill(app.SEQUENCE_NUMBER_WIDTH)
+        assert stale["duplicateRecords"] == 1
+        assert removed["duplicateRecords"] == 0
+        assert "Item" not in after_remove
+
+    def test_modify_without_projection_puts_full_item(
+        self,
+        notification_records_table: Any,
+        dynamodb_resource: Any,
+        mock_context: Mock,
+        stream_events: Any,
+    ) -> None:
+        """測試投影記錄不存在時，MODIFY 改為整筆寫入而不是建立部分記錄"""
+        from lambdas.stream_processor_lambda import app
+
+        old = stream_events.image()
+        new = stream_events.image(status={"S": "DELIVERED"}, ap_id={"S": "ap-001"})
+        with (
+            patch.object(app, "get_dynamodb", return_value=dynamodb_resource),
+            patch.object(app, "READ_TABLE_NAME", notification_records_table.name),
+        ):
+            result = app.lambda_handler(
+                {"Records": [stream_events.stream_record("MODIFY", "200", old=old, new=new)]},
+                mock_context,
+            )
+            stored = notification_records_table.get_item(
+                Key={"user_id": "user-123", "created_at": 1732000000000}
+            )["Item"]
+
+        assert result["processedRecords"] == 1
+        assert stored["notification_title"] == "Title"
+        assert stored["status"] == "DELIVERED"
+        assert stored["ap_id"] == "ap-001"
+
+    @patch("lambdas.stream_processor_lambda.app.get_dynamodb")
+    def test_modify_updates_only_changed_attributes(
+        self, mock_get_dynamodb: Mock, stream_events: Any
+    ) -> None:
+        """測試 MODIFY 的 UpdateItem 只包含變更的屬性與版本"""
+        from lambdas.stream_processor_lambda.app import lambda_handler
+
+        mock_dynamodb = Mock()
+        mock_get_dynamodb.return_value = mock_dynamodb
+
+        old = stream_events.image(retry_cnt={"N": "1"}, device_token={"S": "token-1"})
+        new = stream_events.image(retry_cnt={"N": "2"}, device_token={"S": "token-2"})
+        lambda_handler(
+            {"Records": [stream_events.stream_record("MODIFY", "200", old=old, new=new)]}, Mock()
+        )
+
+        request = mock_dynamodb.update_item.call_args.kwargs
+        assert request["Key"] == {"user_id": "user-123", "created_at": 1732000000000}
+        assert request["UpdateExpression"] == "SET #s0 = :s0, #s1 = :s1"
+        assert request["ExpressionAttributeNames"]["#s0"] == "retry_cnt"
+        assert request["ExpressionAttributeValues"][":s0"] == 2
+        assert request["ExpressionAttributeNames"]["#s1"] == "projection_version"
+        mock_dynamodb.put_item.assert_not_called()
+
+    def test_modify_that_only_removes_attributes(
+        self,
+        notification_records_table: Any,
+        dynamodb_resource: Any,
+        mock_context: Mock,
+        stream_events: Any,
+    ) -> None:
+        """測試沒有版本、只移除屬性的 MODIFY 不產生空的 SET 與 ExpressionAttributeValues"""
+        from lambdas.stream_processor_lambda import app
+
+        failed = stream_events.image(status={"S": "FAILED"}, error_msg={"S": "timeout"})
+        # 只移除 error_msg，其餘投影欄位不變
+        cleared = stream_events.image(status={"S": "FAILED"})
+        update = app.build_projection_update(
+            app.parse_command_record(failed), app.parse_command_record(cleared)
+        )
+        assert update is not None
+        request = app.update_item_kwargs(update)
+        assert request["UpdateExpression"] == "REMOVE #r0"
+        assert "ExpressionAttributeValues" not in request
+
+        key = {"user_id": "user-123", "created_at": 1732000000000}
+        with (
+            patch.object(app, "get_dynamodb", return_value=dynamodb_resource),
+            patch.object(app, "READ_TABLE_NAME", notification_records_table.name),
+        ):
+            inserted = app.lambda_handler(
+                {"Records": [{"eventName": "INSERT", "dynamodb": {"NewImage": failed}}]},
+                mock_context,
+            )
+            modified = app.lambda_handler(
+                {
+                    "Records": [
+                        {
+                            "eventName": "MODIFY",
+                            "dynamodb": {"OldImage": failed, "NewImage": cleared},
+                        }
+                    ]
+                },
+                mock_context,
+            )
+            stored = notification_records_table.get_item(Key=key)["Item"]
+
+        assert not inserted["batchItemFailures"] and not modified["batchItemFailures"]
+        assert "error_msg" not in stored
+        assert stored["status"] == "FAILED"
+
+    def test_coalesce_stream_records_folds_events_per_key(self, stream_events: Any) -> None:
+        """測試同一主鍵的事件合併為一筆最終狀態，不同主鍵與無法取得主鍵的記錄各自保留"""
+        from lambdas.stream_processor_lambda.app import coalesce_stream_records
+
+        sent = stream_events.image()
+        delivered = stream_events.image(status={"S": "DELIVERED"})
+        retried = stream_events.image(status={"S": "DELIVERED"}, retry_cnt={"N": "1"})
+        other = stream_events.image(user_id={"S": "user-456"})
+        records = [
+            stream_events.stream_record("INSERT", "100", new=sent),
+            stream_events.stream_record("MODIFY", "110", old=other, new=other),
+            stream_events.stream_record("MODIFY", "200", old=sent, new=delivered),
+            stream_events.stream_record("REMOVE", "210"),
+            stream_events.stream_record("MODIFY", "300", old=delivered, new=retried),
+            stream_events.stream_record("MODIFY", "310", old=other, new=retried | other),
+        ]
+
+        groups = coalesce_stream_records(records)
+
+        assert [indexes for _, indexes in groups] == [[0, 2, 4], [1, 5], [3]]
+        inserted, modified, removed = (record for record, _ in groups)
+        assert inserted["eventName"] == "INSERT"
+        assert inserted["dynamodb"] == {"SequenceNumber": "300", "NewImage": retried}
+        # MODIFY → MODIFY 保留最早的 OldImage，差異涵蓋兩次變更
+        assert modified["eventName"] == "MODIFY"
+        assert modified["dynamodb"]["OldImage"] is other
+        assert modified["dynamodb"]["SequenceNumber"] == "310"
+        assert removed is records[3]
+
+        removal = coalesce_stream_records(
+            [
+                stream_events.stream_record("INSERT", "100", new=sent),
+                stream_events.stream_record("REMOVE", "200", old=sent),
+            ]
+        )
+        assert [record["eventName"] for record, _ in removal] == ["REMOVE"]
+
+    def test_coalesced_writes_reduce_write_count_on_bursty_stream(
+        self,
+        notification_records_table: Any,
+        dynamodb_resource: Any,
+        mock_context: Mock,
+        stream_events: Any,
+    ) -> None:
+        """測試突發的 INSERT → MODIFY → MODIFY stream 合併後寫入次數減少，最終投影相同"""
+        from lambdas.stream_processor_lambda import app
+
+        records = []
+        for i in range(10):
+            ids = {"transaction_id": {"S": f"tx-{i}"}, "created_at": {"N": str(1732000000000 + i)}}
+            sent = stream_events.image(**ids)
+            failed = stream_events.image(
+                status={"S": "FAILED"}, error_msg={"S": "timeout"}, retry_cnt={"N": "1"}, **ids
+            )
+            delivered = stream_events.image(status={"S": "DELIVERED"}, retry_cnt={"N": "1"}, **ids)
+            records += [
+                stream_events.stream_record("INSERT", f"{100 + i}", new=sent),
+                stream_events.stream_record("MODIFY", f"{200 + i}", old=sent, new=failed),
+                stream_events.stream_record("MODIFY", f"{300 + i}", old=failed, new=delivered),
+            ]
+
+        calls = {"count": 0}
+
+        def count_write(**kwargs: Any) -> None:
+            calls["count"] += 1
+
+        client = dynamodb_resource.meta.client
+        for operation in ("PutItem", "UpdateItem", "BatchWriteItem"):
+            client.meta.events.register(f"before-call.dynamodb.{operation}", count_write)
+
+        writes = {}
+        stored = {}
+        with (
+            patch.object(app, "get_dynamodb", return_value=dynamodb_resource),
+            patch.object(app, "READ_TABLE_NAME", notification_records_table.name),
+        ):
+            for coalesce in (False, True):
+                app._applied_versions.clear()
+                calls["count"] = 0
+                with patch.object(app, "PROJECTION_COALESCE_WRITES", coalesce):
+                    result = app.lambda_handler({"Records": records}, mock_context)
+                assert result["processedRecords"] == 30
+                assert not result["batchItemFailures"]
+                writes[coalesce] = calls["count"]
+                stored[coalesce] = notification_records_table.scan()["Items"]
+                for item in stored[coalesce]:
+                    notification_records_table.delete_item(
+                        Key={"user_id": item["user_id"], "created_at": item["created_at"]}
+                    )
+
+        assert result["coalescedRecords"] == 20
+        # 逐事件：每個 INSERT 各一次 BatchWriteItem 加上 20 次 UpdateItem；合併：一次 BatchWriteItem
+        assert writes == {False: 30, True: 1}
+        assert stored[True] == stored[False]
+        assert all(
+            item["status"] == "DELIVERED" and "failed_bucket" not in item for item in stored[True]
+        )
+
+    @patch("lambdas.stream_processor_lambda.app.get_dynamodb")
+    def test_coalesced_write_failure_reports_every_folded_record(
+        self, mock_get_dynamodb: Mock, mock_context: Mock, stream_events: Any
+    ) -> None:
+        """測試合併後的寫入失敗時，所有被合併的記錄都回報於 batchItemFailures"""
+        from botocore.exceptions import ClientError
+
+        from lambdas.stream_processor_lambda.app import lambda_handler
+
+        mock_dynamodb = Mock()
+        mock_dynamodb.batch_get_item.return_value = {"Responses": {}}
+        mock_dynamodb.batch_write_item.side_effect = ClientError(
+            {"Error": {"Code": "ProvisionedThroughputExceededException"}}, "BatchWriteItem"
+        )
+        mock_get_dynamodb.return_value = mock_dynamodb
+
+        sent = stream_events.image()
+        delivered = stream_events.image(status={"S": "DELIVERED"})
+        result = lambda_handler(
+            {
+                "Records": [
+                    stream_events.stream_record("INSERT", "100", new=sent),
+                    stream_events.stream_record("MODIFY", "200", old=sent, new=delivered),
+                ]
+            },
+            mock_context,
+        )
+
+        assert mock_dynamodb.batch_write_item.call_count == 1
+        assert result["processedRecords"] == 0
+        assert result["batchItemFailures"] == [{"itemIdentifier": "100"}, {"itemIdentifier": "200"}]